@@ -0,0 +1,220 @@
+"""Cross-user analytics: a batch report over every user's expenses.
+
+Users are split into chunks and aggregated in parallel on a multiprocessing
+pool. Each worker process opens its own MongoClient (or SQLite connection)
+and asks the backend for the user's monthly and per-category totals in
+exact minor units, which come from the rollups when they are built. The
+parent appends each finished user to OUTPUT.partial as one JSON line.
+Rerunning the same command skips the users already in that file, so an
+interrupted run resumes where it stopped; --restart starts over.
+
+Once every user is done, the partial file is merged into a single JSON
+report:
+- total spend per category;
+- totals per month, with month-over-month growth;
+- percentile distributions over users for total spend, spend in the
+  report month, and growth from the month before.
+
+    python manage.py analytics --month 2026-09 --workers 8
+"""
+import json
+import multiprocessing
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+from instrumentation import get_logger, timed
+from storage import get_backend
+from storage.base import from_minor
+
+log = get_logger("analytics")
+
+ANALYTICS_CHUNK_USERS = 100
+PERCENTILES = (50, 75, 90, 95, 99)
+# Users whose aggregation failed beyond this are counted but not listed
+MAX_REPORTED_FAILURES = 100
+
+
+def default_output():
+    return os.path.join("reports", f"analytics-{date.today():%Y-%m-%d}.json")
+
+
+def previous_month(month):
+    """"YYYY-MM" of the month before month ("YYYY-MM")"""
+    first = datetime.strptime(month, "%Y-%m")
+    return (first - timedelta(days=1)).strftime("%Y-%m")
+
+
+# --- Workers ---
+def _init_worker():
+    # Each worker opens its own connection on first use; drop a client inherited through fork()
+    if "connection" in sys.modules:
+        sys.modules["connection"].reset_client()
+    # Workers query one user at a time
+    os.environ.setdefault("MONGO_MAX_POOL_SIZE", "2")
+
+
+def user_aggregates(user_id):
+    """{"user_id", "months": {month: minor units}, "categories": {category: minor units}} for one user"""
+    backend = get_backend()
+    return {
+        "user_id": str(user_id),
+        "months": {month: int(total) for month, total in backend.summary_minor(user_id, "month")},
+        "categories": {category: int(total) for category, total in backend.summary_minor(user_id, "category")},
+    }
+
+
+def _aggregate_chunk(user_ids):
+    results = []
+    for user_id in user_ids:
+        try:
+            results.append(user_aggregates(user_id))
+        except Exception as e:
+            # Reported, left out of the partial file and retried by the next run
+            results.append({"user_id": str(user_id), "error": str(e)})
+    return results
+
+
+# --- Checkpoint ---
+def _completed_users(partial):
+    """User ids already in the partial file. A line cut short by a crash is dropped."""
+    if not os.path.exists(partial):
+        return set()
+    with open(partial, "rb+") as fh:
+        data = fh.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            fh.truncate(end)
+    return {json.loads(line)["user_id"] for line in data[:end].splitlines() if line.strip()}
+
+
+def _iter_partial(partial):
+    with open(partial) as fh:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+
+
+# --- Merge ---
+def _distribution(values):
+    """{"users", "mean", "p50", ..., "max"} of values (amounts or ratios)"""
+    if not values:
+        return {"users": 0}
+    import numpy as np
+
+    values = np.asarray(values, dtype=np.float64)
+    summary = {"users": int(values.size), "mean": round(float(values.mean()), 4)}
+    for pct, value in zip(PERCENTILES, np.percentile(values, PERCENTILES).tolist()):
+        summary[f"p{pct}"] = round(value, 4)
+    summary["max"] = round(float(values.max()), 4)
+    return summary
+
+
+def merge_report(entries, month, users):
+    """The report dict from per-user aggregates (amounts in minor units)"""
+    prior = previous_month(month)
+    categories, category_users = {}, {}
+    months, month_users = {}, {}
+    user_totals, month_spend, growth = [], [], []
+    for entry in entries:
+        for category, total in entry["categories"].items():
+            categories[category] = categories.get(category, 0) + total
+            category_users[category] = category_users.get(category, 0) + 1
+        for key, total in entry["months"].items():
+            months[key] = months.get(key, 0) + total
+            month_users[key] = month_users.get(key, 0) + 1
+        if entry["months"]:
+            user_totals.append(from_minor(sum(entry["months"].values())))
+        current, before = entry["months"].get(month), entry["months"].get(prior)
+        if current:
+            month_spend.append(from_minor(current))
+        if before:
+            growth.append(((current or 0) - before) / before)
+
+    total = sum(categories.values())
+    month_rows = []
+    for key in sorted(months):
+        # Against the calendar month before, not the previous month with data
+        before = months.get(previous_month(key))
+        month_rows.append({
+            "month": key,
+            "total": from_minor(months[key]),
+            "active_users": month_users[key],
+            "growth": round((months[key] - before) / before, 4) if before else None,
+        })
+    return {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "month": month,
+        "previous_month": prior,
+        "users": users,
+        "users_with_expenses": len(user_totals),
+        "total_spend": from_minor(total),
+        "categories": [
+            {
+                "category": category,
+                "total": from_minor(amount),
+                "share": round(amount / total, 4) if total else None,
+                "users": category_users[category],
+            }
+            for category, amount in sorted(categories.items(), key=lambda item: item[1], reverse=True)
+        ],
+        "months": month_rows,
+        "distributions": {
+            "total_spend_per_user": _distribution(user_totals),
+            "month_spend_per_user": _distribution(month_spend),
+            "month_over_month_growth": _distribution(growth),
+        },
+    }
+
+
+@timed(log)
+def run_report(output, month=None, workers=None, chunk_users=ANALYTICS_CHUNK_USERS, restart=False, progress=None):
+    """Aggregate every user on a pool of workers and write the merged report to output.
+
+    month ("YYYY-MM", default: last month) is the month the per-user
+    distributions describe. progress(done, total) runs after every chunk.
+    Returns the report, which also lists the users that failed; they stay
+    out of the checkpoint, so the next run retries just those.
+    """
+    month = month or previous_month(date.today().strftime("%Y-%m"))
+    partial = output + ".partial"
+    if restart and os.path.exists(partial):
+        os.remove(partial)
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+
+    done = _completed_users(partial)
+    pending = [uid for uid in get_backend().list_user_ids() if uid not in done]
+    total = len(done) + len(pending)
+    chunks = [pending[i:i + chunk_users] for i in range(0, len(pending), chunk_users)]
+    failed, failures = [], 0
+    finished = len(done)
+    if progress is not None:
+        progress(finished, total)
+
+    with open(partial, "a") as fh:
+        if chunks:
+            with multiprocessing.Pool(workers or os.cpu_count(), initializer=_init_worker) as pool:
+                for results in pool.imap_unordered(_aggregate_chunk, chunks):
+                    for entry in results:
+                        if "error" in entry:
+                            failures += 1
+                            if len(failed) < MAX_REPORTED_FAILURES:
+                                failed.append(entry)
+                            continue
+                        fh.write(json.dumps(entry, separators=(",", ":")) + "\n")
+                    fh.flush()
+                    finished += len(results)
+                    if progress is not None:
+                        progress(finished, total)
+
+    report = merge_report(_iter_partial(partial), month, total)
+    report["failed_users"] = failures
+    report["failures"] = failed
+    tmp = output + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump(report, fh, indent=2)
+    os.replace(tmp, output)
+    if not failures:
+        os.remove(partial)
+    return report
+
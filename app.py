@@ -1,21 +1,38 @@
 import os
-import json
+import functools
 from datetime import datetime
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import Flask, Response, abort, make_response, render_template, request, redirect, session, url_for, flash, stream_with_context
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user, UserMixin
-import plotly.express as px
-import plotly.utils
-from databases import create_user, get_user_by_username, get_user_by_id, add_expenses, get_user_expenses_df, get_summary_data, get_dashboard_stats, get_expense_by_id, update_expense, delete_expense, view_expenses_by_user, verify_password
+from databases import ensure_indexes, create_user, get_user_by_username, get_user_by_id, add_expenses, get_user_expenses_df, get_summary_data, get_dashboard_stats, expense_cache_stats, get_expense_by_id, update_expense, delete_expense, view_expenses_page, get_expenses_total, search_expenses, verify_password, CATEGORIES, VIEW_PAGE_SIZE
 from datetime import date as dt_date
-import pandas as pd
+import charts
+import exporter
+import http_cache
+import instrumentation
+import metrics
+import passwords
+import user_cache
+from query_args import filter_query_args, read_filters, read_search_args
 CURRENCY = "₹"
 
 app = Flask(__name__, template_folder="templates")
 app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "change_this_secret_key")
+app.config["VIEW_PAGE_SIZE"] = int(os.environ.get("VIEW_PAGE_SIZE", VIEW_PAGE_SIZE))
+# Mixed into the ETags of data-driven HTML pages so a deploy invalidates cached copies
+app.config["PAGE_VERSION"] = os.environ.get("APP_VERSION") or http_cache.templates_version(
+    os.path.join(app.root_path, app.template_folder))
 
 login_manager = LoginManager(app)
 login_manager.login_view = "login"
 
+# Make sure indexes and validators exist before serving requests
+# (set ENSURE_INDEXES_ON_STARTUP=0 to skip, e.g. for tooling that only imports the app)
+if os.environ.get("ENSURE_INDEXES_ON_STARTUP", "1") != "0":
+    try:
+        ensure_indexes()
+    except Exception as e:
+        app.logger.error("Error ensuring indexes: %s", e)
+
 # Create a User class for Flask-Login
 class User(UserMixin):
     def __init__(self, user_data):
@@ -23,19 +40,30 @@ class User(UserMixin):
         self.id = str(user_data['_id'])
         self.username = user_data['username']
 
+debug_log = instrumentation.get_logger("debug")
+
+def debug_route(view):
+    """Serve the view only while the "debug" instrumentation module is enabled (EXPENSE_INSTRUMENT=debug)"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not instrumentation.enabled("debug"):
+            abort(404)
+        return view(*args, **kwargs)
+    return wrapper
+
 @app.route("/test_data_flow")
 @login_required
+@debug_route
 def test_data_flow():
     """Test the complete data flow"""
-    from databases import EXPENSES_COLLECTION
-    from bson.objectid import ObjectId
+    from databases import raw_expenses
     
-    # 1. Check raw MongoDB data
-    raw_data = list(EXPENSES_COLLECTION.find({"user_id": ObjectId(current_user.id)}))
+    # 1. Check raw stored data
+    raw_data = raw_expenses(current_user.id)
     
     result = "<h1>Data Flow Test</h1>"
     
-    result += "<h2>1. Raw MongoDB Data:</h2>"
+    result += "<h2>1. Raw Stored Data:</h2>"
     for item in raw_data:
         result += f"<p>ID: {item['_id']}, Amount: {item.get('Amount')} (type: {type(item.get('Amount'))}), Category: {item.get('category')}</p>"
     
@@ -56,13 +84,41 @@ def test_data_flow():
 
 @login_manager.user_loader
 def load_user(user_id):
-    user_data = get_user_by_id(user_id)
+    # Served from the signed session snapshot or the user cache on the common path
+    user_data = user_cache.load(session, user_id, get_user_by_id)
     if user_data:
         return User(user_data)
     return None
 
+# Per-endpoint latency and phase breakdown, served on /metrics
+@app.before_request
+def start_request_metrics():
+    metrics.start_request()
+
+@app.after_request
+def finish_request_metrics(response):
+    metrics.finish_request(request.endpoint or "unmatched", response.status_code)
+    return response
+
+@app.teardown_request
+def discard_request_metrics(exc):
+    # Only records anything if after_request never ran
+    metrics.finish_request(request.endpoint or "unmatched", 500)
+
+@app.route("/metrics")
+def prometheus_metrics():
+    if not metrics.scrape_allowed(request.headers.get("Authorization")):
+        abort(404)
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.errorhandler(passwords.PoolSaturated)
+def password_pool_saturated(e):
+    # Shed the login/register burst quickly instead of queueing more hashing work
+    return Response("Too many sign-ins in progress, please retry shortly.", 503, {"Retry-After": "1"})
+
 def render_page(template, **kwargs):
-    return render_template(template, currency=CURRENCY, **kwargs)
+    with metrics.phase("template"):
+        return render_template(template, currency=CURRENCY, **kwargs)
 
 # ----------------- AUTH -----------------
 @app.route("/register", methods=["GET", "POST"])
@@ -93,7 +149,7 @@ def login():
         user_data = get_user_by_username(username)
         
         if user_data and verify_password(user_data, password):
-            user_obj = User(user_data)
+            user_obj = User(user_cache.remember(session, user_data))
             login_user(user_obj)
             flash(f"Welcome {username}!", "success")
             return redirect(url_for("dashboard"))
@@ -104,6 +160,7 @@ def login():
 @app.route("/logout")
 @login_required
 def logout():
+    user_cache.forget(session, current_user.id)
     logout_user()
     flash("Logged out successfully", "info")
     return redirect(url_for("login"))
@@ -113,8 +170,9 @@ def logout():
 @app.route("/dashboard")
 @login_required
 def dashboard():
-    stats = get_dashboard_stats(current_user.id)
-    return render_page("dashboard.html", stats=stats)
+    filters = read_filters(request.args)
+    stats = get_dashboard_stats(current_user.id, **filters)
+    return render_page("dashboard.html", stats=stats, categories=CATEGORIES, filters=filter_query_args(filters))
 
 @app.route("/add_expense", methods=["GET", "POST"])
 @login_required
@@ -139,8 +197,84 @@ def add_expense():
 @app.route("/view")
 @login_required
 def view_expenses():
-    expenses = view_expenses_by_user(current_user.id)
-    return render_page("view_expenses.html", expenses=expenses)
+    filters = read_filters(request.args)
+    page_size = request.args.get("size", app.config["VIEW_PAGE_SIZE"], type=int)
+    try:
+        page = view_expenses_page(
+            current_user.id,
+            after=request.args.get("after"),
+            before=request.args.get("before"),
+            page_size=page_size,
+            **filters
+        )
+    except ValueError:
+        flash("Invalid page link", "warning")
+        return redirect(url_for("view_expenses"))
+    total = get_expenses_total(current_user.id, **filters)
+
+    # Query string values to carry over into the pagination links
+    filter_args = filter_query_args(filters)
+    if page_size != app.config["VIEW_PAGE_SIZE"]:
+        filter_args["size"] = page_size
+    return render_page("view_expenses.html", expenses=page["expenses"], page=page, total=total,
+                       categories=CATEGORIES, filters=filter_args)
+
+@app.route("/search")
+@login_required
+def search():
+    query, filters, search_args = read_search_args(request.args)
+    results = search_expenses(
+        current_user.id,
+        query,
+        page=request.args.get("page", 1, type=int),
+        **filters
+    )
+    return render_page("search.html", results=results, categories=CATEGORIES, filters=search_args)
+
+@app.route("/import", methods=["GET", "POST"])
+@login_required
+def import_expenses():
+    report = None
+    if request.method == "POST":
+        upload = request.files.get("file")
+        if not upload or not upload.filename:
+            flash("Choose a file to import", "danger")
+        else:
+            # Loaded on first use: importer pulls in pandas (see preload.py)
+            import importer
+            fmt = request.form.get("format") or importer.detect_format(upload.filename)
+            try:
+                report = importer.import_expenses(current_user.id, upload.stream, fmt=fmt)
+            except (ValueError, UnicodeDecodeError) as e:
+                flash(f"Could not import file: {e}", "danger")
+            else:
+                category = "success" if not report["rejected"] else "warning"
+                flash(f"Imported {report['inserted']} of {report['read']} rows", category)
+    return render_page("import_expenses.html", report=report, categories=CATEGORIES)
+
+@app.route("/export")
+@login_required
+def export_expenses():
+    fmt = request.args.get("format", "csv")
+    if fmt not in exporter.EXPORT_FORMATS:
+        flash(f"Unknown export format: {fmt}", "danger")
+        return redirect(url_for("view_expenses"))
+    if fmt == "parquet" and not exporter.parquet_available():
+        flash("Parquet export needs the pyarrow package", "danger")
+        return redirect(url_for("view_expenses"))
+
+    spec = exporter.EXPORT_FORMATS[fmt]
+    chunks = exporter.export_expenses(
+        current_user.id,
+        fmt,
+        **read_filters(request.args)
+    )
+    filename = f"expenses_{dt_date.today().isoformat()}.{spec['extension']}"
+    return Response(
+        stream_with_context(metrics.streamed(chunks, request.endpoint)),
+        mimetype=spec["mimetype"],
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
 
 @app.route("/edit/<expense_id>", methods=["GET", "POST"])
 @login_required
@@ -182,84 +316,55 @@ def delete_expense(expense_id):
         flash("Delete failed.", "danger")
     return redirect(url_for("view_expenses"))
 
+def summary_entry(group_by, filters):
+    return charts.summary_entry(current_user.id, group_by, CURRENCY, get_summary_data, **filters)
+
+def conditional_response(etag, last_modified, build):
+    """Empty 304 when the client's copy is current, else build() with the validators attached"""
+    headers = http_cache.validator_headers(etag, last_modified)
+    if not http_cache.has_pending_flashes(session) and http_cache.not_modified(request, etag, last_modified):
+        return Response(status=304, headers=headers)
+    response = make_response(build())
+    response.headers.update(headers)
+    return response
+
 @app.route("/summary")
 @login_required
 def summary():
-    group_by = request.args.get("group_by", "category")
-    df = get_summary_data(current_user.id, group_by)
-    
-    total = df["Total"].sum() if not df.empty else 0
-    graph_json = ""
-    
-    if not df.empty:
-        # FIX: Manual chart creation to avoid any automatic normalization
-        if group_by == "category":
-            # Create pie chart manually
-            import plotly.graph_objects as go
-            
-            fig = go.Figure(data=[go.Pie(
-                labels=df['Group'].tolist(),
-                values=df['Total'].tolist(),
-                hole=0.3,
-                textinfo='label+value+percent',
-                texttemplate='%{label}<br>' + CURRENCY + '%{value:.2f}<br>(%{percent})',
-                hovertemplate='<b>%{label}</b><br>' + f'Amount: {CURRENCY}%{{value:.2f}}<br>Percentage: %{{percent}}<extra></extra>'
-            )])
-            
-            fig.update_layout(
-                title_text=f"Expenses by Category ({CURRENCY})",
-                paper_bgcolor="rgba(0,0,0,0)",
-                plot_bgcolor="rgba(0,0,0,0)",
-                font=dict(color="#2c3e50", size=12),
-                height=500,
-                showlegend=True
-            )
-            
-        else:
-            # Create bar chart manually
-            import plotly.graph_objects as go
-            
-            fig = go.Figure(data=[go.Bar(
-                x=df['Group'].tolist(),
-                y=df['Total'].tolist(),
-                text=[f'{CURRENCY}{val:.2f}' for val in df['Total']],
-                textposition='outside',
-                marker_color='#6366f1',
-                hovertemplate='<b>%{x}</b><br>' + f'Amount: {CURRENCY}%{{y:.2f}}<extra></extra>'
-            )])
-            
-            fig.update_layout(
-                title_text=f"Expenses by {group_by.capitalize()} ({CURRENCY})",
-                xaxis_title=group_by.capitalize(),
-                yaxis_title=f"Amount ({CURRENCY})",
-                paper_bgcolor="rgba(0,0,0,0)",
-                plot_bgcolor="rgba(0,0,0,0)",
-                font=dict(color="#2c3e50", size=12),
-                height=500
-            )
-            
-            if group_by in ['month', 'week']:
-                fig.update_xaxes(tickangle=45)
-        
-        graph_json = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
-    
-    return render_page("summary.html", graph_json=graph_json, group_by=group_by, total_expense=total)
+    filters = read_filters(request.args)
+    entry = summary_entry(request.args.get("group_by", "category"), filters)
+    # The chart itself is drawn in the browser from /api/summary. The page's tag also covers
+    # the templates; no Last-Modified, which would still match after a deploy
+    etag = http_cache.page_etag(entry["etag"], app.config["PAGE_VERSION"])
+    return conditional_response(etag, None, lambda: render_page(
+        "summary.html", group_by=entry["group_by"], total_expense=entry["total"], has_data=entry["has_data"],
+        categories=CATEGORIES, filters=filter_query_args(filters)
+    ))
+
+@app.route("/api/summary")
+@login_required
+def api_summary():
+    """Grouped totals as {group_by, currency, labels, values, total}"""
+    entry = summary_entry(request.args.get("group_by", "category"), read_filters(request.args))
+    return conditional_response(entry["etag"], entry["last_modified"],
+                                lambda: Response(entry["body"], mimetype="application/json"))
 
 @app.route("/debug_raw_data")
 @login_required
+@debug_route
 def debug_raw_data():
     """Debug route to check raw expense data"""
-    from databases import EXPENSES_COLLECTION
-    from bson.objectid import ObjectId
+    from databases import raw_expenses as load_raw_expenses
+    import connection
     
-    # Get raw data from MongoDB
-    raw_expenses = list(EXPENSES_COLLECTION.find({"user_id": ObjectId(current_user.id)}))
+    # Get raw data from the storage backend
+    raw_expenses = load_raw_expenses(current_user.id)
     
     debug_info = "<h1>Raw Expense Data Debug</h1>"
     debug_info += f"<p>User ID: {current_user.id}</p>"
     debug_info += f"<p>Number of expenses: {len(raw_expenses)}</p>"
     
-    debug_info += "<h3>Raw MongoDB Data:</h3>"
+    debug_info += "<h3>Raw Stored Data:</h3>"
     for expense in raw_expenses:
         debug_info += f"<pre>{expense}</pre><hr>"
     
@@ -271,24 +376,37 @@ def debug_raw_data():
     debug_info += "<h3>Summary Data:</h3>"
     summary_df = get_summary_data(current_user.id, "category")
     debug_info += f"<pre>{summary_df.to_string() if not summary_df.empty else 'No data'}</pre>"
+
+    debug_info += "<h3>Expense Frame Cache:</h3>"
+    debug_info += f"<pre>{expense_cache_stats()}</pre>"
+
+    debug_info += "<h3>Connection Pool:</h3>"
+    debug_info += f"<pre>{connection.pool_stats()}</pre>"
+
+    debug_info += "<h3>Chart Cache:</h3>"
+    debug_info += f"<pre>{charts.chart_cache_stats()}</pre>"
+
+    debug_info += "<h3>User Cache:</h3>"
+    debug_info += f"<pre>{user_cache.stats()}</pre>"
+
+    debug_info += "<h3>Password Hash Pool:</h3>"
+    debug_info += f"<pre>{passwords.pool_stats()}</pre>"
     
     return debug_info
 
 @app.route("/debug_summary")
 @login_required
+@debug_route
 def debug_summary():
     """Debug route to check summary data"""
     group_by = request.args.get("group_by", "category")
     df = get_summary_data(current_user.id, group_by)
     
-    print("=== DEBUG SUMMARY DATA ===")
-    print(f"Group by: {group_by}")
-    print(f"DataFrame shape: {df.shape}")
-    print(f"DataFrame columns: {df.columns.tolist()}")
-    print(f"DataFrame data:")
-    print(df)
-    print(f"Total sum: {df['Total'].sum() if not df.empty else 0}")
-    print("==========================")
+    debug_log.debug("debug_summary", extra={"metrics": {
+        "group_by": group_by,
+        "groups": len(df),
+        "total": float(df["Total"].sum()) if not df.empty else 0,
+    }})
     
     return f"""
     <h1>Debug Summary Data</h1>
@@ -302,9 +420,8 @@ def debug_summary():
 @app.route("/reset")
 def reset_database():
     """Reset database for testing"""
-    from databases import USERS_COLLECTION, EXPENSES_COLLECTION
-    USERS_COLLECTION.delete_many({})
-    EXPENSES_COLLECTION.delete_many({})
+    from databases import reset_all
+    reset_all()
     flash("Database reset successfully", "info")
     return redirect(url_for("register"))
 
@@ -0,0 +1,414 @@
+"""ASGI version of the web app, built on Quart and async_databases.
+
+Serves the same routes and templates as app.py without tying up a thread per
+request while MongoDB answers, so one process can hold many more concurrent
+dashboard/summary users:
+
+    pip install quart uvicorn
+    uvicorn asgi_app:app --workers 4
+
+Sessions use the same cookie and key ("_user_id") as Flask-Login, so with
+the same SECRET_KEY a user stays logged in when switching between the two
+servers. The debug routes are only available in app.py.
+"""
+import asyncio
+import functools
+import os
+import sys
+import threading
+from datetime import date as dt_date, datetime
+
+from quart import Quart, Response, abort, flash, g, make_response, redirect, render_template, request, session, url_for
+
+import async_databases as adb
+import charts
+import databases
+import exporter
+import http_cache
+import metrics
+import passwords
+import user_cache
+from databases import CATEGORIES, VIEW_PAGE_SIZE
+from query_args import filter_query_args, read_filters, read_search_args
+
+CURRENCY = "₹"
+
+app = Quart(__name__, template_folder="templates")
+app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "change_this_secret_key")
+app.config["VIEW_PAGE_SIZE"] = int(os.environ.get("VIEW_PAGE_SIZE", VIEW_PAGE_SIZE))
+# Mixed into the ETags of data-driven HTML pages so a deploy invalidates cached copies
+app.config["PAGE_VERSION"] = os.environ.get("APP_VERSION") or http_cache.templates_version(
+    os.path.join(app.root_path, app.template_folder))
+
+@app.before_serving
+async def startup():
+    # Same switch as app.py (ENSURE_INDEXES_ON_STARTUP=0 skips it)
+    if os.environ.get("ENSURE_INDEXES_ON_STARTUP", "1") != "0":
+        try:
+            await asyncio.to_thread(databases.ensure_indexes)
+        except Exception as e:
+            app.logger.error("Error ensuring indexes: %s", e)
+
+@app.after_serving
+async def shutdown():
+    connection = sys.modules.get("connection")
+    if connection is not None:
+        # Only imported once the MongoDB backend was used
+        await connection.close_async_client()
+    adb.CPU_EXECUTOR.shutdown(wait=False)
+    passwords.POOL.shutdown()
+
+# --- Session users ---
+class User:
+    is_authenticated = True
+
+    def __init__(self, user_data):
+        self.user_data = user_data
+        self.id = str(user_data['_id'])
+        self.username = user_data['username']
+
+class AnonymousUser:
+    is_authenticated = False
+    id = None
+    username = None
+
+# Registered first so the user lookup is timed too. The sampling profiler
+# follows threads, not tasks, so it stays off here.
+@app.before_request
+async def start_request_metrics():
+    metrics.start_request(profile=False)
+
+@app.after_request
+async def finish_request_metrics(response):
+    metrics.finish_request(request.endpoint or "unmatched", response.status_code)
+    return response
+
+@app.teardown_request
+async def discard_request_metrics(exc):
+    metrics.finish_request(request.endpoint or "unmatched", 500)
+
+@app.route("/metrics")
+async def prometheus_metrics():
+    if not metrics.scrape_allowed(request.headers.get("Authorization")):
+        abort(404)
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.before_request
+async def load_current_user():
+    user_id = session.get("_user_id")
+    user_data = await user_cache.load_async(session, user_id, adb.get_user_by_id) if user_id else None
+    g.user = User(user_data) if user_data else AnonymousUser()
+
+@app.context_processor
+def inject_current_user():
+    return {"current_user": g.get("user", AnonymousUser())}
+
+def login_user(user):
+    session["_user_id"] = user.id
+
+def logout_user():
+    session.pop("_user_id", None)
+
+def login_required(view):
+    @functools.wraps(view)
+    async def wrapper(*args, **kwargs):
+        if not g.user.is_authenticated:
+            return redirect(url_for("login"))
+        return await view(*args, **kwargs)
+    return wrapper
+
+@app.errorhandler(passwords.PoolSaturated)
+async def password_pool_saturated(e):
+    return Response("Too many sign-ins in progress, please retry shortly.", 503, {"Retry-After": "1"})
+
+async def render_page(template, **kwargs):
+    with metrics.phase("template"):
+        return await render_template(template, currency=CURRENCY, **kwargs)
+
+async def iterate_in_thread(chunks, queue_size=8):
+    """Drive a blocking generator on one worker thread and yield its items here.
+
+    One thread for the whole generator, since SQLite connections may only be
+    used by the thread that opened them; the bounded queue applies backpressure.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(queue_size)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def produce():
+        try:
+            for chunk in chunks:
+                put(chunk)
+                if stop.is_set():
+                    break
+            else:
+                put(done)
+        except BaseException as e:
+            put(e)
+        finally:
+            chunks.close()
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # Client went away: let a producer blocked on a full queue finish and stop
+        stop.set()
+        while not queue.empty():
+            queue.get_nowait()
+
+# ----------------- AUTH -----------------
+@app.route("/register", methods=["GET", "POST"])
+async def register():
+    if g.user.is_authenticated:
+        return redirect(url_for("dashboard"))
+    if request.method == "POST":
+        form = await request.form
+        u = form.get("username")
+        p = form.get("password")
+        if not u or not p:
+            await flash("Username and password required", "danger")
+        elif await adb.create_user(u, p):
+            await flash("Account created! Please log in.", "success")
+            return redirect(url_for("login"))
+        else:
+            await flash("Username already exists", "danger")
+    return await render_page("register.html")
+
+@app.route("/login", methods=["GET", "POST"])
+async def login():
+    if g.user.is_authenticated:
+        return redirect(url_for("dashboard"))
+    if request.method == "POST":
+        form = await request.form
+        username = form.get("username")
+        user_data = await adb.get_user_by_username(username)
+        if user_data and await adb.verify_password(user_data, form.get("password")):
+            login_user(User(user_cache.remember(session, user_data)))
+            await flash(f"Welcome {username}!", "success")
+            return redirect(url_for("dashboard"))
+        await flash("Invalid credentials", "danger")
+    return await render_page("login.html")
+
+@app.route("/logout")
+@login_required
+async def logout():
+    user_cache.forget(session, g.user.id)
+    logout_user()
+    await flash("Logged out successfully", "info")
+    return redirect(url_for("login"))
+
+# ----------------- EXPENSE ROUTES -----------------
+@app.route("/")
+@app.route("/dashboard")
+@login_required
+async def dashboard():
+    filters = read_filters(request.args)
+    stats = await adb.get_dashboard_stats(g.user.id, **filters)
+    return await render_page("dashboard.html", stats=stats, categories=CATEGORIES, filters=filter_query_args(filters))
+
+@app.route("/add_expense", methods=["GET", "POST"])
+@login_required
+async def add_expense():
+    cats = ["Food", "Transport", "Shopping", "Others"]
+    today = dt_date.today().isoformat()
+    if request.method == "POST":
+        form = await request.form
+        success = await adb.add_expenses(
+            user_id=g.user.id,
+            amount=form.get("amount"),
+            category=form.get("category"),
+            date_str=form.get("date"),
+            notes=form.get("notes")
+        )
+        if success:
+            await flash("Expense added!", "success")
+            return redirect(url_for("view_expenses"))
+        await flash("Error adding expense", "danger")
+    return await render_page("add_expense.html", categories=cats, today=today)
+
+@app.route("/view")
+@login_required
+async def view_expenses():
+    filters = read_filters(request.args)
+    page_size = request.args.get("size", app.config["VIEW_PAGE_SIZE"], type=int)
+    try:
+        page, total = await asyncio.gather(
+            adb.view_expenses_page(
+                g.user.id,
+                after=request.args.get("after"),
+                before=request.args.get("before"),
+                page_size=page_size,
+                **filters
+            ),
+            adb.get_expenses_total(g.user.id, **filters),
+        )
+    except ValueError:
+        await flash("Invalid page link", "warning")
+        return redirect(url_for("view_expenses"))
+
+    # Query string values to carry over into the pagination links
+    filter_args = filter_query_args(filters)
+    if page_size != app.config["VIEW_PAGE_SIZE"]:
+        filter_args["size"] = page_size
+    return await render_page("view_expenses.html", expenses=page["expenses"], page=page, total=total,
+                             categories=CATEGORIES, filters=filter_args)
+
+@app.route("/search")
+@login_required
+async def search():
+    query, filters, search_args = read_search_args(request.args)
+    results = await adb.search_expenses(
+        g.user.id,
+        query,
+        page=request.args.get("page", 1, type=int),
+        **filters
+    )
+    return await render_page("search.html", results=results, categories=CATEGORIES, filters=search_args)
+
+@app.route("/import", methods=["GET", "POST"])
+@login_required
+async def import_expenses():
+    report = None
+    if request.method == "POST":
+        files = await request.files
+        form = await request.form
+        upload = files.get("file")
+        if not upload or not upload.filename:
+            await flash("Choose a file to import", "danger")
+        else:
+            # Loaded on first use: importer pulls in pandas (see preload.py)
+            import importer
+            fmt = form.get("format") or importer.detect_format(upload.filename)
+            try:
+                report = await asyncio.to_thread(importer.import_expenses, g.user.id, upload.stream, fmt)
+            except (ValueError, UnicodeDecodeError) as e:
+                await flash(f"Could not import file: {e}", "danger")
+            else:
+                category = "success" if not report["rejected"] else "warning"
+                await flash(f"Imported {report['inserted']} of {report['read']} rows", category)
+    return await render_page("import_expenses.html", report=report, categories=CATEGORIES)
+
+@app.route("/export")
+@login_required
+async def export_expenses():
+    fmt = request.args.get("format", "csv")
+    if fmt not in exporter.EXPORT_FORMATS:
+        await flash(f"Unknown export format: {fmt}", "danger")
+        return redirect(url_for("view_expenses"))
+    if fmt == "parquet" and not exporter.parquet_available():
+        await flash("Parquet export needs the pyarrow package", "danger")
+        return redirect(url_for("view_expenses"))
+
+    spec = exporter.EXPORT_FORMATS[fmt]
+    chunks = exporter.export_expenses(
+        g.user.id,
+        fmt,
+        **read_filters(request.args)
+    )
+    filename = f"expenses_{dt_date.today().isoformat()}.{spec['extension']}"
+    return Response(
+        iterate_in_thread(metrics.streamed(chunks, request.endpoint)),
+        mimetype=spec["mimetype"],
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+@app.route("/edit/<expense_id>", methods=["GET", "POST"])
+@login_required
+async def edit_expense(expense_id):
+    expense = await adb.get_expense_by_id(expense_id, g.user.id)
+    cats = ["Food", "Transport", "Shopping", "Others"]
+    if not expense:
+        await flash("Expense not found", "danger")
+        return redirect(url_for("view_expenses"))
+    if request.method == "POST":
+        form = await request.form
+        success = await adb.update_expense(
+            expense_id,
+            g.user.id,
+            form.get("amount"),
+            form.get("category"),
+            form.get("date"),
+            form.get("notes")
+        )
+        if success:
+            await flash("Expense updated!", "success")
+            return redirect(url_for("view_expenses"))
+        await flash("Error updating expense", "danger")
+
+    if "date" in expense and isinstance(expense["date"], datetime):
+        expense["date_formatted"] = expense["date"].strftime("%Y-%m-%d")
+    else:
+        expense["date_formatted"] = expense["date"]
+
+    return await render_page("edit_expense.html", expense=expense, categories=cats)
+
+@app.route("/delete/<expense_id>")
+@login_required
+async def delete_expense(expense_id):
+    if await adb.delete_expense(expense_id, g.user.id):
+        await flash("Expense deleted!", "success")
+    else:
+        await flash("Delete failed.", "danger")
+    return redirect(url_for("view_expenses"))
+
+async def summary_entry(group_by, filters):
+    key, entry = charts.cached_summary(g.user.id, group_by, **filters)
+    if entry is None:
+        df = await adb.get_summary_data(g.user.id, key[1], **filters)
+        entry = charts.build_summary_entry(key, df, CURRENCY)
+    return entry
+
+async def conditional_response(etag, last_modified, build):
+    """Empty 304 when the client's copy is current, else await build() with the validators attached"""
+    headers = http_cache.validator_headers(etag, last_modified)
+    if not http_cache.has_pending_flashes(session) and http_cache.not_modified(request, etag, last_modified):
+        return Response("", 304, headers)
+    response = await make_response(await build())
+    response.headers.update(headers)
+    return response
+
+@app.route("/summary")
+@login_required
+async def summary():
+    filters = read_filters(request.args)
+    entry = await summary_entry(request.args.get("group_by", "category"), filters)
+    # The chart itself is drawn in the browser from /api/summary. The page's tag also covers
+    # the templates; no Last-Modified, which would still match after a deploy
+    etag = http_cache.page_etag(entry["etag"], app.config["PAGE_VERSION"])
+    return await conditional_response(etag, None, lambda: render_page(
+        "summary.html", group_by=entry["group_by"], total_expense=entry["total"], has_data=entry["has_data"],
+        categories=CATEGORIES, filters=filter_query_args(filters)
+    ))
+
+@app.route("/api/summary")
+@login_required
+async def api_summary():
+    """Grouped totals as {group_by, currency, labels, values, total}"""
+    entry = await summary_entry(request.args.get("group_by", "category"), read_filters(request.args))
+
+    async def body():
+        return Response(entry["body"], mimetype="application/json")
+    return await conditional_response(entry["etag"], entry["last_modified"], body)
+
+# Reset database (for testing)
+@app.route("/reset")
+async def reset_database():
+    """Reset database for testing"""
+    await asyncio.to_thread(databases.reset_all)
+    await flash("Database reset successfully", "info")
+    return redirect(url_for("register"))
+
+if __name__ == "__main__":
+    print("ASGI Expense Tracker running at http://127.0.0.1:5000/")
+    app.run(debug=True)
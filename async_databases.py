@@ -0,0 +1,211 @@
+"""Asyncio variant of the databases.py API, used by the ASGI app (asgi_app.py).
+
+Reads go through the backend's native asyncio client when it has one (MongoDB
+via AsyncMongoClient, see storage/mongo_async.py); otherwise the synchronous
+function runs in a worker thread. Writes always reuse the synchronous code so
+rollups, data versions and the frame cache stay in one place.
+
+CPU-bound steps (building DataFrames from the column arrays) run on
+CPU_EXECUTOR via run_cpu() so they never block the event loop; password
+hashing has its own bounded pool (passwords.py).
+"""
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import databases
+import passwords
+from databases import (
+    EXPENSE_FRAME_COLUMNS,
+    FrameBuilder,
+    LOAD_BATCH_SIZE,
+    MAX_SEARCH_RESULTS,
+    SEARCH_PAGE_SIZE,
+    VIEW_PAGE_SIZE,
+    _cached_frame,
+    _frame_fields,
+    _page_request,
+    _page_result,
+    _search_request,
+    _search_result,
+    _store_frame,
+    _summary_frame,
+    empty_dashboard,
+)
+from instrumentation import get_logger, timed
+from storage import get_async_backend
+
+log = get_logger("databases")
+
+CPU_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("ASYNC_CPU_WORKERS", min(4, os.cpu_count() or 1))),
+    thread_name_prefix="expense-cpu",
+)
+
+async def run_cpu(fn, *args, **kwargs):
+    """Run fn on CPU_EXECUTOR, keeping the caller's instrumentation context"""
+    call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(CPU_EXECUTOR, call)
+
+async def _in_thread(fn, *args, **kwargs):
+    # Blocking I/O of the synchronous backend
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+# --- User Management Functions ---
+async def create_user(username, password):
+    password_hash = await passwords.hash_password_async(password)
+    return await _in_thread(databases.insert_user, username, password_hash)
+
+async def get_user_by_username(username):
+    backend = get_async_backend()
+    if backend is None:
+        return await _in_thread(databases.get_user_by_username, username)
+    return await backend.get_user_by_username(username)
+
+async def get_user_by_id(user_id):
+    backend = get_async_backend()
+    if backend is None:
+        return await _in_thread(databases.get_user_by_id, user_id)
+    try:
+        return await backend.get_user_by_id(user_id)
+    except Exception:
+        return None
+
+async def verify_password(user, password):
+    if user and 'password_hash' in user and await passwords.check_password_async(user['password_hash'], password):
+        databases.upgrade_password_hash(user, password)
+        return True
+    return False
+
+# --- Expense Management Functions ---
+async def add_expenses(user_id, amount, category, date_str, notes):
+    return await _in_thread(databases.add_expenses, user_id, amount, category, date_str, notes)
+
+async def update_expense(expense_id, user_id, amount, category, date_str, notes):
+    return await _in_thread(databases.update_expense, expense_id, user_id, amount, category, date_str, notes)
+
+async def delete_expense(expense_id, user_id):
+    return await _in_thread(databases.delete_expense, expense_id, user_id)
+
+@timed(log, "get_expense_by_id_async")
+async def get_expense_by_id(expense_id, user_id):
+    backend = get_async_backend()
+    if backend is None:
+        return await _in_thread(databases.get_expense_by_id, expense_id, user_id)
+    try:
+        expense = await backend.get_expense(expense_id, user_id)
+        if expense:
+            expense["id"] = str(expense["_id"])
+        return expense
+    except Exception:
+        return None
+
+@timed(log, "get_user_expenses_df_async")
+async def get_user_expenses_df(user_id, columns=EXPENSE_FRAME_COLUMNS, start=None, end=None, category=None):
+    """Same frame and cache as databases.get_user_expenses_df"""
+    import pandas as pd
+
+    backend = get_async_backend()
+    if backend is None:
+        return await _in_thread(databases.get_user_expenses_df, user_id, columns, start, end, category)
+    cache_key, cached = _cached_frame(user_id, columns, start, end, category)
+    if cached is not None:
+        return cached
+    try:
+        fields = _frame_fields(columns)
+        size_hint = await backend.count_expenses(user_id, category, start, end)
+        if size_hint == 0:
+            return pd.DataFrame()
+        # Each batch goes straight into the column arrays; no list of documents is kept
+        builder = FrameBuilder(fields, size_hint)
+        batch = []
+        async for doc in backend.iter_expenses(
+            user_id, fields=fields, category=category, start=start, end=end,
+            newest_first=True, batch_size=LOAD_BATCH_SIZE,
+        ):
+            batch.append(doc)
+            if len(batch) == LOAD_BATCH_SIZE:
+                await run_cpu(builder.add_all, batch)
+                batch = []
+        await run_cpu(builder.add_all, batch)
+        df = await run_cpu(builder.frame)
+        return _store_frame(cache_key, df, columns)
+    except Exception as e:
+        log.error("Error fetching expenses: %s", e)
+        return pd.DataFrame()
+
+@timed(log, "get_summary_data_async")
+async def get_summary_data(user_id, group_by="category", start=None, end=None, category=None):
+    backend = get_async_backend()
+    if backend is None:
+        return await _in_thread(databases.get_summary_data, user_id, group_by, start, end, category)
+    try:
+        rows = await backend.summary(user_id, group_by, start, end, category)
+    except Exception as e:
+        log.error("Error building summary: %s", e)
+        rows = []
+    return _summary_frame(rows)
+
+@timed(log, "get_dashboard_stats_async")
+async def get_dashboard_stats(user_id, start=None, end=None, category=None):
+    backend = get_async_backend()
+    if backend is None:
+        return await _in_thread(databases.get_dashboard_stats, user_id, start, end, category)
+    try:
+        return await backend.dashboard_stats(user_id, datetime.now(), category, start, end)
+    except Exception as e:
+        log.error("Error building dashboard stats: %s", e)
+        return empty_dashboard()
+
+@timed(log, "view_expenses_page_async")
+async def view_expenses_page(user_id, after=None, before=None, page_size=VIEW_PAGE_SIZE, category=None, start=None, end=None):
+    backend = get_async_backend()
+    if backend is None:
+        return await _in_thread(
+            databases.view_expenses_page, user_id, after, before, page_size, category, start, end
+        )
+    page_size, boundary, direction = _page_request(after, before, page_size)
+    try:
+        expenses = await backend.page_expenses(
+            user_id, page_size + 1, boundary, direction, category=category, start=start, end=end
+        )
+    except ValueError:
+        raise
+    except Exception as e:
+        log.error("Error fetching expenses: %s", e)
+        expenses = []
+    return _page_result(expenses, page_size, after, before)
+
+@timed(log, "search_expenses_async")
+async def search_expenses(user_id, query, page=1, page_size=SEARCH_PAGE_SIZE, category=None, min_amount=None, max_amount=None):
+    backend = get_async_backend()
+    if backend is None:
+        return await _in_thread(
+            databases.search_expenses, user_id, query, page, page_size, category, min_amount, max_amount
+        )
+    query = (query or "").strip()
+    page, page_size, offset, min_minor, max_minor = _search_request(page, page_size, min_amount, max_amount)
+    if not query or offset >= MAX_SEARCH_RESULTS:
+        return _search_result([], query, page, page_size)
+    try:
+        expenses = await backend.search_expenses(
+            user_id, query, page_size + 1, offset, category=category, min_minor=min_minor, max_minor=max_minor
+        )
+    except Exception as e:
+        log.error("Error searching expenses: %s", e)
+        expenses = []
+    return _search_result(expenses, query, page, page_size)
+
+@timed(log, "get_expenses_total_async")
+async def get_expenses_total(user_id, category=None, start=None, end=None):
+    backend = get_async_backend()
+    if backend is None:
+        return await _in_thread(databases.get_expenses_total, user_id, category, start, end)
+    try:
+        return await backend.expenses_total(user_id, category, start, end)
+    except Exception as e:
+        log.error("Error computing expense total: %s", e)
+        return {"total": 0, "count": 0}
@@ -0,0 +1,111 @@
+"""Run the same workload against the SQLite backend and (if reachable) MongoDB.
+
+SQLite uses a temporary file; MongoDB uses the MONGO_URI server with the
+MONGO_DB database (default "expense_bench"), which is wiped before and after:
+
+    python benchmarks/bench_backends.py --rows 50000 > results.json
+
+The MongoDB half is skipped when no server answers, so the report only
+compares the engines when "mongo" appears under "backends". Measured with
+--rows 50000 on a 1-CPU VM without a MongoDB server (ms, best of 3):
+
+    sqlite  bulk_insert 645.8   load_frame 451.3   summary category 77.5 /
+            month 77.8 / week 80.6   dashboard 134.2   first_page 0.3   total 46.5
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MONGO_DB", "expense_bench")
+
+import pandas as pd
+
+import databases
+import storage
+
+
+def make_columns(rows, seed=42):
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    return {
+        "dates": pd.Series(pd.to_datetime([start + timedelta(days=rng.randrange(2000)) for _ in range(rows)])),
+        "amounts": pd.Series([round(rng.uniform(10, 5000), 2) for _ in range(rows)]),
+        "categories": pd.Series([rng.choice(databases.CATEGORIES) for _ in range(rows)]),
+        "notes": pd.Series(["No notes"] * rows),
+    }
+
+
+def timed_call(fn, repeat=1):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best * 1000, 2)
+
+
+def run_workload(columns, repeat):
+    databases.reset_all()
+    databases.ensure_indexes()
+    databases.create_user("bench", "bench")
+    user_id = str(databases.get_user_by_username("bench")["_id"])
+
+    results = {"bulk_insert_ms": timed_call(lambda: databases.add_expenses_bulk(user_id, **columns))}
+
+    def load_frame():
+        databases.EXPENSE_FRAME_CACHE.clear()
+        databases.get_user_expenses_df(user_id)
+
+    results["load_frame_ms"] = timed_call(load_frame, repeat)
+    for group_by in ("category", "month", "week"):
+        results[f"summary_{group_by}_ms"] = timed_call(lambda: databases.get_summary_data(user_id, group_by), repeat)
+    results["dashboard_ms"] = timed_call(lambda: databases.get_dashboard_stats(user_id), repeat)
+    results["first_page_ms"] = timed_call(lambda: databases.view_expenses_page(user_id), repeat)
+    results["total_ms"] = timed_call(lambda: databases.get_expenses_total(user_id), repeat)
+    databases.reset_all()
+    return results
+
+
+def mongo_reachable():
+    try:
+        import connection
+        connection.get_client().admin.command("ping")
+        return True
+    except Exception:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-mongo", action="store_true")
+    args = parser.parse_args()
+
+    columns = make_columns(args.rows)
+    report = {"rows": args.rows, "repeat": args.repeat, "backends": {}}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        from storage.sqlite import SQLiteBackend
+        backend = SQLiteBackend(os.path.join(tmp, "bench.db"))
+        storage.set_backend(backend)
+        report["backends"]["sqlite"] = run_workload(columns, args.repeat)
+        backend.close()
+
+    if not args.skip_mongo and mongo_reachable():
+        storage.set_backend(storage.create_backend("mongo"))
+        report["backends"]["mongo"] = run_workload(columns, args.repeat)
+
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Time bucketing: bucketing.bucket_totals against strftime + groupby.
+
+Generates --rows synthetic expenses (benchmarks/workload.py) and, for each
+granularity, totals them per period both ways: formatting every date with
+Series.dt.strftime and grouping on the strings (how the rollups were built
+before), and with the integer period codes of bucketing.py. Both must give
+the same labels and totals; the report holds the best of --repeat runs:
+
+    python benchmarks/bench_bucketing.py --rows 1000000 > bucketing.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+from bucketing import GRANULARITIES, bucket_totals
+from workload import generate_columns
+
+STRFTIME_FORMATS = {
+    "day": "%Y-%m-%d",
+    "week": "%G-W%V",
+    "month": "%Y-%m",
+    "year": "%Y",
+}
+
+
+def strftime_totals(dates, amounts, granularity):
+    """(labels, totals) the per-row way"""
+    if granularity == "quarter":
+        # strftime has no quarter directive
+        labels = dates.dt.year.astype(str) + "-Q" + dates.dt.quarter.astype(str)
+    else:
+        labels = dates.dt.strftime(STRFTIME_FORMATS[granularity])
+    grouped = amounts.groupby(labels).sum()
+    return grouped.index.tolist(), grouped.to_numpy()
+
+
+def best_ms(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best * 1000, 2), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    columns = generate_columns(args.rows, seed=args.seed)
+    dates, amounts = columns["dates"], columns["amounts"]
+    date_values, amount_values = dates.to_numpy(), amounts.to_numpy()
+
+    results = {}
+    for granularity in GRANULARITIES:
+        strftime_ms, (expected_labels, expected_totals) = best_ms(
+            lambda: strftime_totals(dates, amounts, granularity), args.repeat
+        )
+        codes_ms, (labels, totals, _) = best_ms(
+            lambda: bucket_totals(date_values, amount_values, granularity), args.repeat
+        )
+        if labels != expected_labels or not np.allclose(totals, expected_totals):
+            raise SystemExit(f"{granularity}: bucket_totals disagrees with strftime + groupby")
+        results[granularity] = {
+            "periods": len(labels),
+            "strftime_groupby_ms": strftime_ms,
+            "period_codes_ms": codes_ms,
+            "speedup": round(strftime_ms / codes_ms, 1) if codes_ms else None,
+        }
+        print(f"{granularity}: {strftime_ms} ms -> {codes_ms} ms", file=sys.stderr)
+
+    json.dump({"rows": args.rows, "repeat": args.repeat, "pandas": pd.__version__, "results": results}, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
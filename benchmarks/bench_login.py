@@ -0,0 +1,112 @@
+"""Login throughput and tail latency under mixed load, inline vs pooled hashing.
+
+Simulates a threaded server (--threads request workers) receiving an
+open-loop stream of requests at --rate per second, --login-share of which
+are logins; the rest are light page requests. Latency is measured from
+arrival, so time spent queueing for a request thread counts. No database or
+server is needed:
+
+    python benchmarks/bench_login.py --threads 16 --rate 400 --login-share 0.3
+
+"inline" checks passwords on the request thread as the app used to; "pool"
+goes through passwords.py, where overflow is answered with a fast 503.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import check_password_hash
+
+import passwords
+
+PASSWORD = "correct horse battery staple"
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 2)
+
+
+def light_request():
+    # Roughly a small template render: ~1 ms of Python work
+    return sum(i * i for i in range(20000))
+
+
+def run(mode, stored_hash, args):
+    results = {"login": [], "light": [], "rejected": 0}
+    lock = threading.Lock()
+
+    def login():
+        if mode == "inline":
+            return check_password_hash(stored_hash, PASSWORD)
+        return passwords.check_password(stored_hash, PASSWORD)
+
+    def handle(kind, arrived):
+        try:
+            if kind == "login":
+                login()
+            else:
+                light_request()
+        except passwords.PoolSaturated:
+            with lock:
+                results["rejected"] += 1
+            return
+        latency = (time.perf_counter() - arrived) * 1000
+        with lock:
+            results[kind].append(latency)
+
+    interval = 1 / args.rate
+    every = max(1, round(1 / args.login_share)) if args.login_share else 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as server:
+        sent = 0
+        while time.perf_counter() - started < args.duration:
+            kind = "login" if every and sent % every == 0 else "light"
+            server.submit(handle, kind, time.perf_counter())
+            sent += 1
+            time.sleep(max(0, started + sent * interval - time.perf_counter()))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": sent,
+        "login_per_s": round(len(results["login"]) / elapsed, 1),
+        "login_p50_ms": percentile(results["login"], 50),
+        "login_p99_ms": percentile(results["login"], 99),
+        "login_rejected_503": results["rejected"],
+        "light_p50_ms": percentile(results["light"], 50),
+        "light_p99_ms": percentile(results["light"], 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16, help="request threads of the simulated server")
+    parser.add_argument("--rate", type=float, default=200, help="arriving requests per second")
+    parser.add_argument("--login-share", type=float, default=0.25)
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    stored_hash = passwords.hash_password(PASSWORD)
+    report = {
+        "hash_method": passwords.HASH_METHOD,
+        "pool": {"workers": passwords.POOL.workers, "limit": passwords.POOL.limit},
+        "threads": args.threads,
+        "rate": args.rate,
+        "login_share": args.login_share,
+        "modes": {mode: run(mode, stored_hash, args) for mode in ("inline", "pool")},
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
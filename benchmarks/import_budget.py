@@ -0,0 +1,115 @@
+"""Startup import budget for app.py and databases.py, measured with -X importtime.
+
+Each module is imported in a fresh interpreter (--runs times, keeping the
+fastest run) with ENSURE_INDEXES_ON_STARTUP=0, so nothing touches the
+database. The check fails with exit status 1 when a module's cumulative
+import time exceeds its budget, or when importing it loads one of the
+modules that must stay lazy:
+
+    python benchmarks/import_budget.py
+    python benchmarks/import_budget.py --budget app=300 --runs 7
+
+The budgets below are pinned on purpose: raise them in the same change that
+makes startup slower, not to silence the check.
+
+Only the import itself is measured. With the default configuration,
+importing app.py also runs ensure_indexes(), which imports the storage
+backend (storage.mongo and pymongo with MongoDB) and talks to the
+database. That step depends on a reachable server, so it is switched off
+here. The "stays lazy" check therefore holds for ENSURE_INDEXES_ON_STARTUP=0
+(tooling, and servers that create indexes with manage.py init-indexes),
+not for a default app start.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time, in milliseconds
+BUDGETS_MS = {
+    "databases": 60,
+    "app": 400,
+}
+# Loaded on first use (see preload.py), never while importing the app
+LAZY_MODULES = ("pandas", "numpy", "pymongo", "bson", "plotly", "importer")
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us)] from -X importtime output"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header line
+        imports.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return imports
+
+
+def measure(module):
+    env = dict(os.environ, ENSURE_INDEXES_ON_STARTUP="0", PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    return parse_importtime(proc.stderr)
+
+
+def check(module, budget_ms, runs):
+    best = None
+    for _ in range(runs):
+        imports = measure(module)
+        total = next((cumulative for name, _, cumulative in imports if name == module), 0)
+        if best is None or total < best[0]:
+            best = (total, imports)
+    total, imports = best
+
+    loaded = {name for name, _, _ in imports}
+    eager = sorted(
+        lazy for lazy in LAZY_MODULES
+        if any(name == lazy or name.startswith(lazy + ".") for name in loaded)
+    )
+    slowest = sorted(imports, key=lambda item: item[1], reverse=True)[:10]
+    total_ms = round(total / 1000, 1)
+    return {
+        "module": module,
+        "cumulative_ms": total_ms,
+        "budget_ms": budget_ms,
+        "eager_heavy_modules": eager,
+        "slowest_self_ms": {name: round(self_us / 1000, 1) for name, self_us, _ in slowest},
+        "ok": total_ms <= budget_ms and not eager,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", action="append", default=[], metavar="MODULE=MS",
+                        help="override a budget, e.g. app=300 (repeatable)")
+    parser.add_argument("--runs", type=int, default=5, help="imports per module; the fastest counts")
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS_MS)
+    for spec in args.budget:
+        module, _, ms = spec.partition("=")
+        budgets[module] = float(ms)
+
+    results = []
+    for module, budget_ms in budgets.items():
+        try:
+            results.append(check(module, budget_ms, args.runs))
+        except RuntimeError as e:
+            results.append({"module": module, "error": str(e), "ok": False})
+
+    json.dump({"python": sys.version.split()[0], "results": results}, sys.stdout, indent=2)
+    print()
+    sys.exit(0 if all(result["ok"] for result in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
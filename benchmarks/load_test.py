@@ -0,0 +1,127 @@
+"""Concurrent dashboard/summary load test for comparing the WSGI and ASGI servers.
+
+Start both servers on the same machine with the same database, e.g.
+
+    gunicorn -c gunicorn.conf.py -b 127.0.0.1:8000 app:app
+    uvicorn asgi_app:app --port 8001 --workers 4
+
+then step through increasing numbers of concurrent logged-in users:
+
+    python benchmarks/load_test.py --target wsgi=http://127.0.0.1:8000 \\
+        --target asgi=http://127.0.0.1:8001 --concurrency 10,50,100,200 > load.json
+
+Each virtual user logs in once and then alternates between /dashboard and
+/summary (category, month, week) for --duration seconds. The report lists
+throughput and latency percentiles per target and concurrency level, plus the
+highest concurrency each target sustained within --slo-ms at p99.
+"""
+import argparse
+import http.cookiejar
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+PATHS = ("/dashboard", "/summary?group_by=category", "/summary?group_by=month", "/summary?group_by=week")
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 2)
+
+
+def open_session(base_url, username, password, timeout):
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    form = urllib.parse.urlencode({"username": username, "password": password}).encode()
+    opener.open(f"{base_url}/register", form, timeout=timeout).read()
+    response = opener.open(f"{base_url}/login", form, timeout=timeout)
+    response.read()
+    if "/login" in response.geturl():
+        raise RuntimeError(f"Could not log in to {base_url} as {username}")
+    return opener
+
+
+def virtual_user(opener, base_url, deadline, timeout, offset, results):
+    latencies, errors = [], 0
+    step = offset
+    while time.perf_counter() < deadline:
+        path = PATHS[step % len(PATHS)]
+        step += 1
+        started = time.perf_counter()
+        try:
+            opener.open(base_url + path, timeout=timeout).read()
+        except (urllib.error.URLError, OSError):
+            errors += 1
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+    results.append((latencies, errors))
+
+
+def run_level(base_url, openers, concurrency, duration, timeout):
+    results = []
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=virtual_user, args=(openers[i], base_url, deadline, timeout, i, results))
+        for i in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = [value for user_latencies, _ in results for value in user_latencies]
+    errors = sum(user_errors for _, user_errors in results)
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", action="append", required=True, help="name=base_url, repeatable")
+    parser.add_argument("--concurrency", default="10,50,100")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--slo-ms", type=float, default=500, help="p99 latency budget per request")
+    parser.add_argument("--username", default="loadtest")
+    parser.add_argument("--password", default="loadtest")
+    args = parser.parse_args()
+
+    levels = [int(value) for value in args.concurrency.split(",")]
+    report = {"duration_s": args.duration, "slo_p99_ms": args.slo_ms, "targets": {}}
+    for target in args.target:
+        name, base_url = target.split("=", 1)
+        base_url = base_url.rstrip("/")
+        openers = [open_session(base_url, args.username, args.password, args.timeout) for _ in range(max(levels))]
+        runs = []
+        for concurrency in levels:
+            runs.append(run_level(base_url, openers, concurrency, args.duration, args.timeout))
+            print(f"{name}: {runs[-1]}", file=sys.stderr)
+        within_slo = [run["concurrency"] for run in runs
+                      if not run["errors"] and run["p99_ms"] is not None and run["p99_ms"] <= args.slo_ms]
+        report["targets"][name] = {
+            "url": base_url,
+            "levels": runs,
+            "max_concurrency_within_slo": max(within_slo) if within_slo else 0,
+        }
+
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Benchmark suite: data-layer calls and full page routes on synthetic users.
+
+For each --sizes entry a user with that many expenses is generated
+(benchmarks/workload.py). The suite then times the data-layer calls and the
+/dashboard, /view and /summary routes through the Flask test client. "cold"
+timings clear the in-process caches first; "warm" ones repeat the call with
+them populated. The default backend is SQLite in a temporary file, so no
+server is needed. --backend mongo uses MONGO_URI with the MONGO_DB
+database (default "expense_bench"), which is wiped before and after.
+
+    python benchmarks/suite.py --sizes 1000,10000,100000 --output results.json
+    python benchmarks/suite.py --compare results.json --threshold 0.2
+
+Results are JSON keyed by size and measurement, tagged with the git commit.
+--compare exits with status 1 when any timing regressed by more than
+--threshold relative to the given earlier run.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("MONGO_DB", "expense_bench")
+os.environ.setdefault("ENSURE_INDEXES_ON_STARTUP", "0")
+
+import databases
+import storage
+from workload import create_user_with_expenses
+
+DEFAULT_SIZES = "1000,10000,100000"
+# One month inside the generated history, for the filtered read paths
+MONTH = {"start": datetime(2024, 6, 1), "end": datetime(2024, 7, 1)}
+USERNAME = "bench"
+PASSWORD = "bench"
+
+
+def best_ms(fn, repeat, before=None):
+    """Fastest of repeat calls, in ms; before() runs untimed ahead of each call"""
+    best = None
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best * 1000, 2)
+
+
+def warm_ms(fn, repeat):
+    """best_ms of fn after one untimed call, so the caches a cold pass cleared are filled"""
+    fn()
+    return best_ms(fn, repeat)
+
+
+def clear_caches():
+    import charts
+    databases.EXPENSE_FRAME_CACHE.clear()
+    databases.SEARCH_INDEX_CACHE.clear()
+    charts.CHART_CACHE.clear()
+
+
+def data_layer(user_id, repeat):
+    calls = {
+        "get_user_expenses_df": lambda: databases.get_user_expenses_df(user_id),
+        "get_summary_data_category": lambda: databases.get_summary_data(user_id, "category"),
+        "get_summary_data_month": lambda: databases.get_summary_data(user_id, "month"),
+        "get_summary_data_week": lambda: databases.get_summary_data(user_id, "week"),
+        "get_dashboard_stats": lambda: databases.get_dashboard_stats(user_id),
+        "get_user_expenses_df_one_month": lambda: databases.get_user_expenses_df(user_id, **MONTH),
+        "get_summary_data_week_one_month": lambda: databases.get_summary_data(user_id, "week", **MONTH),
+        "get_dashboard_stats_one_month": lambda: databases.get_dashboard_stats(user_id, **MONTH),
+        "view_expenses_by_user": lambda: databases.view_expenses_by_user(user_id),
+        "view_expenses_page": lambda: databases.view_expenses_page(user_id),
+        "search_expenses": lambda: databases.search_expenses(user_id, "team lunch"),
+    }
+    results = {}
+    for name, call in calls.items():
+        results[f"{name}_cold_ms"] = best_ms(call, repeat, before=clear_caches)
+    # Only the frame (and, without a text index, the notes index) is cached in-process;
+    # the rest always hit the backend
+    results["get_user_expenses_df_warm_ms"] = warm_ms(calls["get_user_expenses_df"], repeat)
+    results["search_expenses_warm_ms"] = warm_ms(calls["search_expenses"], repeat)
+    return results
+
+
+def routes(repeat):
+    from app import app
+
+    app.config["TESTING"] = True
+    client = app.test_client()
+    response = client.post("/login", data={"username": USERNAME, "password": PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f"login failed with status {response.status_code}")
+
+    def get(path):
+        def call():
+            response = client.get(path)
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {path} returned {response.status_code}")
+        return call
+
+    paths = {
+        "route_dashboard": "/dashboard",
+        "route_view": "/view",
+        "route_dashboard_one_month": "/dashboard?start=2024-06-01&end=2024-06-30",
+        "route_summary_category": "/summary?group_by=category",
+        "route_summary_month": "/summary?group_by=month",
+        "route_summary_week": "/summary?group_by=week",
+        "route_api_summary_category": "/api/summary?group_by=category",
+        "route_search": "/search?q=team+lunch",
+    }
+    results = {}
+    for name, path in paths.items():
+        results[f"{name}_cold_ms"] = best_ms(get(path), repeat, before=clear_caches)
+        results[f"{name}_warm_ms"] = warm_ms(get(path), repeat)
+    return results
+
+
+def run_size(rows, repeat):
+    databases.reset_all()
+    databases.ensure_indexes()
+    started = time.perf_counter()
+    user_id = create_user_with_expenses(USERNAME, rows, PASSWORD)
+    results = {"generate_and_insert_s": round(time.perf_counter() - started, 2)}
+    results.update(data_layer(user_id, repeat))
+    results.update(routes(repeat))
+    databases.reset_all()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline, threshold):
+    """[(size, measurement, before, after)] for timings that grew by more than threshold"""
+    regressions = []
+    for size, results in report["results"].items():
+        for name, after in results.items():
+            before = baseline.get("results", {}).get(size, {}).get(name)
+            # Sub-millisecond timings are mostly noise
+            if name.endswith("_ms") and before and after > max(before * (1 + threshold), before + 1):
+                regressions.append((size, name, before, after))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma separated expense counts per user (up to 1000000)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backend", choices=storage.BACKENDS, default="sqlite")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="earlier report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, as a fraction")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    baseline = None
+    if args.compare:
+        # Read first: --output may point at the same file
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+    report = {
+        "commit": git_commit(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": args.backend,
+        "repeat": args.repeat,
+        "results": {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.backend == "sqlite":
+            from storage.sqlite import SQLiteBackend
+            backend = SQLiteBackend(os.path.join(tmp, "bench.db"))
+        else:
+            backend = storage.create_backend("mongo")
+        storage.set_backend(backend)
+        for rows in sizes:
+            print(f"{rows} expenses...", file=sys.stderr)
+            report["results"][str(rows)] = run_size(rows, args.repeat)
+        if args.backend == "sqlite":
+            backend.close()
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.threshold)
+        for size, name, before, after in regressions:
+            print(f"REGRESSION {size} {name}: {before} -> {after} ms", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
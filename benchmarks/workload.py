@@ -0,0 +1,107 @@
+"""Synthetic expense workloads for the benchmarks.
+
+generate_columns() draws expenses with a realistic shape: categories are
+skewed towards food and transport, amounts are log-normal around a
+per-category median, spending is heavier at weekends and grows slowly over
+time, and utility bills cluster in the first days of each month. Everything
+is seeded, so the same arguments always produce the same data.
+
+    python benchmarks/workload.py --rows 100000 --user bench   # load into the configured backend
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+import databases
+
+# category: (share of expenses, median amount, spread of log(amount))
+CATEGORY_PROFILE = {
+    "Food": (0.34, 250, 0.6),
+    "Transport": (0.20, 120, 0.5),
+    "Shopping": (0.15, 1200, 0.9),
+    "Entertainment": (0.12, 600, 0.7),
+    "Utilities": (0.09, 1800, 0.4),
+    "Others": (0.10, 400, 1.0),
+}
+NOTES = ["", "", "", "", "groceries", "cab to office", "lunch with team", "monthly bill", "birthday gift", "weekend trip"]
+WEEKDAY_WEIGHTS = np.array([1.0, 0.9, 0.9, 1.0, 1.2, 1.5, 1.4])
+START = "2020-01-01"
+GENERATE_BATCH_ROWS = 100_000
+
+
+def _dates(rng, rows, start, days):
+    day_index = np.arange(days)
+    weekdays = (pd.Timestamp(start).dayofweek + day_index) % 7
+    # Weekend-heavy, and about twice as much spending at the end of the range as at the start
+    weights = WEEKDAY_WEIGHTS[weekdays] * (1 + day_index / days)
+    picked = rng.choice(days, size=rows, p=weights / weights.sum())
+    seconds = rng.integers(8 * 3600, 23 * 3600, size=rows)
+    return pd.Timestamp(start) + pd.to_timedelta(picked, unit="D") + pd.to_timedelta(seconds, unit="s")
+
+
+def generate_columns(rows, seed=42, start=START, days=5 * 365):
+    """Aligned Series (dates, amounts, categories, notes) as taken by databases.add_expenses_bulk"""
+    rng = np.random.default_rng(seed)
+    names = list(CATEGORY_PROFILE)
+    shares = np.array([CATEGORY_PROFILE[name][0] for name in names])
+    category_index = rng.choice(len(names), size=rows, p=shares / shares.sum())
+
+    medians = np.array([CATEGORY_PROFILE[name][1] for name in names])[category_index]
+    spreads = np.array([CATEGORY_PROFILE[name][2] for name in names])[category_index]
+    amounts = np.round(medians * np.exp(rng.normal(0, spreads)), 2)
+
+    dates = _dates(rng, rows, start, days)
+    utilities = category_index == names.index("Utilities")
+    if utilities.any():
+        # Bills land on the 1st-5th of the month they were drawn in
+        month_starts = dates[utilities].to_period("M").to_timestamp()
+        dates = dates.to_numpy().copy()
+        dates[utilities] = month_starts + pd.to_timedelta(rng.integers(0, 5, size=utilities.sum()), unit="D")
+        dates = pd.DatetimeIndex(dates)
+
+    return {
+        "dates": pd.Series(dates),
+        "amounts": pd.Series(amounts),
+        "categories": pd.Series(np.array(names, dtype=object)[category_index]),
+        "notes": pd.Series(np.array(NOTES, dtype=object)[rng.integers(0, len(NOTES), size=rows)]),
+    }
+
+
+def create_user_with_expenses(username, rows, password="bench", seed=42, batch_rows=GENERATE_BATCH_ROWS):
+    """Create (or reuse) username and add rows synthetic expenses in batches; returns the user id"""
+    user = databases.get_user_by_username(username)
+    if user is None:
+        databases.create_user(username, password)
+        user = databases.get_user_by_username(username)
+    user_id = str(user["_id"])
+    for offset in range(0, rows, batch_rows):
+        # A different seed per batch keeps memory flat without repeating rows
+        columns = generate_columns(min(batch_rows, rows - offset), seed=seed + offset)
+        report = databases.add_expenses_bulk(user_id, **columns)
+        if report["errors"]:
+            raise RuntimeError(f"{len(report['errors'])} rows failed to insert, first: {report['errors'][0]}")
+    return user_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--user", default="bench")
+    parser.add_argument("--password", default="bench")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    databases.ensure_indexes()
+    started = time.perf_counter()
+    user_id = create_user_with_expenses(args.user, args.rows, args.password, args.seed)
+    print(f"Added {args.rows} expenses to {args.user} ({user_id}) in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
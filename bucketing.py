@@ -0,0 +1,96 @@
+"""Vectorized time bucketing for datetime64 arrays.
+
+period_codes() maps dates to integer period codes with NumPy arithmetic, with
+no per-row strftime. Labels are only formatted once per distinct period.
+Codes count whole periods since the Unix epoch, so sorting them sorts the
+periods chronologically:
+
+    granularity  code                                       label
+    day          days since 1970-01-01                      2024-03-05
+    week         ISO weeks (Monday first) since 1969-12-29  2024-W10
+    month        months since 1970-01                       2024-03
+    quarter      quarters since 1970-Q1                     2024-Q1
+    year         years since 1970                           2024
+
+Week labels follow ISO 8601 ("%G-W%V"), like the rollups and summaries.
+"""
+import numpy as np
+
+GRANULARITIES = ("day", "week", "month", "quarter", "year")
+
+# 1970-01-01 was a Thursday: shifting by 3 days makes weeks start on Monday
+_WEEK_SHIFT = 3
+
+
+def _as_datetime64(dates):
+    return np.asarray(dates, dtype="datetime64[ns]")
+
+
+def period_codes(dates, granularity):
+    """int64 period code per date (NaT dates get an undefined code; filter them with np.isnat)"""
+    dates = _as_datetime64(dates)
+    if granularity == "day":
+        return dates.astype("datetime64[D]").astype(np.int64)
+    if granularity == "week":
+        return (dates.astype("datetime64[D]").astype(np.int64) + _WEEK_SHIFT) // 7
+    if granularity == "month":
+        return dates.astype("datetime64[M]").astype(np.int64)
+    if granularity == "quarter":
+        return dates.astype("datetime64[M]").astype(np.int64) // 3
+    if granularity == "year":
+        return dates.astype("datetime64[Y]").astype(np.int64)
+    raise ValueError(f"Unknown granularity {granularity!r}; expected one of {', '.join(GRANULARITIES)}")
+
+
+def period_labels(codes, granularity):
+    """Labels for period codes, as a list of str"""
+    codes = np.asarray(codes, dtype=np.int64)
+    if granularity == "day":
+        return np.datetime_as_string(codes.astype("datetime64[D]")).tolist()
+    if granularity == "month":
+        return np.datetime_as_string(codes.astype("datetime64[M]")).tolist()
+    if granularity == "year":
+        return np.datetime_as_string(codes.astype("datetime64[Y]")).tolist()
+    if granularity == "quarter":
+        years, quarters = codes // 4 + 1970, codes % 4 + 1
+        return [f"{year}-Q{quarter}" for year, quarter in zip(years.tolist(), quarters.tolist())]
+    if granularity == "week":
+        # An ISO week belongs to the year of its Thursday
+        thursdays = (codes * 7).astype("datetime64[D]")
+        years = thursdays.astype("datetime64[Y]")
+        weeks = (thursdays - years.astype("datetime64[D]")).astype(np.int64) // 7 + 1
+        return [f"{year}-W{week:02d}" for year, week in zip(np.datetime_as_string(years).tolist(), weeks.tolist())]
+    raise ValueError(f"Unknown granularity {granularity!r}; expected one of {', '.join(GRANULARITIES)}")
+
+
+def bucket_totals(dates, amounts, granularity):
+    """(labels, totals, counts) per period in chronological order; NaT dates and NaN amounts are skipped"""
+    dates = _as_datetime64(dates)
+    amounts = np.asarray(amounts, dtype=np.float64)
+    keep = ~np.isnat(dates) & ~np.isnan(amounts)
+    codes, inverse = np.unique(period_codes(dates[keep], granularity), return_inverse=True)
+    totals = np.bincount(inverse, weights=amounts[keep], minlength=len(codes))
+    counts = np.bincount(inverse, minlength=len(codes))
+    return period_labels(codes, granularity), totals, counts
+
+
+def regroup(rows, granularity):
+    """Fold [(day or month label, total)] into [(label, total)] of a coarser granularity"""
+    if not rows:
+        return []
+    labels, totals = zip(*rows)
+    # "YYYY-MM" parses as the first day of the month
+    dates = np.array(labels, dtype="datetime64[D]")
+    labels, totals, _ = bucket_totals(dates, np.array(totals, dtype=np.float64), granularity)
+    return list(zip(labels, totals.tolist()))
+
+
+def format_dates(dates, fmt):
+    """strftime(fmt) for every date, computed once per distinct day (None for NaT)"""
+    days = _as_datetime64(dates).astype("datetime64[D]")
+    unique_days, inverse = np.unique(days, return_inverse=True)
+    labels = np.array(
+        [day.strftime(fmt) if day is not None else None for day in unique_days.astype(object)],
+        dtype=object,
+    )
+    return labels[inverse]
@@ -0,0 +1,86 @@
+"""Chart data for the summary page, shared by the Flask and ASGI apps.
+
+The server only sends the grouped series ({group_by, currency, labels,
+values, total}); the page draws the pie or bar chart itself with Plotly.js.
+
+Serialized series are cached per (user, group_by, filters, data version): a write
+bumps the version, so entries for older data are never served again.
+Each entry carries the ETag and Last-Modified used for conditional GETs.
+"""
+import hashlib
+import json
+import os
+
+import metrics
+from cache import LRUCache
+from databases import SUMMARY_GROUPINGS, get_data_version
+from http_cache import http_now
+from instrumentation import get_logger, record, timed
+
+log = get_logger("charts")
+
+CHART_CACHE = LRUCache(
+    max_entries=int(os.environ.get("CHART_CACHE_ENTRIES", 512)),
+    max_bytes=int(os.environ.get("CHART_CACHE_BYTES", 32 * 1024 * 1024)),
+    # Same staleness bound as the expense frame cache for writes made in other workers
+    ttl=float(os.environ.get("CHART_CACHE_TTL", os.environ.get("EXPENSE_CACHE_TTL", 300))),
+    sizeof=lambda entry: len(entry["body"]),
+)
+
+
+def summary_series(df, group_by, currency):
+    """The Group/Total summary frame as a compact chart series"""
+    labels = [str(group) for group in df["Group"]] if not df.empty else []
+    values = [round(float(total), 2) for total in df["Total"]] if not df.empty else []
+    return {
+        "group_by": group_by,
+        "currency": currency,
+        "labels": labels,
+        "values": values,
+        "total": round(sum(values), 2),
+    }
+
+
+def cached_summary(user_id, group_by, start=None, end=None, category=None):
+    """(cache key, cached entry or None) for the user's current data version"""
+    group_by = group_by if group_by in SUMMARY_GROUPINGS else "category"
+    key = (str(user_id), group_by, get_data_version(user_id)[0], start, end, category)
+    entry = CHART_CACHE.get(key)
+    record(**{"chart_cache_hits" if entry is not None else "chart_cache_misses": 1})
+    return key, entry
+
+
+@metrics.phase("chart")
+def build_summary_entry(key, df, currency):
+    """Serialize a summary frame and cache it with its validators"""
+    user_id, group_by = key[:2]
+    series = summary_series(df, group_by, currency)
+    body = json.dumps(series, separators=(",", ":"))
+    # Content-derived, so every worker produces the same tag for the same data
+    digest = hashlib.sha1(f"{user_id}|{body}".encode()).hexdigest()
+    entry = {
+        "body": body,
+        "group_by": group_by,
+        "total": series["total"],
+        "has_data": bool(series["labels"]),
+        "etag": digest,
+        "last_modified": http_now(),
+    }
+    CHART_CACHE.put(key, entry)
+    return entry
+
+
+@timed(log)
+def summary_entry(user_id, group_by, currency, load_summary, start=None, end=None, category=None):
+    """Cached {body, group_by, total, has_data, etag, last_modified}.
+
+    load_summary(user_id, group_by, start, end, category) runs on a miss.
+    """
+    key, entry = cached_summary(user_id, group_by, start, end, category)
+    if entry is None:
+        entry = build_summary_entry(key, load_summary(user_id, key[1], start, end, category), currency)
+    return entry
+
+
+def chart_cache_stats():
+    return CHART_CACHE.stats()
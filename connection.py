@@ -0,0 +1,242 @@
+"""Lazy, fork-safe MongoClient management.
+
+The client is created on first use in each process, never at import time,
+so a pre-forking server (see gunicorn.conf.py) can import the app in the
+master and every worker still opens its own connection pool after fork().
+
+Configuration comes from the environment:
+
+    MONGO_URI                        mongodb://localhost:27017/
+    MONGO_DB                         Expense
+    MONGO_MAX_POOL_SIZE              100
+    MONGO_MIN_POOL_SIZE              0
+    MONGO_MAX_IDLE_TIME_MS           (driver default)
+    MONGO_WAIT_QUEUE_TIMEOUT_MS      (driver default)
+    MONGO_CONNECT_TIMEOUT_MS         5000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS 5000
+    MONGO_SOCKET_TIMEOUT_MS          (driver default)
+    MONGO_WRITE_CONCERN              w value, e.g. 1 or majority
+    MONGO_JOURNAL                    true/false
+
+The ASGI app (asgi_app.py) uses pymongo's AsyncMongoClient with the same
+options through get_async_client(); it is bound to the event loop that
+first used it.
+"""
+import asyncio
+import os
+import threading
+
+import pymongo as mg
+from pymongo import monitoring
+
+import metrics
+from instrumentation import active, record
+
+_INT_OPTIONS = {
+    "MONGO_MAX_POOL_SIZE": "maxPoolSize",
+    "MONGO_MIN_POOL_SIZE": "minPoolSize",
+    "MONGO_MAX_IDLE_TIME_MS": "maxIdleTimeMS",
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": "waitQueueTimeoutMS",
+    "MONGO_CONNECT_TIMEOUT_MS": "connectTimeoutMS",
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": "serverSelectionTimeoutMS",
+    "MONGO_SOCKET_TIMEOUT_MS": "socketTimeoutMS",
+}
+_DEFAULTS = {
+    "maxPoolSize": 100,
+    "connectTimeoutMS": 5000,
+    "serverSelectionTimeoutMS": 5000,
+}
+
+_client = None
+_client_pid = None
+_lock = threading.Lock()
+
+_async_client = None
+_async_client_key = None
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Attributes Mongo round trips and reply sizes to the active @timed call and request"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        metrics.add_phase("db", event.duration_micros / 1e6)
+        if not active():
+            return
+        counters = {"mongo_commands": 1, "mongo_ms": event.duration_micros / 1000}
+        reply = event.reply
+        batch = reply.get("cursor", {}).get("firstBatch") or reply.get("cursor", {}).get("nextBatch")
+        if batch is not None:
+            # Only computed while instrumentation is on for this call
+            from bson import encode
+            counters["bytes_fetched"] = len(encode(reply))
+        record(**counters)
+
+    def failed(self, event):
+        metrics.add_phase("db", event.duration_micros / 1e6)
+        record(mongo_commands=1, mongo_failures=1)
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Connection pool counters for this process's client"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(
+            ("created", "closed", "checked_out", "checked_in", "checkout_failed", "pool_cleared"), 0
+        )
+
+    def _inc(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._inc("pool_cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._inc("created")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._inc("closed")
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._inc("checkout_failed")
+
+    def connection_checked_out(self, event):
+        self._inc("checked_out")
+
+    def connection_checked_in(self, event):
+        self._inc("checked_in")
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats["open"] = stats["created"] - stats["closed"]
+        stats["in_use"] = stats["checked_out"] - stats["checked_in"]
+        return stats
+
+
+_pool_stats = PoolStats()
+
+
+def mongo_uri():
+    return os.environ.get("MONGO_URI", "mongodb://localhost:27017/")
+
+
+def client_options():
+    """Keyword arguments for MongoClient built from the environment"""
+    options = dict(_DEFAULTS)
+    for env_name, option in _INT_OPTIONS.items():
+        value = os.environ.get(env_name)
+        if value:
+            options[option] = int(value)
+    write_concern = os.environ.get("MONGO_WRITE_CONCERN")
+    if write_concern:
+        options["w"] = int(write_concern) if write_concern.isdigit() else write_concern
+    journal = os.environ.get("MONGO_JOURNAL")
+    if journal:
+        options["journal"] = journal.lower() in ("1", "true", "yes")
+    return options
+
+
+def get_client():
+    """This process's MongoClient, created on first use (and again after fork)"""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _lock:
+            if _client is None or _client_pid != pid:
+                _client = mg.MongoClient(
+                    mongo_uri(),
+                    event_listeners=[MongoCommandListener(), _pool_stats],
+                    **client_options()
+                )
+                _client_pid = pid
+    return _client
+
+
+def get_db():
+    return get_client()[os.environ.get("MONGO_DB", "Expense")]
+
+
+def get_async_client():
+    """This event loop's AsyncMongoClient, created on first use (pymongo >= 4.10)"""
+    global _async_client, _async_client_key
+    key = (os.getpid(), id(asyncio.get_running_loop()))
+    if _async_client is None or _async_client_key != key:
+        from pymongo import AsyncMongoClient
+        _async_client = AsyncMongoClient(
+            mongo_uri(),
+            event_listeners=[MongoCommandListener(), _pool_stats],
+            **client_options()
+        )
+        _async_client_key = key
+    return _async_client
+
+
+def get_async_db():
+    return get_async_client()[os.environ.get("MONGO_DB", "Expense")]
+
+
+async def close_async_client():
+    global _async_client, _async_client_key
+    if _async_client is not None and _async_client_key == (os.getpid(), id(asyncio.get_running_loop())):
+        await _async_client.close()
+    _async_client = None
+    _async_client_key = None
+
+
+def reset_client():
+    """Forget the current client so the next get_client() opens a fresh pool.
+
+    Call from a post-fork hook; the inherited client's sockets belong to the
+    parent and are left alone.
+    """
+    global _client, _client_pid, _async_client, _async_client_key
+    with _lock:
+        _client = None
+        _client_pid = None
+    _async_client = None
+    _async_client_key = None
+    with _pool_stats._lock:
+        for name in _pool_stats.counters:
+            _pool_stats.counters[name] = 0
+
+
+def close_client():
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+
+def pool_stats():
+    """Connection pool counters plus the effective pool options for this process"""
+    options = client_options()
+    stats = _pool_stats.snapshot()
+    stats.update({
+        "pid": os.getpid(),
+        "connected": _client is not None and _client_pid == os.getpid(),
+        "max_pool_size": options.get("maxPoolSize"),
+        "min_pool_size": options.get("minPoolSize", 0),
+    })
+    return stats
@@ -1,205 +1,696 @@
-import pymongo as mg
-import pandas as pd
+import base64
+import os
+import threading
 from datetime import datetime
-from bson.objectid import ObjectId
-from werkzeug.security import generate_password_hash, check_password_hash
+import metrics
+import passwords
+import search_index
+import user_cache
+from cache import LRUCache
+from instrumentation import get_logger, record, timed
+from storage import get_backend
+from storage.base import (
+    LOAD_BATCH_SIZE,
+    MINOR_UNITS,
+    SUMMARY_GROUPINGS,
+    empty_dashboard,
+    from_minor,
+    parse_minor,
+    to_minor,
+)
+
+log = get_logger("databases")
 
 # --- Configuration ---
-MONGO_URI = "mongodb://localhost:27017/"
-CLIENT = mg.MongoClient(MONGO_URI)
-DB = CLIENT["Expense"]
-USERS_COLLECTION = DB["users"]
-EXPENSES_COLLECTION = DB["My_bill"]
+# Storage lives behind storage.get_backend(), chosen with EXPENSE_BACKEND
+# ("mongo" or "sqlite"). The Mongo collections below are still importable for
+# older scripts; they resolve lazily and only make sense with the Mongo backend.
+def _mongo():
+    import storage.mongo
+    return storage.mongo
+
+_LAZY_ATTRIBUTES = {
+    "DB": lambda: _mongo().get_db(),
+    "USERS_COLLECTION": lambda: _mongo().users_collection(),
+    "EXPENSES_COLLECTION": lambda: _mongo().expenses_collection(),
+    "ROLLUPS_COLLECTION": lambda: _mongo().rollups_collection(),
+    "users_collection": lambda: _mongo().users_collection,
+    "expenses_collection": lambda: _mongo().expenses_collection,
+    "rollups_collection": lambda: _mongo().rollups_collection,
+}
+
+def __getattr__(name):
+    # Keeps `from databases import EXPENSES_COLLECTION` working without connecting at import time
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 CATEGORIES = ["Food", "Transport", "Shopping", "Others", "Utilities", "Entertainment"]
 
+# --- Data Versions & Caching ---
+# Each expense write bumps the user's data version, so cache entries keyed by
+# an older version are never served again. Versions live in this process only;
+# other workers see the change once their entries expire (EXPENSE_CACHE_TTL).
+_DATA_VERSIONS = {}
+_DATA_VERSIONS_LOCK = threading.Lock()
+
+def get_data_version(user_id):
+    """(version, changed_at) of a user's expense data as seen by this process"""
+    return _DATA_VERSIONS.get(str(user_id), (0, None))
+
+def bump_data_version(user_id):
+    user_id = str(user_id)
+    with _DATA_VERSIONS_LOCK:
+        version, _ = _DATA_VERSIONS.get(user_id, (0, None))
+        _DATA_VERSIONS[user_id] = (version + 1, datetime.now())
+    EXPENSE_FRAME_CACHE.invalidate(lambda key: key[0] == user_id)
+    SEARCH_INDEX_CACHE.invalidate(lambda key: key[0] == user_id)
+
+def _frame_nbytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+EXPENSE_FRAME_CACHE = LRUCache(
+    max_entries=int(os.environ.get("EXPENSE_CACHE_ENTRIES", 64)),
+    max_bytes=int(os.environ.get("EXPENSE_CACHE_BYTES", 256 * 1024 * 1024)),
+    ttl=float(os.environ.get("EXPENSE_CACHE_TTL", 300)),
+    sizeof=_frame_nbytes,
+)
+
+def expense_cache_stats():
+    return EXPENSE_FRAME_CACHE.stats()
+
+# In-process notes indexes for backends without text search (see search_expenses)
+SEARCH_INDEX_CACHE = LRUCache(
+    max_entries=int(os.environ.get("SEARCH_INDEX_ENTRIES", 32)),
+    max_bytes=int(os.environ.get("SEARCH_INDEX_BYTES", 128 * 1024 * 1024)),
+    ttl=float(os.environ.get("SEARCH_INDEX_TTL", os.environ.get("EXPENSE_CACHE_TTL", 300))),
+    sizeof=lambda index: index.nbytes,
+)
+
+# --- Indexes & Schema ---
+@timed(log)
+def ensure_indexes():
+    """Create the backend's schema and indexes if missing. Safe to run repeatedly."""
+    return get_backend().ensure_schema()
+
+def index_report():
+    """Which indexes exist and which queries each one covers"""
+    return get_backend().index_report()
+
+def reset_all():
+    """Delete every user and expense (testing only)"""
+    get_backend().reset()
+    with _DATA_VERSIONS_LOCK:
+        _DATA_VERSIONS.clear()
+    EXPENSE_FRAME_CACHE.clear()
+    SEARCH_INDEX_CACHE.clear()
+    user_cache.clear()
+
 # --- User Management Functions ---
+@timed(log)
 def create_user(username, password):
-    """Create a new user with hashed password"""
-    if USERS_COLLECTION.find_one({"username": username}):
-        return False
-    # Use proper password hashing
-    password_hash = generate_password_hash(password)
+    """Create a new user with hashed password.
+
+    Hashing runs on the password pool and raises passwords.PoolSaturated
+    when it is full.
+    """
+    return insert_user(username, passwords.hash_password(password))
+
+def insert_user(username, password_hash):
     user_data = {
-        "username": username, 
+        "username": username,
         "password_hash": password_hash,
         "created_at": datetime.now()
     }
-    result = USERS_COLLECTION.insert_one(user_data)
-    return True
+    # The backend's unique username index rejects taken usernames
+    return get_backend().create_user(user_data) is not None
 
 def get_user_by_username(username):
-    return USERS_COLLECTION.find_one({"username": username})
+    return get_backend().get_user_by_username(username)
 
 def get_user_by_id(user_id):
     try:
-        return USERS_COLLECTION.find_one({"_id": ObjectId(user_id)})
+        return get_backend().get_user_by_id(user_id)
     except Exception:
         return None
 
+def update_user(user_id, changes):
+    """Change fields of a user and drop cached copies of them"""
+    updated = get_backend().update_user(user_id, changes)
+    user_cache.invalidate(user_id)
+    return updated
+
+@timed(log)
 def verify_password(user, password):
-    """Verify user password"""
-    if user and 'password_hash' in user:
-        return check_password_hash(user['password_hash'], password)
+    """Verify user password on the password pool (raises passwords.PoolSaturated when it is full)"""
+    if user and 'password_hash' in user and passwords.check_password(user['password_hash'], password):
+        upgrade_password_hash(user, password)
+        return True
     return False
 
+def upgrade_password_hash(user, password):
+    """After a successful login, re-hash passwords stored with outdated parameters (in the background)"""
+    if not passwords.needs_rehash(user['password_hash']):
+        return
+
+    def store(password_hash):
+        try:
+            update_user(user['_id'], {"password_hash": password_hash})
+        except Exception as e:
+            log.error("Error upgrading password hash: %s", e)
+
+    passwords.rehash_in_background(password, store)
+
 # --- Expense Management Functions ---
+def _amount_fields(amount):
+    """{"Amount", "amount_minor"} for a submitted amount; raises ValueError when it is not a number"""
+    minor, reason = parse_minor(amount)
+    if minor is None:
+        raise ValueError(f"Invalid amount {amount!r}: {reason}")
+    return {"Amount": from_minor(minor), "amount_minor": minor}
+
+@timed(log)
 def add_expenses(user_id, amount, category, date_str, notes):
     try:
         date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-        # FIX: Ensure amount is properly converted to float
-        amount_float = float(amount)
-        print(f"DEBUG: Adding expense - Amount: {amount_float}, Type: {type(amount_float)}")
-        
         record = {
-            "user_id": ObjectId(user_id),
-            "Amount": amount_float,  # Use the properly converted float
+            **_amount_fields(amount),
             "category": category,
             "date": date_obj,
             "notes": notes if notes else "No notes"
         }
-        result = EXPENSES_COLLECTION.insert_one(record)
-        print(f"DEBUG: Expense added with ID: {result.inserted_id}")
+        expense_id = get_backend().insert_expense(user_id, record)
+        log.debug("expense_added", extra={"metrics": {"expense_id": expense_id}})
+        bump_data_version(user_id)
         return True
     except Exception as e:
-        print(f"Error adding expense: {e}")
+        log.error("Error adding expense: %s", e)
         return False
 
-def get_user_expenses_df(user_id):
-    try:
-        expenses = list(EXPENSES_COLLECTION.find({"user_id": ObjectId(user_id)}).sort("date", 1))
-        if not expenses:
-            return pd.DataFrame()
+# --- Rollups ---
+# The Mongo backend keeps per-day/week/month/category totals up to date on
+# every write (see storage/mongo.py); other backends aggregate on read and
+# treat these as no-ops.
+@timed(log)
+def rebuild_rollups(user_id=None):
+    """Recompute rollups from raw expenses for one user (or all users). Returns the number of users rebuilt."""
+    return get_backend().rebuild_rollups(user_id)
 
-        # Debug: Print raw data from MongoDB
-        print("=== RAW MONGODB DATA ===")
-        for expense in expenses:
-            print(f"ID: {expense.get('_id')}, Amount: {expense.get('Amount')} (type: {type(expense.get('Amount'))}), Category: {expense.get('category')}")
+@timed(log)
+def verify_rollups(user_id=None, tolerance=0.005):
+    """Compare stored rollups against raw expenses; returns a list of drifted buckets"""
+    return get_backend().verify_rollups(user_id, tolerance)
 
-        df = pd.DataFrame(expenses)
-        df = df.drop(columns=["_id", "user_id"], errors="ignore")
+# --- Amount Migration ---
+# Rejected rows beyond this are counted but not kept in the report
+MAX_REPORTED_QUARANTINED = 1000
 
-        df["date"] = pd.to_datetime(df["date"])
-        df["display_date"] = df["date"].dt.strftime("%d/%m/%y")
+@timed(log)
+def migrate_amounts(batch_size=LOAD_BATCH_SIZE, dry_run=False, progress=None):
+    """Rewrite every stored amount as integer minor units (amount_minor), batch by batch.
 
-        # FIX: Check if Amount column exists and handle it properly
-        if 'Amount' in df.columns:
-            print(f"DEBUG: Amount column before conversion: {df['Amount'].tolist()}")
-            df["Amount"] = pd.to_numeric(df["Amount"], errors='coerce')
-            print(f"DEBUG: Amount column after conversion: {df['Amount'].tolist()}")
-        else:
-            print("ERROR: 'Amount' column not found in DataFrame!")
-            print(f"Available columns: {df.columns.tolist()}")
-        
-        df.dropna(subset=["Amount"], inplace=True)
+    Expenses whose Amount is not a usable number are moved to the backend's
+    quarantine store with the reason. Only expenses without amount_minor are
+    read, so an interrupted run resumes where it stopped. Rollups are rebuilt
+    at the end. progress(report) is called after every batch; dry_run
+    reports without writing. Returns {"scanned", "converted", "quarantined",
+    "rejects": [{"id", "amount", "reason"}], "truncated"}.
+    """
+    backend = get_backend()
+    report = {"scanned": 0, "converted": 0, "quarantined": 0, "rejects": [], "truncated": False}
+    after = None
+    while True:
+        batch = backend.legacy_amounts(after, batch_size)
+        if not batch:
+            break
+        after = batch[-1][0]
+        converted, quarantined = [], []
+        for expense_id, amount in batch:
+            minor, reason = parse_minor(amount)
+            if minor is not None:
+                converted.append((expense_id, minor))
+                continue
+            quarantined.append((expense_id, reason))
+            if len(report["rejects"]) < MAX_REPORTED_QUARANTINED:
+                report["rejects"].append({"id": str(expense_id), "amount": repr(amount), "reason": reason})
+            else:
+                report["truncated"] = True
+        if not dry_run:
+            backend.migrate_amounts(converted, quarantined)
+        report["scanned"] += len(batch)
+        report["converted"] += len(converted)
+        report["quarantined"] += len(quarantined)
+        record(docs=len(batch))
+        if progress is not None:
+            progress(report)
+
+    if not dry_run:
+        # Quarantined expenses left their buckets, and rollups now count minor units
+        backend.rebuild_rollups()
+    return report
+
+# pandas and numpy are imported inside the frame builders below, so importing
+# this module (and the web app) does not pay for them; see benchmarks/import_budget.py
+# Columns get_user_expenses_df can load; display_date is derived from date.
+# Loading Amount also adds the exact amount_minor (int64) column.
+EXPENSE_FRAME_COLUMNS = ("date", "Amount", "category", "notes")
+OPTIONAL_FRAME_COLUMNS = ("display_date",)
+
+def _grow(arrays, size):
+    import numpy as np
+    return {name: np.resize(values, size) for name, values in arrays.items()}
+
+class FrameBuilder:
+    """Column arrays filled one document at a time, turned into a DataFrame by frame().
+
+    fields is a subset of EXPENSE_FRAME_COLUMNS (plus amount_minor). Amounts
+    are read as integer minor units; Amount is derived from them. Rows not
+    yet migrated fall back to converting Amount, and are dropped when it is
+    not a number, as before. Documents are never kept, so memory holds the
+    columns rather than a dict per row.
+    """
+
+    def __init__(self, fields, size_hint=0):
+        import numpy as np
+
+        self.capacity = max(size_hint, 1)
+        self.count = 0
+        self.unusable = []
+        self.arrays = {}
+        if "date" in fields:
+            self.arrays["date"] = np.empty(self.capacity, dtype="datetime64[ms]")
+        if "Amount" in fields:
+            self.arrays["amount_minor"] = np.empty(self.capacity, dtype=np.int64)
+        for name in ("category", "notes"):
+            if name in fields:
+                self.arrays[name] = np.empty(self.capacity, dtype=object)
+
+    def add_all(self, docs):
+        arrays = self.arrays
+        dates, minors = arrays.get("date"), arrays.get("amount_minor")
+        categories, notes = arrays.get("category"), arrays.get("notes")
+        count = self.count
+        for doc in docs:
+            if count == self.capacity:
+                # More documents than counted (concurrent inserts): grow geometrically
+                self.capacity *= 2
+                arrays = self.arrays = _grow(arrays, self.capacity)
+                dates, minors = arrays.get("date"), arrays.get("amount_minor")
+                categories, notes = arrays.get("category"), arrays.get("notes")
+            if dates is not None:
+                dates[count] = doc.get("date")
+            if minors is not None:
+                value = doc.get("amount_minor")
+                if value is None:
+                    # Not migrated yet (see migrate_amounts)
+                    value = to_minor(doc.get("Amount"))
+                    if value is None:
+                        self.unusable.append(count)
+                        value = 0
+                minors[count] = value
+            if categories is not None:
+                categories[count] = doc.get("category")
+            if notes is not None:
+                notes[count] = doc.get("notes")
+            count += 1
+        self.count = count
+
+    @metrics.phase("pandas")
+    def frame(self):
+        import numpy as np
+        import pandas as pd
+
+        if self.count == 0:
+            return pd.DataFrame()
+        keep = slice(0, self.count)
+        if self.unusable:
+            keep = np.setdiff1d(np.arange(self.count), self.unusable)
+        minors = self.arrays.get("amount_minor")
+        data = {}
+        for name in EXPENSE_FRAME_COLUMNS:
+            if name == "Amount" and minors is not None:
+                data["Amount"] = minors[keep] / MINOR_UNITS
+                data["amount_minor"] = minors[keep]
+                continue
+            if name not in self.arrays:
+                continue
+            values = self.arrays[name][keep]
+            if name == "category":
+                values = pd.Categorical(values)
+            data[name] = values
+        return pd.DataFrame(data)
+
+@metrics.phase("pandas")
+def _frame_from_cursor(cursor, fields, size_hint=0):
+    """Stream documents into preallocated column arrays and build a DataFrame from them"""
+    builder = FrameBuilder(fields, size_hint)
+    builder.add_all(cursor)
+    return builder.frame()
+
+@timed(log)
+def get_user_expenses_df(user_id, columns=EXPENSE_FRAME_COLUMNS, start=None, end=None, category=None):
+    """User's expenses as a DataFrame, newest first.
 
-        return df.sort_values(by="date", ascending=False)
+    columns selects which of date, Amount, category, notes (and the derived
+    display_date) are fetched; only those fields are read from the backend.
+    start (inclusive) / end (exclusive) datetimes and category limit the rows
+    in the query itself. Frames are cached per (user, data version, columns,
+    filters); callers always get a copy they are free to modify.
+    """
+    import pandas as pd
+
+    cache_key, cached = _cached_frame(user_id, columns, start, end, category)
+    if cached is not None:
+        return cached
+    try:
+        fields = _frame_fields(columns)
+        backend = get_backend()
+        size_hint = backend.count_expenses(user_id, category, start, end)
+        if size_hint == 0:
+            return pd.DataFrame()
+        # The (user_id, date, id) index returns the rows already in display order
+        docs = backend.iter_expenses(
+            user_id, fields=fields, category=category, start=start, end=end,
+            newest_first=True, batch_size=LOAD_BATCH_SIZE,
+        )
+        return _store_frame(cache_key, _frame_from_cursor(docs, fields, size_hint), columns)
     except Exception as e:
-        print(f"Error fetching expenses: {e}")
+        log.error("Error fetching expenses: %s", e)
         return pd.DataFrame()
 
-def get_summary_data(user_id, group_by="category"):
-    df = get_user_expenses_df(user_id)
-    
-    if df.empty:
-        print("DEBUG: No expenses found")
+def _cached_frame(user_id, columns, start=None, end=None, category=None):
+    """(cache key, copy of the cached frame or None)"""
+    cache_key = (str(user_id), get_data_version(user_id)[0], tuple(columns), start, end, category)
+    cached = EXPENSE_FRAME_CACHE.get(cache_key)
+    if cached is not None:
+        record(cache_hits=1, docs=len(cached))
+        return cache_key, cached.copy()
+    record(cache_misses=1)
+    return cache_key, None
+
+def _frame_fields(columns):
+    """Stored fields needed to build the requested frame columns"""
+    unknown = set(columns) - set(EXPENSE_FRAME_COLUMNS) - set(OPTIONAL_FRAME_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown expense columns: {sorted(unknown)}")
+    fields = [name for name in EXPENSE_FRAME_COLUMNS if name in columns]
+    if "display_date" in columns and "date" not in fields:
+        fields.insert(0, "date")
+    if "Amount" in fields:
+        # Amount itself is only read for rows that predate amount_minor
+        fields.append("amount_minor")
+    return fields
+
+def _add_display_date(df, columns):
+    if "display_date" in columns and not df.empty:
+        from bucketing import format_dates
+        # strftime once per distinct day rather than once per row
+        df["display_date"] = format_dates(df["date"].to_numpy(), "%d/%m/%y")
+    return df
+
+def _store_frame(cache_key, df, columns):
+    _add_display_date(df, columns)
+    record(docs=len(df))
+    EXPENSE_FRAME_CACHE.put(cache_key, df)
+    return df.copy()
+
+def raw_expenses(user_id):
+    """Every stored field of a user's expenses, unconverted (debug routes)"""
+    return list(get_backend().iter_expenses(user_id))
+
+@timed(log)
+def get_summary_data(user_id, group_by="category", start=None, end=None, category=None):
+    """Totals grouped by category, month or week, computed by the storage backend"""
+    import pandas as pd
+
+    group_by = group_by if group_by in SUMMARY_GROUPINGS else "category"
+    try:
+        rows = get_backend().summary(user_id, group_by, start, end, category)
+        record(docs=len(rows))
+    except Exception as e:
+        log.error("Error building summary: %s", e)
         return pd.DataFrame(columns=["Group", "Total"])
 
-    # FIX: Check if we have the right column and data
-    print(f"DEBUG: DataFrame columns: {df.columns.tolist()}")
-    if 'Amount' not in df.columns:
-        print("ERROR: 'Amount' column missing! Available columns:", df.columns.tolist())
+    return _summary_frame(rows)
+
+@metrics.phase("pandas")
+def _summary_frame(rows):
+    """Group/Total DataFrame from [(group, total)] rows"""
+    import pandas as pd
+
+    if not rows:
         return pd.DataFrame(columns=["Group", "Total"])
-    
-    print(f"DEBUG: Amount values: {df['Amount'].tolist()}")
-    print(f"DEBUG: Amount data type: {df['Amount'].dtype}")
-
-    if group_by == "month":
-        df["Group"] = df["date"].dt.strftime("%Y-%m")
-    elif group_by == "week":
-        df["Group"] = df["date"].dt.strftime("%Y-W%U")
-    else:
-        df["Group"] = df["category"]
-
-    # FIX: Use the correct column name and ensure it's numeric
-    grouped = df.groupby("Group", as_index=False)["Amount"].sum()
-    grouped.rename(columns={"Amount": "Total"}, inplace=True)
-    grouped["Total"] = pd.to_numeric(grouped["Total"], errors='coerce').round(2)
-    
-    print(f"DEBUG: Final grouped data for chart:")
-    print(grouped)
-    
-    return grouped
-
-def get_dashboard_stats(user_id):
-    df = get_user_expenses_df(user_id)
-    if df.empty:
-        return {"total_expenses": 0, "month_expenses": 0, "week_expenses": 0, "total_records": 0, "category_breakdown": {}}
-
-    total = df["Amount"].sum().round(2)
-    total_records = len(df)
-
-    today = datetime.now()
-    df["YearMonth"] = df["date"].dt.to_period("M").astype(str)
-    df["YearWeek"] = df["date"].dt.strftime("%Y-%U")
-
-    month_expenses = df[df["YearMonth"] == today.strftime("%Y-%m")]["Amount"].sum().round(2)
-    week_expenses = df[df["YearWeek"] == today.strftime("%Y-%U")]["Amount"].sum().round(2)
-
-    category_breakdown = df.groupby("category")["Amount"].sum().sort_values(ascending=False).to_dict()
-
-    return {
-        "total_expenses": total,
-        "month_expenses": month_expenses,
-        "week_expenses": week_expenses,
-        "total_records": total_records,
-        "category_breakdown": category_breakdown
-    }
 
+    # Backends return exact totals (summed in minor units), so there is nothing to coerce
+    return pd.DataFrame(rows, columns=["Group", "Total"])
+
+@timed(log)
+def get_dashboard_stats(user_id, start=None, end=None, category=None):
+    """Dashboard totals and category breakdown, computed by the storage backend.
+
+    With start/end/category every figure covers only the matching expenses
+    (the month and week totals are the part of the range in those periods).
+    """
+    try:
+        return get_backend().dashboard_stats(user_id, datetime.now(), category, start, end)
+    except Exception as e:
+        log.error("Error building dashboard stats: %s", e)
+        return empty_dashboard()
+
+@timed(log)
 def get_expense_by_id(expense_id, user_id):
     """Get expense by ID for specific user"""
     try:
-        expense = EXPENSES_COLLECTION.find_one({"_id": ObjectId(expense_id), "user_id": ObjectId(user_id)})
+        expense = get_backend().get_expense(expense_id, user_id)
         if expense:
             expense["id"] = str(expense["_id"])
         return expense
     except:
         return None
 
+@timed(log)
 def update_expense(expense_id, user_id, amount, category, date_str, notes):
     """Update an existing expense"""
     try:
         date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-        EXPENSES_COLLECTION.update_one(
-            {"_id": ObjectId(expense_id), "user_id": ObjectId(user_id)},
-            {"$set": {
-                "Amount": float(amount),
-                "category": category,
-                "date": date_obj,
-                "notes": notes if notes else "No notes"
-            }}
-        )
+        changes = {
+            **_amount_fields(amount),
+            "category": category,
+            "date": date_obj,
+            "notes": notes if notes else "No notes"
+        }
+        if get_backend().update_expense(expense_id, user_id, changes):
+            bump_data_version(user_id)
         return True
     except Exception as e:
-        print(f"Error updating expense: {e}")
+        log.error("Error updating expense: %s", e)
         return False
 
+@timed(log)
 def delete_expense(expense_id, user_id):
     """Delete an expense"""
     try:
-        result = EXPENSES_COLLECTION.delete_one({"_id": ObjectId(expense_id), "user_id": ObjectId(user_id)})
-        return result.deleted_count > 0
+        if not get_backend().delete_expense(expense_id, user_id):
+            return False
+        bump_data_version(user_id)
+        return True
     except:
         return False
 
-def view_expenses_by_user(user_id):
+def view_expenses_by_user(user_id, start=None, end=None, category=None):
     """Get expenses for view template"""
     try:
-        expenses = list(EXPENSES_COLLECTION.find({"user_id": ObjectId(user_id)}).sort("date", -1))
+        expenses = list(get_backend().iter_expenses(
+            user_id, category=category, start=start, end=end, newest_first=True
+        ))
         for expense in expenses:
             expense["id"] = str(expense["_id"])
             if isinstance(expense["date"], datetime):
                 expense["date"] = expense["date"].strftime("%d/%m/%Y")
         return expenses
     except Exception as e:
-        print(f"Error fetching expenses: {e}")
-        return []
\ No newline at end of file
+        log.error("Error fetching expenses: %s", e)
+        return []
+
+# --- Paginated Listing ---
+VIEW_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def _encode_cursor(expense):
+    raw = f"{expense['date'].isoformat()}|{expense['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(token):
+    """(date, id) from a page token; raises ValueError for malformed tokens"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        date_str, expense_id = raw.split("|")
+        return datetime.fromisoformat(date_str), expense_id
+    except Exception:
+        raise ValueError(f"Invalid page token: {token!r}")
+
+def _page_request(after, before, page_size):
+    """(page_size, boundary, direction) for a backend page_expenses call"""
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    boundary = None
+    if after or before:
+        boundary = _decode_cursor(after or before)
+    # "before" walks backwards towards newer rows; _page_result flips the page back to newest-first
+    return page_size, boundary, "before" if before else "after"
+
+@timed(log)
+def view_expenses_page(user_id, after=None, before=None, page_size=VIEW_PAGE_SIZE, category=None, start=None, end=None):
+    """One page of expenses (newest first) using keyset pagination on (date, id).
+
+    after/before are tokens from a previous page's next_cursor/prev_cursor.
+    Returns {"expenses", "next_cursor", "prev_cursor", "page_size"}.
+    """
+    page_size, boundary, direction = _page_request(after, before, page_size)
+    try:
+        expenses = get_backend().page_expenses(
+            user_id, page_size + 1, boundary, direction, category=category, start=start, end=end
+        )
+    except ValueError:
+        # Malformed id inside the page token: the caller rejects it like a bad token
+        raise
+    except Exception as e:
+        log.error("Error fetching expenses: %s", e)
+        expenses = []
+
+    return _page_result(expenses, page_size, after, before)
+
+def _page_result(expenses, page_size, after=None, before=None):
+    """Trim the page_size + 1 fetched rows into a page with its neighbour cursors"""
+    record(docs=len(expenses))
+    has_more = len(expenses) > page_size
+    expenses = expenses[:page_size]
+    if before:
+        expenses.reverse()
+
+    next_cursor = prev_cursor = None
+    if expenses:
+        if has_more or before:
+            next_cursor = _encode_cursor(expenses[-1])
+        if after or (before and has_more):
+            prev_cursor = _encode_cursor(expenses[0])
+
+    for expense in expenses:
+        expense["id"] = str(expense["_id"])
+        if isinstance(expense["date"], datetime):
+            expense["date"] = expense["date"].strftime("%d/%m/%Y")
+    return {"expenses": expenses, "next_cursor": next_cursor, "prev_cursor": prev_cursor, "page_size": page_size}
+
+def iter_expenses(user_id, category=None, start=None, end=None, batch_size=LOAD_BATCH_SIZE):
+    """Stream a user's expenses (oldest first) in batches from the backend"""
+    fields = ["date", "Amount", "category", "notes"]
+    yield from get_backend().iter_expenses(
+        user_id, fields=fields, category=category, start=start, end=end, batch_size=batch_size
+    )
+
+@timed(log)
+def get_expenses_total(user_id, category=None, start=None, end=None):
+    """Grand total and record count of the expenses matching the listing filters"""
+    try:
+        return get_backend().expenses_total(user_id, category, start, end)
+    except Exception as e:
+        log.error("Error computing expense total: %s", e)
+        return {"total": 0, "count": 0}
+
+# --- Notes Search ---
+SEARCH_PAGE_SIZE = 20
+# Deepest result served: every page is sorted and skipped up to its offset,
+# so unbounded page numbers would make deep pages grow with the history
+MAX_SEARCH_RESULTS = 1000
+SEARCH_FIELDS = ["_id", "date", "Amount", "amount_minor", "category", "notes"]
+
+def _search_request(page, page_size, min_amount=None, max_amount=None):
+    """(page, page_size, offset, min_minor, max_minor) for a backend search_expenses call"""
+    page = max(1, int(page))
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    min_minor = to_minor(min_amount) if min_amount is not None else None
+    max_minor = to_minor(max_amount) if max_amount is not None else None
+    return page, page_size, (page - 1) * page_size, min_minor, max_minor
+
+def _search_result(expenses, query, page, page_size):
+    """Trim the page_size + 1 fetched matches into a page with highlighted snippets"""
+    record(docs=len(expenses))
+    offset = (page - 1) * page_size
+    has_more = len(expenses) > page_size and offset + page_size < MAX_SEARCH_RESULTS
+    expenses = expenses[:page_size]
+    terms = search_index.highlight_terms(query)
+    for expense in expenses:
+        expense["id"] = str(expense["_id"])
+        expense["snippet"] = search_index.snippet(expense.get("notes") or "", terms)
+        if isinstance(expense["date"], datetime):
+            expense["date"] = expense["date"].strftime("%d/%m/%Y")
+    return {"expenses": expenses, "query": query, "page": page, "page_size": page_size, "has_more": has_more}
+
+def notes_index(user_id):
+    """The user's NotesIndex for their current data version, built on a miss"""
+    key = (str(user_id), get_data_version(user_id)[0])
+    index = SEARCH_INDEX_CACHE.get(key)
+    record(**{"search_index_hits" if index is not None else "search_index_misses": 1})
+    if index is None:
+        index = search_index.NotesIndex(get_backend().iter_expenses(user_id, fields=SEARCH_FIELDS))
+        SEARCH_INDEX_CACHE.put(key, index)
+    return index
+
+@timed(log)
+def search_expenses(user_id, query, page=1, page_size=SEARCH_PAGE_SIZE, category=None, min_amount=None, max_amount=None):
+    """One page of the user's expenses whose notes match query, best match first, then newest first.
+
+    query uses MongoDB $text syntax (words, -excluded, "phrases"). The
+    backend's text index answers it when there is one; otherwise an
+    in-process index of the user's notes (search_index.NotesIndex).
+    Returns {"expenses", "query", "page", "page_size", "has_more"}; each
+    expense has a "snippet" of (text, highlighted) segments.
+    """
+    query = (query or "").strip()
+    page, page_size, offset, min_minor, max_minor = _search_request(page, page_size, min_amount, max_amount)
+    if not query or offset >= MAX_SEARCH_RESULTS:
+        return _search_result([], query, page, page_size)
+    backend = get_backend()
+    try:
+        if backend.text_search:
+            expenses = backend.search_expenses(
+                user_id, query, page_size + 1, offset, category=category, min_minor=min_minor, max_minor=max_minor
+            )
+        else:
+            expenses = notes_index(user_id).search(
+                query, page_size + 1, offset, category=category, min_minor=min_minor, max_minor=max_minor
+            )
+    except Exception as e:
+        log.error("Error searching expenses: %s", e)
+        expenses = []
+    return _search_result(expenses, query, page, page_size)
+
+# --- Bulk Writes ---
+@timed(log)
+def add_expenses_bulk(user_id, dates, amounts, categories, notes):
+    """Insert many validated expenses in one batch without stopping at failures.
+
+    Arguments are aligned pandas Series (datetime64, amounts as numbers or
+    numeric strings, str, str); amounts are converted with parse_minor.
+    Returns {"inserted": n, "errors": [(position, message), ...]} where
+    position indexes into the given Series.
+    """
+    records, positions, errors = [], [], []
+    rows = zip(dates.dt.to_pydatetime(), amounts.tolist(), categories.tolist(), notes.tolist())
+    for position, (date, amount, category, note) in enumerate(rows):
+        minor, reason = parse_minor(amount)
+        if minor is None:
+            errors.append((position, f"invalid amount: {reason}"))
+            continue
+        records.append({
+            "Amount": from_minor(minor), "amount_minor": minor, "category": category, "date": date, "notes": note,
+        })
+        positions.append(position)
+    if not records:
+        return {"inserted": 0, "errors": errors}
+
+    failed = get_backend().insert_expenses(user_id, records)
+    errors += [(positions[index], message) for index, message in failed]
+    inserted = len(records) - len(failed)
+    if inserted:
+        bump_data_version(user_id)
+    return {"inserted": inserted, "errors": errors}
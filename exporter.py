@@ -0,0 +1,127 @@
+"""Streaming expense export as CSV, JSON lines or Parquet.
+
+Each exporter consumes databases.iter_expenses (a batched Mongo cursor) and
+yields encoded chunks, so a response can start immediately and never holds
+the whole dataset in memory. Parquet needs the optional pyarrow package.
+"""
+import csv
+import io
+import json
+
+import databases
+from storage.base import to_amount
+
+EXPORT_COLUMNS = ["date", "amount", "category", "notes"]
+# Rows encoded per yielded chunk (CSV / JSON lines) or per Parquet row group
+EXPORT_CHUNK_ROWS = 1000
+PARQUET_ROW_GROUP_ROWS = 50000
+
+
+def _rows(docs):
+    for doc in docs:
+        date = doc.get("date")
+        yield (
+            date.strftime("%Y-%m-%d") if date is not None else None,
+            to_amount(doc.get("Amount")),
+            doc.get("category"),
+            doc.get("notes"),
+        )
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_csv(docs):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in _batches(_rows(docs), EXPORT_CHUNK_ROWS):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Header only: no expenses matched
+        yield buffer.getvalue()
+
+
+def stream_ndjson(docs):
+    for batch in _batches(_rows(docs), EXPORT_CHUNK_ROWS):
+        yield "".join(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n" for row in batch)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands out whatever has been written since the last drain()"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def stream_parquet(docs, row_group_rows=PARQUET_ROW_GROUP_ROWS):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("date", pa.string()),
+        ("amount", pa.float64()),
+        ("category", pa.string()),
+        ("notes", pa.string()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    try:
+        for batch in _batches(_rows(docs), row_group_rows):
+            columns = list(zip(*batch))
+            writer.write_table(pa.table({name: list(values) for name, values in zip(EXPORT_COLUMNS, columns)}, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+EXPORT_FORMATS = {
+    "csv": {"mimetype": "text/csv", "extension": "csv", "stream": stream_csv},
+    "ndjson": {"mimetype": "application/x-ndjson", "extension": "ndjson", "stream": stream_ndjson},
+    "parquet": {"mimetype": "application/vnd.apache.parquet", "extension": "parquet", "stream": stream_parquet},
+}
+
+
+def export_expenses(user_id, fmt="csv", category=None, start=None, end=None):
+    """Generator of encoded chunks for a user's expenses in the given format"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    docs = databases.iter_expenses(user_id, category=category, start=start, end=end)
+    return EXPORT_FORMATS[fmt]["stream"](docs)
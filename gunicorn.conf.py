@@ -0,0 +1,41 @@
+"""Production entry point:
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The app is preloaded in the master (so startup work such as ensure_indexes
+runs once), along with the heavy modules it imports lazily (see preload.py;
+EXPENSE_PRELOAD=0 skips them). Each worker drops the inherited MongoClient
+after fork, opening its own pool on first use. Keep MONGO_MAX_POOL_SIZE at
+or above GUNICORN_THREADS.
+"""
+import multiprocessing
+import os
+import sys
+
+import passwords
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_class = "gthread" if threads > 1 else "sync"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+preload_app = True
+
+
+def when_ready(server):
+    # Runs in the master before the first fork
+    if os.environ.get("EXPENSE_PRELOAD", "1") != "0":
+        from preload import preload
+        server.log.info("Preloaded modules: %s", preload())
+
+
+def post_fork(server, worker):
+    # connection is only imported once the MongoDB backend has been used
+    if "connection" in sys.modules:
+        sys.modules["connection"].reset_client()
+
+
+def worker_exit(server, worker):
+    if "connection" in sys.modules:
+        sys.modules["connection"].close_client()
+    passwords.POOL.shutdown()
@@ -0,0 +1,55 @@
+"""Conditional GET helpers (ETag / Last-Modified) shared by the Flask and ASGI apps.
+
+Works with either framework's request object, since both expose werkzeug's
+parsed if_none_match / if_modified_since headers.
+"""
+import hashlib
+import os
+from datetime import datetime, timezone
+
+# Browsers must revalidate, but may keep the copy for a 304
+CACHE_CONTROL = "private, no-cache"
+
+
+def http_now():
+    """Current UTC time at the one-second precision of HTTP dates"""
+    return datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def templates_version(folder):
+    """Digest of every template under folder, so a template deploy changes page ETags"""
+    digest = hashlib.sha1()
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, folder).encode())
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def page_etag(data_etag, version):
+    """ETag for an HTML page rendered from data tagged data_etag with templates/app at version"""
+    return hashlib.sha1(f"{version}|{data_etag}".encode()).hexdigest()
+
+
+def has_pending_flashes(session):
+    # A 304 would hide flashed messages that the full page is about to show
+    return bool(session.get("_flashes"))
+
+
+def not_modified(request, etag, last_modified):
+    """Whether the client's cached copy (If-None-Match, else If-Modified-Since) is current"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def validator_headers(etag, last_modified):
+    headers = {"ETag": f'"{etag}"', "Cache-Control": CACHE_CONTROL}
+    if last_modified:
+        headers["Last-Modified"] = last_modified.strftime("%a, %d %b %Y %H:%M:%S GMT")
+    return headers
@@ -0,0 +1,123 @@
+"""Streaming CSV / JSON-lines importer for expenses.
+
+Files are read in chunks of batch_size rows, validated column-wise with
+pandas and written with unordered insert_many batches, so memory stays flat
+regardless of file size. Invalid rows are reported and skipped; they never
+abort the rest of their batch.
+
+Expected columns (header names are case-insensitive):
+    date      YYYY-MM-DD (DD/MM/YYYY is also accepted)
+    amount    non-negative number (thousands separators allowed)
+    category  one of databases.CATEGORIES
+    notes     optional
+"""
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+import databases
+from instrumentation import get_logger, record, timed
+from storage.base import parse_minor
+
+log = get_logger("importer")
+
+IMPORT_BATCH_SIZE = 1000
+# Rejected rows beyond this are counted but not kept in the report
+MAX_REPORTED_REJECTS = 1000
+IMPORT_FORMATS = ("csv", "jsonl")
+REQUIRED_COLUMNS = ("date", "amount", "category")
+
+
+def detect_format(filename):
+    """Import format from a file name, defaulting to csv"""
+    ext = os.path.splitext(filename or "")[1].lower()
+    return "jsonl" if ext in (".jsonl", ".ndjson", ".json") else "csv"
+
+
+def _read_chunks(fileobj, fmt, batch_size):
+    if not isinstance(fileobj, io.TextIOBase):
+        fileobj = io.TextIOWrapper(fileobj, encoding="utf-8", newline="")
+    if fmt == "csv":
+        return pd.read_csv(fileobj, chunksize=batch_size, dtype=str, keep_default_na=False, skipinitialspace=True)
+    if fmt == "jsonl":
+        return pd.read_json(fileobj, lines=True, chunksize=batch_size, dtype=False, convert_dates=False)
+    raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def _validate_chunk(chunk):
+    """Split a raw chunk into (valid columns, reject reasons per row)"""
+    chunk = chunk.rename(columns=lambda name: str(name).strip().lower())
+    missing = [name for name in REQUIRED_COLUMNS if name not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+
+    # Exact minor units from the raw values, as the add-expense form stores them;
+    # a float round(2) would turn "1.005" into 1.00
+    minors = [parse_minor(value)[0] for value in chunk["amount"].tolist()]
+    unusable = np.array([minor is None for minor in minors], dtype=bool)
+    negative = np.array([minor is not None and minor < 0 for minor in minors], dtype=bool)
+    raw_dates = chunk["date"].astype(str).str.strip()
+    dates = pd.to_datetime(raw_dates, format="%Y-%m-%d", errors="coerce")
+    dates = dates.fillna(pd.to_datetime(raw_dates, format="%d/%m/%Y", errors="coerce"))
+    categories = chunk["category"].astype(str).str.strip()
+    if "notes" in chunk.columns:
+        notes = chunk["notes"].fillna("").astype(str).str.strip()
+    else:
+        notes = pd.Series("", index=chunk.index)
+    notes = notes.mask(notes == "", "No notes")
+
+    reasons = pd.Series(
+        np.select(
+            [
+                unusable,
+                negative,
+                dates.isna(),
+                ~categories.isin(databases.CATEGORIES),
+            ],
+            ["invalid amount", "negative amount", "invalid date", "unknown category"],
+            default="",
+        ),
+        index=chunk.index,
+    )
+    valid = reasons == ""
+    columns = {
+        "dates": dates[valid],
+        "amounts": chunk["amount"][valid],
+        "categories": categories[valid],
+        "notes": notes[valid],
+    }
+    return columns, reasons[~valid]
+
+
+@timed(log)
+def import_expenses(user_id, fileobj, fmt="csv", batch_size=IMPORT_BATCH_SIZE):
+    """Import expenses for a user from a CSV or JSON-lines file object.
+
+    Returns a report dict: rows read, inserted, rejected, and up to
+    MAX_REPORTED_REJECTS {"line", "reason"} entries.
+    """
+    report = {"read": 0, "inserted": 0, "rejected": 0, "rejects": [], "truncated": False}
+    # CSV data starts on line 2 (after the header), JSON lines on line 1
+    line_offset = 2 if fmt == "csv" else 1
+
+    def reject(line, reason):
+        report["rejected"] += 1
+        if len(report["rejects"]) < MAX_REPORTED_REJECTS:
+            report["rejects"].append({"line": int(line), "reason": reason})
+        else:
+            report["truncated"] = True
+
+    for chunk in _read_chunks(fileobj, fmt, batch_size):
+        report["read"] += len(chunk)
+        columns, rejected = _validate_chunk(chunk)
+        for index, reason in rejected.items():
+            reject(index + line_offset, reason)
+
+        record(rows_read=len(chunk), rows_rejected=len(rejected))
+        result = databases.add_expenses_bulk(user_id, **columns)
+        report["inserted"] += result["inserted"]
+        for position, message in result["errors"]:
+            reject(columns["dates"].index[position] + line_offset, message)
+    return report
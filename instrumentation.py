@@ -0,0 +1,159 @@
+"""Leveled, structured instrumentation for the data layer.
+
+Everything is off by default. Enable it per module with the
+EXPENSE_INSTRUMENT environment variable (comma separated, or "all"):
+
+    EXPENSE_INSTRUMENT=databases,debug python app.py
+
+When a module is enabled its logger runs at DEBUG and every @timed call
+emits one JSON record with the duration, documents returned, bytes fetched
+from MongoDB and cache hits/misses. When disabled, @timed costs a single
+isEnabledFor() check and record() returns immediately.
+
+Records go to stderr, or to EXPENSE_INSTRUMENT_FILE when set, one JSON
+object per line, ready for jq/pandas aggregation.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import time
+
+LOGGER_PREFIX = "expense"
+# Modules that can be switched on: the data layer, the importer, chart payloads and the debug routes
+MODULES = ("databases", "importer", "charts", "analytics", "debug")
+
+# Stack of counter dicts for the @timed calls in progress. A context variable
+# rather than a thread-local so that concurrent asyncio tasks on one thread
+# (and work they hand to asyncio.to_thread) each see their own calls.
+_stack = contextvars.ContextVar("expense_timed_stack", default=())
+_handler = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "ts": round(record.created, 6),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        payload.update(getattr(record, "metrics", {}))
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def get_logger(module):
+    return logging.getLogger(f"{LOGGER_PREFIX}.{module}")
+
+
+def enabled(module):
+    return get_logger(module).isEnabledFor(logging.DEBUG)
+
+
+def _ensure_handler():
+    global _handler
+    if _handler is not None:
+        return
+    path = os.environ.get("EXPENSE_INSTRUMENT_FILE")
+    _handler = logging.FileHandler(path) if path else logging.StreamHandler()
+    _handler.setFormatter(JsonFormatter())
+    root = logging.getLogger(LOGGER_PREFIX)
+    root.addHandler(_handler)
+    # Records are already formatted as JSON; keep them out of the app's root handlers
+    root.propagate = False
+
+
+def enable(module):
+    _ensure_handler()
+    get_logger(module).setLevel(logging.DEBUG)
+
+
+def disable(module):
+    get_logger(module).setLevel(logging.WARNING)
+
+
+def configure(spec=None):
+    """Apply an EXPENSE_INSTRUMENT-style spec ("databases,debug" or "all")"""
+    if spec is None:
+        spec = os.environ.get("EXPENSE_INSTRUMENT", "")
+    wanted = {name.strip() for name in spec.split(",") if name.strip()}
+    if "all" in wanted:
+        wanted = set(MODULES)
+    for module in MODULES:
+        if module in wanted:
+            enable(module)
+        else:
+            disable(module)
+
+
+def active():
+    """Whether a @timed call is collecting counters in this context"""
+    return bool(_stack.get())
+
+
+def record(**counters):
+    """Add counters (docs=, cache_hits=, ...) to the innermost @timed call in this context"""
+    stack = _stack.get()
+    if not stack:
+        return
+    current = stack[-1]
+    for key, value in counters.items():
+        current[key] = current.get(key, 0) + value
+
+
+def _enter():
+    counters = {}
+    parent = _stack.get()
+    return counters, _stack.set(parent + (counters,)), time.perf_counter()
+
+
+def _exit(logger, name, counters, token, started):
+    counters["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    _stack.reset(token)
+    stack = _stack.get()
+    if stack:
+        # Roll nested Mongo/cache counters up into the caller as well
+        for key, value in counters.items():
+            if key != "duration_ms":
+                stack[-1][key] = stack[-1].get(key, 0) + value
+    logger.debug(name, extra={"metrics": counters})
+
+
+def timed(logger, event=None):
+    """Emit one structured record per call with its duration and collected counters.
+
+    Works on plain functions and on coroutine functions.
+    """
+    def decorator(fn):
+        name = event or fn.__name__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not logger.isEnabledFor(logging.DEBUG):
+                    return await fn(*args, **kwargs)
+                counters, token, started = _enter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    _exit(logger, name, counters, token, started)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not logger.isEnabledFor(logging.DEBUG):
+                return fn(*args, **kwargs)
+            counters, token, started = _enter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _exit(logger, name, counters, token, started)
+        return wrapper
+    return decorator
+
+
+configure()
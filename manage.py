@@ -0,0 +1,142 @@
+"""Maintenance commands for the Expense Tracker database.
+
+Usage:
+    python manage.py init-indexes
+    python manage.py index-report
+    python manage.py rebuild-rollups [--user USERNAME]
+    python manage.py verify-rollups [--user USERNAME]
+    python manage.py migrate-amounts [--batch-size N] [--dry-run]
+    python manage.py analytics [--output FILE] [--month YYYY-MM] [--workers N] [--chunk-size N] [--restart]
+    python manage.py import --user USERNAME [--format csv|jsonl] [--batch-size N] FILE
+"""
+import argparse
+import time
+
+import analytics
+import databases
+import importer
+
+
+def init_indexes(args):
+    created = databases.ensure_indexes()
+    for name in created:
+        print(f"ok  {name}")
+
+
+def index_report(args):
+    for entry in databases.index_report():
+        status = "present" if entry["present"] else "MISSING"
+        keys = ", ".join(f"{field}:{direction}" for field, direction in entry["keys"])
+        unique = " unique" if entry["unique"] else ""
+        print(f"{entry['collection']}.{entry['index']} ({keys}){unique} [{status}]")
+        for query in entry["covers"]:
+            print(f"    - {query}")
+
+
+def _user_id(username):
+    if username is None:
+        return None
+    user = databases.get_user_by_username(username)
+    if user is None:
+        raise SystemExit(f"Unknown user: {username}")
+    return str(user["_id"])
+
+
+def rebuild_rollups(args):
+    count = databases.rebuild_rollups(_user_id(args.user))
+    print(f"Rebuilt rollups for {count} user(s)")
+
+
+def verify_rollups(args):
+    drift = databases.verify_rollups(_user_id(args.user))
+    for entry in drift:
+        print(f"{entry['user_id']} {entry['kind']}:{entry['key']} expected={entry['expected']} stored={entry['stored']}")
+    print(f"{len(drift)} drifted bucket(s)")
+    if drift:
+        raise SystemExit(1)
+
+
+def migrate_amounts(args):
+    def progress(report):
+        print(f"... {report['scanned']} scanned, {report['converted']} converted, {report['quarantined']} quarantined")
+
+    report = databases.migrate_amounts(args.batch_size, dry_run=args.dry_run, progress=progress)
+    for entry in report["rejects"]:
+        print(f"{entry['id']}: {entry['reason']} (Amount={entry['amount']})")
+    if report["truncated"]:
+        print(f"... only the first {len(report['rejects'])} quarantined expenses are listed")
+    converted, quarantined = ("would convert", "would quarantine") if args.dry_run else ("converted", "quarantined")
+    print(f"Scanned {report['scanned']} expenses, {converted} {report['converted']}, {quarantined} {report['quarantined']}")
+
+
+def run_analytics(args):
+    started = time.perf_counter()
+
+    def progress(done, total):
+        print(f"... {done}/{total} users ({time.perf_counter() - started:.0f}s)")
+
+    report = analytics.run_report(
+        args.output, args.month, args.workers, args.chunk_size, restart=args.restart, progress=progress
+    )
+    for entry in report["failures"]:
+        print(f"user {entry['user_id']}: {entry['error']}")
+    print(f"Wrote {args.output}: {report['users']} users, {report['users_with_expenses']} with expenses")
+    if report["failed_users"]:
+        print(f"{report['failed_users']} user(s) failed; run the command again to retry them")
+        raise SystemExit(1)
+
+
+def import_file(args):
+    fmt = args.format or importer.detect_format(args.file)
+    with open(args.file, "rb") as fileobj:
+        report = importer.import_expenses(_user_id(args.user), fileobj, fmt=fmt, batch_size=args.batch_size)
+    for entry in report["rejects"]:
+        print(f"line {entry['line']}: {entry['reason']}")
+    if report["truncated"]:
+        print(f"... only the first {len(report['rejects'])} rejects are listed")
+    print(f"Read {report['read']} rows, imported {report['inserted']}, rejected {report['rejected']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Expense Tracker maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("init-indexes", help="create schema validators and indexes (idempotent)").set_defaults(func=init_indexes)
+    commands.add_parser("index-report", help="show indexes and the queries they cover").set_defaults(func=index_report)
+
+    rebuild = commands.add_parser("rebuild-rollups", help="recompute rollups from raw expenses")
+    rebuild.add_argument("--user", help="only this username (default: all users)")
+    rebuild.set_defaults(func=rebuild_rollups)
+
+    verify = commands.add_parser("verify-rollups", help="report rollup buckets that drifted from raw expenses")
+    verify.add_argument("--user", help="only this username (default: all users)")
+    verify.set_defaults(func=verify_rollups)
+
+    migrate = commands.add_parser(
+        "migrate-amounts", help="store every amount as integer minor units; quarantine unparseable ones (resumable)"
+    )
+    migrate.add_argument("--batch-size", type=int, default=databases.LOAD_BATCH_SIZE, help="expenses per batch")
+    migrate.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    migrate.set_defaults(func=migrate_amounts)
+
+    report = commands.add_parser("analytics", help="cross-user spending report, computed on a process pool (resumable)")
+    report.add_argument("--output", default=analytics.default_output(), help="report file (default: reports/analytics-DATE.json)")
+    report.add_argument("--month", help="month the per-user distributions cover, YYYY-MM (default: last month)")
+    report.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    report.add_argument("--chunk-size", type=int, default=analytics.ANALYTICS_CHUNK_USERS, help="users per task")
+    report.add_argument("--restart", action="store_true", help="ignore the checkpoint of an interrupted run")
+    report.set_defaults(func=run_analytics)
+
+    load = commands.add_parser("import", help="bulk import expenses from a CSV or JSON-lines file")
+    load.add_argument("--user", required=True, help="username to import the expenses for")
+    load.add_argument("--format", choices=importer.IMPORT_FORMATS, help="file format (default: from the extension)")
+    load.add_argument("--batch-size", type=int, default=importer.IMPORT_BATCH_SIZE, help="rows per insert_many batch")
+    load.add_argument("file")
+    load.set_defaults(func=import_file)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""Per-endpoint request latency, with a breakdown by phase, in Prometheus format.
+
+Every request is timed from start_request() to finish_request() and added to
+a latency histogram for its endpoint. While a request is running, code tags
+where its time goes:
+
+    db        MongoDB commands (reported by the command listener in connection.py)
+    pandas    building DataFrames (databases._frame_from_cursor, _summary_frame)
+    chart     serialising chart payloads (charts.build_summary_entry)
+    template  rendering Jinja templates (render_page)
+    other     everything else
+
+Phases are exclusive, so db time spent inside a pandas phase (a cursor
+consumed while building a frame) counts only as db. render() returns the
+Prometheus text format served on /metrics. Metrics are kept per process;
+under gunicorn each scrape reaches one worker.
+
+/metrics requires METRICS_TOKEN as a bearer token (Authorization: Bearer
+<token>). Without a token configured it is only served while the "debug"
+instrumentation module is enabled, like the other debug routes.
+
+Streamed responses are recorded when their last chunk has been produced
+(streamed()), so their latency covers the whole body, not just the view.
+
+The slow-request profiler is opt-in. Set EXPENSE_PROFILE_SLOW_MS to sample
+the stacks of requests in progress every EXPENSE_PROFILE_INTERVAL_MS
+(default 5). Requests slower than the threshold are written to
+EXPENSE_PROFILE_DIR (default "profiles") as folded stacks, ready for
+flamegraph.pl or speedscope. It samples threads, so it only covers the
+threaded Flask app.
+"""
+import contextlib
+import contextvars
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import instrumentation
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASES = ("db", "pandas", "chart", "template", "other")
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+_request = contextvars.ContextVar("expense_request_metrics", default=None)
+_lock = threading.Lock()
+_latency = {}    # endpoint -> [bucket counts..., +Inf count, sum]
+_phases = Counter()    # (endpoint, phase) -> seconds
+_requests = Counter()  # (endpoint, status) -> count
+
+
+def start_request(profile=True):
+    """Begin timing the request handled in this context"""
+    state = {"started": time.perf_counter(), "phases": Counter(), "stack": [], "thread": None}
+    if profile and PROFILER is not None:
+        state["thread"] = threading.get_ident()
+        PROFILER.begin(state["thread"])
+    _request.set(state)
+
+
+def finish_request(endpoint, status):
+    """Record the request started in this context; a no-op if it was already recorded"""
+    state = _request.get()
+    if state is None:
+        return
+    _request.set(None)
+    _record(state, endpoint, status)
+
+
+def _record(state, endpoint, status):
+    duration = time.perf_counter() - state["started"]
+    phases = state["phases"]
+    phases["other"] = max(0.0, duration - sum(phases.values()))
+    with _lock:
+        counts = _latency.setdefault(endpoint, [0] * (len(LATENCY_BUCKETS) + 2))
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if duration <= bound:
+                counts[index] += 1
+                break
+        else:
+            counts[len(LATENCY_BUCKETS)] += 1
+        counts[-1] += duration
+        for name, seconds in phases.items():
+            _phases[endpoint, name] += seconds
+        _requests[endpoint, str(status)] += 1
+    if state["thread"] is not None:
+        PROFILER.end(state["thread"], endpoint, duration)
+
+
+def streamed(chunks, endpoint):
+    """Wrap a response generator so the current request is recorded once it is exhausted.
+
+    Call it in the view: finish_request() then leaves the request alone, and
+    its latency (and the phases spent producing chunks) run to the last chunk.
+    """
+    state = _request.get()
+    if state is None:
+        return chunks
+    _request.set(None)
+
+    def generate():
+        # Producing chunks may happen in another thread or context; attribute its phases here
+        _request.set(state)
+        status = 200
+        try:
+            yield from chunks
+        except Exception:
+            status = 500
+            raise
+        finally:
+            _request.set(None)
+            _record(state, endpoint, status)
+    return generate()
+
+
+def add_phase(name, seconds):
+    """Attribute time measured elsewhere (e.g. a Mongo command) to the current request"""
+    state = _request.get()
+    if state is None:
+        return
+    state["phases"][name] += seconds
+    if state["stack"]:
+        state["stack"][-1][1] += seconds
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Attribute the time spent in the block (or decorated function) to phase name"""
+    state = _request.get()
+    if state is None:
+        yield
+        return
+    # [start, time claimed by nested phases]
+    frame = [time.perf_counter(), 0.0]
+    state["stack"].append(frame)
+    try:
+        yield
+    finally:
+        state["stack"].pop()
+        elapsed = time.perf_counter() - frame[0]
+        state["phases"][name] += max(0.0, elapsed - frame[1])
+        if state["stack"]:
+            state["stack"][-1][1] += elapsed
+
+
+def scrape_allowed(authorization):
+    """Whether a /metrics request with this Authorization header may read the metrics"""
+    if METRICS_TOKEN:
+        return hmac.compare_digest((authorization or "").encode(), f"Bearer {METRICS_TOKEN}".encode())
+    return instrumentation.enabled("debug")
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    with _lock:
+        latency = {endpoint: list(counts) for endpoint, counts in _latency.items()}
+        phases = dict(_phases)
+        requests = dict(_requests)
+
+    lines = [
+        "# HELP expense_request_duration_seconds Request latency by endpoint.",
+        "# TYPE expense_request_duration_seconds histogram",
+    ]
+    for endpoint, counts in sorted(latency.items()):
+        label = _label(endpoint)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, counts):
+            cumulative += count
+            lines.append(f'expense_request_duration_seconds_bucket{{endpoint="{label}",le="{bound}"}} {cumulative}')
+        cumulative += counts[len(LATENCY_BUCKETS)]
+        lines.append(f'expense_request_duration_seconds_bucket{{endpoint="{label}",le="+Inf"}} {cumulative}')
+        lines.append(f'expense_request_duration_seconds_sum{{endpoint="{label}"}} {counts[-1]:.6f}')
+        lines.append(f'expense_request_duration_seconds_count{{endpoint="{label}"}} {cumulative}')
+
+    lines += [
+        "# HELP expense_request_phase_seconds_total Request time by endpoint and phase (db, pandas, chart, template, other).",
+        "# TYPE expense_request_phase_seconds_total counter",
+    ]
+    for (endpoint, name), seconds in sorted(phases.items()):
+        lines.append(f'expense_request_phase_seconds_total{{endpoint="{_label(endpoint)}",phase="{name}"}} {seconds:.6f}')
+
+    lines += [
+        "# HELP expense_requests_total Requests by endpoint and status code.",
+        "# TYPE expense_requests_total counter",
+    ]
+    for (endpoint, status), count in sorted(requests.items()):
+        lines.append(f'expense_requests_total{{endpoint="{_label(endpoint)}",status="{status}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _latency.clear()
+        _phases.clear()
+        _requests.clear()
+
+
+# --- Slow-request profiler ---
+def _collapse(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SlowRequestProfiler:
+    """Samples the stacks of request threads; dumps folded stacks for requests over threshold_ms"""
+
+    def __init__(self, threshold_ms, interval_ms=5, directory="profiles"):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.directory = directory
+        self._active = {}  # thread id -> Counter of folded stacks
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_sampler(self):
+        # One sampler thread per process; threads do not survive fork()
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    self._active.clear()
+                    threading.Thread(target=self._run, name="expense-profiler", daemon=True).start()
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                threads = list(self._active)
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            samples = {tid: _collapse(frames[tid]) for tid in threads if tid != own and tid in frames}
+            with self._lock:
+                for tid, stack in samples.items():
+                    if tid in self._active:
+                        self._active[tid][stack] += 1
+
+    def begin(self, thread_id):
+        self._ensure_sampler()
+        with self._lock:
+            self._active[thread_id] = Counter()
+
+    def end(self, thread_id, endpoint, duration):
+        with self._lock:
+            stacks = self._active.pop(thread_id, None)
+        if not stacks or duration < self.threshold:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        path = os.path.join(self.directory, f"{endpoint}-{stamp}-{int(duration * 1000)}ms.folded")
+        with open(path, "w") as fh:
+            for stack, count in stacks.most_common():
+                fh.write(f"{stack} {count}\n")
+        return path
+
+
+PROFILER = None
+if os.environ.get("EXPENSE_PROFILE_SLOW_MS"):
+    PROFILER = SlowRequestProfiler(
+        float(os.environ["EXPENSE_PROFILE_SLOW_MS"]),
+        float(os.environ.get("EXPENSE_PROFILE_INTERVAL_MS", 5)),
+        os.environ.get("EXPENSE_PROFILE_DIR", "profiles"),
+    )
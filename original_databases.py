@@ -1,37 +1,39 @@
-import pymongo as mg
 import pandas as pd
 import matplotlib.pyplot as plt 
 from datetime import datetime
-MONGO_URI = "mongodb://localhost:27017/"
-CLIENT = mg.MongoClient(MONGO_URI)
-DB = CLIENT["Expense"]
-USERS_COLLECTION = DB["users"]
-EXPENSES_COLLECTION = DB["My_bill"]
+from connection import get_db
+
+# Resolved on use so importing this module does not connect (see connection.py)
+def _users():
+    return get_db()["users"]
+
+def _expenses():
+    return get_db()["My_bill"]
 CATEGORIES = ["Food", "Transport", "Shopping", "Others", "Utilities", "Entertainment"]
 
 
 def add_user(username, password_hash):
     #   Inserts a new user into the database.
-    if USERS_COLLECTION.find_one({"username": username}):
+    if _users().find_one({"username": username}):
         raise ValueError("Username already exists.")
     
     user_data = {
         "username": username,
         "password_hash": password_hash,
     }
-    result = USERS_COLLECTION.insert_one(user_data)
+    result = _users().insert_one(user_data)
     return str(result.inserted_id)
 
 def get_user_by_username(username):
     """Finds a user by username."""
-    user = USERS_COLLECTION.find_one({"username": username})
+    user = _users().find_one({"username": username})
     return user
 
 def get_user_by_id(user_id):
     """Finds a user by MongoDB ObjectId string."""
     from bson.objectid import ObjectId
     try:
-        user = USERS_COLLECTION.find_one({"_id": ObjectId(user_id)})
+        user = _users().find_one({"_id": ObjectId(user_id)})
         return user
     except Exception:
         return None
@@ -81,7 +83,7 @@ def add_expenses(user_id, amount, category, date_str, notes):
             'date': date_obj,
             'notes': notes if notes else "No notes"
         }
-        EXPENSES_COLLECTION.insert_one(record)
+        _expenses().insert_one(record)
         return True
     except ValueError as e:
         print(f"Error converting data: {e}")
@@ -93,7 +95,7 @@ def get_user_expenses_df(user_id):
     """Fetches all expenses for a user and returns them as a clean DataFrame."""
     try:
         # Filter expenses only for the current user
-        expense_list = list(EXPENSES_COLLECTION.find({"user_id": user_id}).sort("date", 1))
+        expense_list = list(_expenses().find({"user_id": user_id}).sort("date", 1))
         
         if not expense_list:
             return pd.DataFrame() 
@@ -0,0 +1,154 @@
+"""Password hashing on a bounded worker pool.
+
+Hashing and checking passwords are deliberately slow key derivations. Running
+them inline lets a burst of logins occupy every request thread, so they run
+on a small pool instead. Submissions beyond the pool's queue limit fail
+immediately with PoolSaturated, which the apps turn into a 503.
+
+Configuration comes from the environment:
+
+    PASSWORD_HASH_METHOD   werkzeug method string (default scrypt:32768:8:1),
+                           e.g. pbkdf2:sha256:600000 for a cheaper/older cost
+    PASSWORD_HASH_WORKERS  threads hashing at once (default: CPU count)
+    PASSWORD_HASH_QUEUE    extra calls allowed to wait for a worker (default 4 per worker)
+
+hashlib's scrypt/pbkdf2 release the GIL, so threads hash in parallel.
+Hashes made with other parameters still verify and are upgraded to
+PASSWORD_HASH_METHOD after a successful login (see databases.verify_password).
+"""
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", HASH_WORKERS * 4))
+
+
+class PoolSaturated(Exception):
+    """Too many password operations are already queued"""
+
+
+class HashPool:
+    """ThreadPoolExecutor with a cap on running + queued calls"""
+
+    def __init__(self, workers=HASH_WORKERS, queue=HASH_QUEUE):
+        self.workers = workers
+        self.limit = workers + queue
+        self._slots = threading.BoundedSemaphore(self.limit)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(("submitted", "completed", "rejected"), 0)
+
+    def _get_executor(self):
+        # Worker threads do not survive fork(): start a fresh pool in each process
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="password-hash")
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def submit(self, fn, *args):
+        """Future for fn(*args); raises PoolSaturated instead of queueing past the limit"""
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            raise PoolSaturated("password hashing pool is saturated")
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        self._count("submitted")
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        self._slots.release()
+        self._count("completed")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats.update({"workers": self.workers, "limit": self.limit, "in_flight": stats["submitted"] - stats["completed"]})
+        return stats
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+POOL = HashPool()
+
+
+# werkzeug is imported on first use: importing all of it costs more than the
+# rest of databases.py's startup (see benchmarks/import_budget.py)
+def _hash(password):
+    from werkzeug.security import generate_password_hash
+    return generate_password_hash(password, method=HASH_METHOD)
+
+
+def _check(password_hash, password):
+    from werkzeug.security import check_password_hash
+    return check_password_hash(password_hash, password)
+
+
+def hash_password(password):
+    return POOL.submit(_hash, password).result()
+
+
+def check_password(password_hash, password):
+    return POOL.submit(_check, password_hash, password).result()
+
+
+async def hash_password_async(password):
+    import asyncio  # only the ASGI app needs it; keeps the Flask app's startup lean
+    return await asyncio.wrap_future(POOL.submit(_hash, password))
+
+
+async def check_password_async(password_hash, password):
+    import asyncio
+    return await asyncio.wrap_future(POOL.submit(_check, password_hash, password))
+
+
+@functools.lru_cache(maxsize=None)
+def _stored_method(method):
+    """method as werkzeug writes it into hashes, with defaults filled in
+    ("scrypt" is stored as "scrypt:32768:8:1", "pbkdf2:sha256" as "pbkdf2:sha256:1000000")"""
+    from werkzeug.security import generate_password_hash
+    return generate_password_hash("", method=method).split("$", 1)[0]
+
+
+def needs_rehash(password_hash):
+    """Whether a stored hash was made with parameters other than HASH_METHOD"""
+    return password_hash.split("$", 1)[0] != _stored_method(HASH_METHOD)
+
+
+def rehash_in_background(password, store):
+    """Hash password with the current method on the pool and pass the result to store().
+
+    Skipped when the pool is busy; the upgrade is retried on the next login.
+    """
+    try:
+        future = POOL.submit(_hash, password)
+    except PoolSaturated:
+        return False
+
+    def stored(done):
+        if done.exception() is None:
+            store(done.result())
+
+    future.add_done_callback(stored)
+    return True
+
+
+def pool_stats():
+    return POOL.stats()
@@ -0,0 +1,29 @@
+"""Import the modules the web app loads lazily, ahead of the first request.
+
+Importing app.py does not load pandas, numpy or the importer (nor pymongo,
+unless ensure_indexes() runs at startup; see ENSURE_INDEXES_ON_STARTUP), so
+worker boot and tooling that only imports the app stay fast. A pre-forking
+server can pay for them once in the master instead: gunicorn.conf.py calls
+preload() before forking (EXPENSE_PRELOAD=0 turns that off), so workers
+share those pages and no worker's first request stalls on imports.
+"""
+import importlib
+import time
+
+from storage import get_backend
+
+PRELOAD_MODULES = ("numpy", "pandas", "importer")
+
+
+def preload(modules=PRELOAD_MODULES):
+    """Import modules and the configured storage backend; returns {name: seconds taken}"""
+    timings = {}
+    for name in modules:
+        started = time.perf_counter()
+        importlib.import_module(name)
+        timings[name] = round(time.perf_counter() - started, 4)
+    started = time.perf_counter()
+    # Imports storage.mongo (and pymongo) or storage.sqlite; no connection is opened
+    get_backend()
+    timings["backend"] = round(time.perf_counter() - started, 4)
+    return timings
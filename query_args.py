@@ -0,0 +1,63 @@
+"""Query string filters shared by the Flask and ASGI apps.
+
+Each function takes the request's args mapping (request.args in either
+framework), so the two apps parse and echo filters identically.
+"""
+from datetime import datetime, timedelta
+
+
+def parse_date_arg(args, name, exclusive_end=False):
+    """Parse a YYYY-MM-DD query parameter, ignoring missing or malformed values"""
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        parsed = datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        return None
+    # An end date covers the whole day: the bound is the next midnight, exclusive,
+    # so timestamps with fractions of a second after 23:59:59 still match
+    return parsed + timedelta(days=1) if exclusive_end else parsed
+
+
+def read_filters(args):
+    """category/start/end query parameters, passed straight to the data layer (end is exclusive)"""
+    return {
+        "category": args.get("category") or None,
+        "start": parse_date_arg(args, "start"),
+        "end": parse_date_arg(args, "end", exclusive_end=True),
+    }
+
+
+def filter_query_args(filters):
+    """The filters as query string values for links and forms"""
+    args = {
+        "category": filters["category"],
+        "start": filters["start"].strftime("%Y-%m-%d") if filters["start"] else None,
+        # The last day included, as the user entered it
+        "end": (filters["end"] - timedelta(days=1)).strftime("%Y-%m-%d") if filters["end"] else None,
+    }
+    return {key: value for key, value in args.items() if value}
+
+
+def parse_amount_arg(args, name):
+    """Parse an amount query parameter, ignoring missing or malformed values"""
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def read_search_args(args):
+    """(query, filters for the data layer, query string values for links and forms) of a search"""
+    query = args.get("q", "").strip()
+    filters = {
+        "category": args.get("category") or None,
+        "min_amount": parse_amount_arg(args, "min"),
+        "max_amount": parse_amount_arg(args, "max"),
+    }
+    values = {"q": query, "category": filters["category"], "min": filters["min_amount"], "max": filters["max_amount"]}
+    return query, filters, {key: value for key, value in values.items() if value is not None and value != ""}
@@ -0,0 +1,191 @@
+"""Full-text search over expense notes without a database text index.
+
+MongoDB answers searches with its text index (storage/mongo.py). Other
+backends get a NotesIndex: an in-memory inverted index over one user's
+notes, built from iter_expenses and cached per data version by databases.py.
+A query only touches the postings of its own terms, so once the index is
+built, search time depends on the number of matches rather than on the
+size of the user's history.
+
+Queries follow MongoDB's $text syntax so both paths accept the same input:
+- words match any form with the same stem ("taxis" finds "taxi"), and any
+  one of them is enough;
+- "-word" drops expenses containing the word;
+- a "quoted phrase" must appear as written (case-insensitive).
+
+snippet() is shared by both paths: it cuts the part of the notes around
+the first match into (text, highlighted) segments for the results page.
+"""
+import heapq
+import math
+import re
+from collections import Counter
+
+from storage.base import to_minor
+
+TOKEN_RE = re.compile(r"[^\W_]+")
+PHRASE_RE = re.compile(r'"([^"]*)"')
+# Ignored in notes and queries, as by MongoDB's English text index
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have i in is it its my no not "
+    "of on or our so that the their them then there these they this to was "
+    "were will with you your".split()
+)
+SNIPPET_CHARS = 160
+_VOWELS = set("aeiouy")
+
+
+def stem(word):
+    """Light English stemmer: folds plurals and -ing/-ed forms onto one key"""
+    if len(word) <= 3:
+        return word
+    if word.endswith("sses"):
+        word = word[:-2]
+    elif word.endswith("ies"):
+        word = word[:-3] + "y"
+    elif word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+    for suffix in ("ing", "ed"):
+        base = word[:-len(suffix)]
+        if word.endswith(suffix) and len(base) >= 3 and _VOWELS.intersection(base):
+            word = base
+            # "shopping" -> "shop", but "filled" keeps its "ll"
+            if word[-1] == word[-2] and word[-1] not in "lsz":
+                word = word[:-1]
+            break
+    if word.endswith("e") and len(word) > 4:
+        word = word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Stems of the words in text, stop words left out"""
+    return [stem(word) for word in TOKEN_RE.findall(text.lower()) if word not in STOP_WORDS]
+
+
+def parse_query(query):
+    """(terms, excluded terms, phrases) of a $text style query"""
+    phrases = [phrase.lower() for phrase in PHRASE_RE.findall(query) if phrase.strip()]
+    terms, excluded = set(), set()
+    for word in PHRASE_RE.sub(" ", query).split():
+        target = excluded if word.startswith("-") else terms
+        target.update(tokenize(word.lstrip("-")))
+    for phrase in phrases:
+        terms.update(tokenize(phrase))
+    return terms, excluded - terms, phrases
+
+
+def highlight_terms(query):
+    """The stems snippet() marks for query (the negated ones are never shown)"""
+    return parse_query(query)[0]
+
+
+def snippet(notes, terms, width=SNIPPET_CHARS):
+    """[(text, highlighted)] covering up to width chars of notes around the first matching word"""
+    if not notes:
+        return []
+    hits = [match.span() for match in TOKEN_RE.finditer(notes) if stem(match.group().lower()) in terms]
+    start = 0
+    if hits and len(notes) > width:
+        # Keep a little context before the first hit
+        start = max(0, min(hits[0][0] - width // 4, len(notes) - width))
+    end = min(len(notes), start + width)
+    segments = [("…", False)] if start else []
+    position = start
+    for hit_start, hit_end in hits:
+        if hit_start < start:
+            continue
+        if hit_end > end:
+            break
+        if hit_start > position:
+            segments.append((notes[position:hit_start], False))
+        segments.append((notes[hit_start:hit_end], True))
+        position = hit_end
+    if position < end:
+        segments.append((notes[position:end], False))
+    if end < len(notes):
+        segments.append(("…", False))
+    return segments
+
+
+def _minor(doc):
+    minor = doc.get("amount_minor")
+    return int(minor) if minor is not None else to_minor(doc.get("Amount"))
+
+
+class NotesIndex:
+    """Inverted index over one user's expenses (dicts with _id, date, Amount, amount_minor, category, notes).
+
+    Expenses must be added oldest first, as iter_expenses returns them.
+    """
+
+    def __init__(self, expenses=()):
+        self.expenses = []
+        self.postings = {}  # stem -> [(position in expenses, term frequency)]
+        self.nbytes = 0
+        for expense in expenses:
+            self.add(expense)
+
+    def __len__(self):
+        return len(self.expenses)
+
+    def add(self, expense):
+        position = len(self.expenses)
+        self.expenses.append(expense)
+        notes = expense.get("notes") or ""
+        counts = Counter(tokenize(notes))
+        for term, frequency in counts.items():
+            self.postings.setdefault(term, []).append((position, frequency))
+        # Rough footprint for the cache's byte budget
+        self.nbytes += 200 + len(notes) + 40 * len(counts)
+
+    def _matches(self, expense, category, min_minor, max_minor):
+        if category and expense.get("category") != category:
+            return False
+        if min_minor is not None or max_minor is not None:
+            minor = _minor(expense)
+            if minor is None:
+                return False
+            if min_minor is not None and minor < min_minor:
+                return False
+            if max_minor is not None and minor > max_minor:
+                return False
+        return True
+
+    def search(self, query, limit, offset=0, category=None, min_minor=None, max_minor=None):
+        """Up to limit matching expenses past offset, best match first, then newest first.
+
+        Each is a copy of the indexed dict with a "score" (TF-IDF over the
+        query terms). Expenses outside category or [min_minor, max_minor]
+        are skipped.
+        """
+        terms, excluded, phrases = parse_query(query)
+        if not terms:
+            return []
+        count = len(self.expenses)
+        scores = {}
+        for term in terms:
+            postings = self.postings.get(term, ())
+            if not postings:
+                continue
+            idf = math.log(1 + count / len(postings))
+            for position, frequency in postings:
+                scores[position] = scores.get(position, 0.0) + (1 + math.log(frequency)) * idf
+        for term in excluded:
+            for position, _ in self.postings.get(term, ()):
+                scores.pop(position, None)
+
+        ranked = []
+        for position, score in scores.items():
+            expense = self.expenses[position]
+            if not self._matches(expense, category, min_minor, max_minor):
+                continue
+            if phrases:
+                notes = (expense.get("notes") or "").lower()
+                if not all(phrase in notes for phrase in phrases):
+                    continue
+            # Expenses are indexed oldest first, so a later position breaks ties towards newer ones
+            ranked.append((score, position))
+        # Only the requested window is ordered; the rest of the matches are never sorted
+        best = heapq.nlargest(offset + limit, ranked)[offset:]
+        return [dict(self.expenses[position], score=score) for score, position in best]
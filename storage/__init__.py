@@ -0,0 +1,56 @@
+"""Storage backends for the data layer.
+
+databases.py talks to whichever backend EXPENSE_BACKEND selects:
+"mongo" (default) or "sqlite". Backends are imported on first use, so
+selecting SQLite never opens a MongoDB connection.
+"""
+import os
+import threading
+
+from storage.base import StorageBackend
+
+BACKENDS = ("mongo", "sqlite")
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_backend(name=None):
+    name = (name or os.environ.get("EXPENSE_BACKEND", "mongo")).lower()
+    if name == "mongo":
+        from storage.mongo import MongoBackend
+        return MongoBackend()
+    if name == "sqlite":
+        from storage.sqlite import SQLiteBackend
+        return SQLiteBackend()
+    raise ValueError(f"Unknown storage backend {name!r}; expected one of {', '.join(BACKENDS)}")
+
+
+def get_backend():
+    """The process-wide backend, created from EXPENSE_BACKEND on first use"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend()
+    return _backend
+
+
+def get_async_backend():
+    """Native asyncio counterpart of the current backend, or None when it has none
+    (callers then run the synchronous backend in a thread)"""
+    if get_backend().name == "mongo":
+        from storage.mongo_async import AsyncMongoBackend
+        return AsyncMongoBackend()
+    return None
+
+
+def set_backend(backend):
+    """Swap the process-wide backend (benchmarks, scripts); returns the previous one"""
+    global _backend
+    with _backend_lock:
+        previous, _backend = _backend, backend
+    return previous
+
+
+__all__ = ["BACKENDS", "StorageBackend", "create_backend", "get_async_backend", "get_backend", "set_backend"]
@@ -0,0 +1,239 @@
+"""Storage interface shared by the MongoDB and SQLite backends.
+
+Backends speak in plain dicts using the field names of the original Mongo
+documents ("_id", "user_id", "Amount", "category", "date", "notes";
+"username", "password_hash", "created_at" for users), with dates as
+datetime objects. Ids are passed in and out as strings at the API
+boundary; each backend converts them to its native type and treats
+malformed ids as "not found".
+
+Amounts are kept exactly as integer minor units in "amount_minor" (paise:
+1/MINOR_UNITS of the currency unit). "Amount" holds the same value as a
+float for display. Aggregations sum amount_minor and convert the result
+with from_minor() once.
+"""
+import math
+from datetime import datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+# group_by values understood by StorageBackend.summary
+SUMMARY_GROUPINGS = ("category", "day", "week", "month", "quarter", "year")
+# Date groupings the stores key natively (rollups, $dateToString, SQL)
+DATE_KEY_FORMATS = {
+    "day": "%Y-%m-%d",
+    "week": "%G-W%V",
+    "month": "%Y-%m",
+}
+# Coarser groupings are folded from these with bucketing.regroup
+FOLDED_GROUPINGS = {"quarter": "month", "year": "month"}
+LOAD_BATCH_SIZE = 5000
+
+MINOR_UNITS = 100
+# Beyond 2**53 minor units float totals (and from_minor) would stop being exact
+MAX_MINOR = 2 ** 53
+
+
+def to_amount(value):
+    """Amount as float, or None for values that cannot be converted"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_minor(value):
+    """(minor units, None) for an amount, or (None, reason) when it is not a usable number.
+
+    Accepts numbers and numeric strings (surrounding spaces and thousands
+    separators are ignored); fractions of a minor unit are rounded half up.
+    """
+    if value is None:
+        return None, "missing amount"
+    if isinstance(value, bool):
+        return None, "not a number"
+    if isinstance(value, int):
+        minor = value * MINOR_UNITS
+    else:
+        scaled = value * MINOR_UNITS if isinstance(value, float) else None
+        if scaled is not None and math.isfinite(scaled) and abs(scaled - round(scaled)) < 1e-6:
+            # The usual case: a float that is already a whole number of minor units
+            minor = round(scaled)
+        else:
+            try:
+                amount = Decimal(str(value).strip().replace(",", ""))
+            except InvalidOperation:
+                return None, "not a number"
+            if not amount.is_finite():
+                return None, "not a finite number"
+            if amount and amount.adjusted() > 18:
+                return None, "out of range"
+            minor = int((amount * MINOR_UNITS).to_integral_value(ROUND_HALF_UP))
+    if abs(minor) > MAX_MINOR:
+        return None, "out of range"
+    return minor, None
+
+
+def to_minor(value):
+    """Amount in integer minor units, or None when it cannot be converted"""
+    return parse_minor(value)[0]
+
+
+def from_minor(minor):
+    """Integer minor units as a float amount"""
+    return minor / MINOR_UNITS
+
+
+def current_period_bounds(today):
+    """[start, end) datetimes of the current month and the current ISO week (Monday-first)"""
+    month_start = datetime(today.year, today.month, 1)
+    if today.month == 12:
+        month_end = datetime(today.year + 1, 1, 1)
+    else:
+        month_end = datetime(today.year, today.month + 1, 1)
+
+    day = datetime(today.year, today.month, today.day)
+    week_start = day - timedelta(days=day.weekday())
+    week_end = week_start + timedelta(days=7)
+    return month_start, month_end, week_start, week_end
+
+
+def summary_source(group_by):
+    """(grouping to return, grouping the store aggregates by) for a summary request"""
+    kind = group_by if group_by in SUMMARY_GROUPINGS else "category"
+    return kind, FOLDED_GROUPINGS.get(kind, kind)
+
+
+def fold_rows(rows, kind, source):
+    """[(group, total in minor units)] for the requested grouping from the same grouped by source"""
+    if kind == source:
+        return rows
+    from bucketing import regroup  # NumPy, loaded on first use
+    # regroup sums in float64, which is exact for totals below MAX_MINOR
+    return [(group, int(total)) for group, total in regroup(rows, kind)]
+
+
+def summary_rows(rows, kind, source):
+    """[(group, total)] for the requested grouping from [(group, total in minor units)] grouped by source"""
+    return [(group, from_minor(total)) for group, total in fold_rows(rows, kind, source)]
+
+
+def empty_dashboard():
+    return {"total_expenses": 0, "month_expenses": 0, "week_expenses": 0, "total_records": 0, "category_breakdown": {}}
+
+
+class StorageBackend:
+    """Everything databases.py needs from a store. Subclasses implement all methods
+    except the rollup maintenance ones, which default to no-ops."""
+
+    name = "base"
+    # Whether search_expenses is implemented; databases.py searches an in-process index otherwise
+    text_search = False
+
+    # --- Schema ---
+    def ensure_schema(self):
+        """Create tables/collections, validators and indexes. Idempotent; returns the names ensured."""
+        raise NotImplementedError
+
+    def index_report(self):
+        """[{collection, index, keys, unique, present, covers}] for every managed index"""
+        raise NotImplementedError
+
+    def reset(self):
+        """Delete all users and expenses (testing only)"""
+        raise NotImplementedError
+
+    # --- Users ---
+    def create_user(self, user_data):
+        """Insert a user; returns the new id, or None if the username is taken"""
+        raise NotImplementedError
+
+    def get_user_by_username(self, username):
+        raise NotImplementedError
+
+    def get_user_by_id(self, user_id):
+        raise NotImplementedError
+
+    def update_user(self, user_id, changes):
+        """Set fields (e.g. password_hash) on a user; returns False if it does not exist"""
+        raise NotImplementedError
+
+    def list_user_ids(self):
+        raise NotImplementedError
+
+    # --- Expenses ---
+    def insert_expense(self, user_id, record):
+        """Insert one expense (Amount/category/date/notes); returns its id"""
+        raise NotImplementedError
+
+    def insert_expenses(self, user_id, records):
+        """Insert many expenses without stopping at failures; returns [(position, message)] for failed rows"""
+        raise NotImplementedError
+
+    def get_expense(self, expense_id, user_id):
+        raise NotImplementedError
+
+    def update_expense(self, expense_id, user_id, changes):
+        """Apply changes to one of the user's expenses; returns False if it does not exist"""
+        raise NotImplementedError
+
+    def delete_expense(self, expense_id, user_id):
+        raise NotImplementedError
+
+    def count_expenses(self, user_id, category=None, start=None, end=None):
+        raise NotImplementedError
+
+    def iter_expenses(self, user_id, fields=None, category=None, start=None, end=None,
+                      newest_first=False, batch_size=LOAD_BATCH_SIZE):
+        """Stream matching expenses as dicts. fields limits the keys returned (None: everything)."""
+        raise NotImplementedError
+
+    def page_expenses(self, user_id, limit, boundary=None, direction="after", category=None, start=None, end=None):
+        """Up to limit expenses past boundary=(date, id) ordered on (date, id).
+
+        direction "after" walks towards older rows (newest first), "before"
+        walks towards newer rows (oldest first).
+        """
+        raise NotImplementedError
+
+    def search_expenses(self, user_id, query, limit, offset=0, category=None, min_minor=None, max_minor=None):
+        """Up to limit expenses past offset whose notes match query ($text syntax), best match
+        first, then newest first. Each carries its relevance as "score". Only backends with
+        text_search implement this."""
+        raise NotImplementedError
+
+    # --- Aggregations ---
+    def expenses_total(self, user_id, category=None, start=None, end=None):
+        """{"total", "count"} of the matching expenses"""
+        raise NotImplementedError
+
+    def summary(self, user_id, group_by="category", start=None, end=None, category=None):
+        """[(group, total)] sorted by group"""
+        return [(group, from_minor(total)) for group, total in self.summary_minor(user_id, group_by, start, end, category)]
+
+    def summary_minor(self, user_id, group_by="category", start=None, end=None, category=None):
+        """[(group, total in minor units)] sorted by group"""
+        raise NotImplementedError
+
+    def dashboard_stats(self, user_id, today, category=None, start=None, end=None):
+        """Dict with total_expenses, month_expenses, week_expenses, total_records, category_breakdown,
+        all limited to the matching expenses"""
+        raise NotImplementedError
+
+    # --- Amount migration ---
+    def legacy_amounts(self, after=None, limit=LOAD_BATCH_SIZE):
+        """Up to limit [(id, stored Amount)] of expenses without amount_minor, in id order past after.
+        Ids are the backend's native ids, as accepted back by migrate_amounts."""
+        raise NotImplementedError
+
+    def migrate_amounts(self, converted, quarantined):
+        """Store [(id, minor units)] as amount_minor (and Amount to match), and move
+        [(id, reason)] expenses to the quarantine store. Rows that gained amount_minor
+        in the meantime are left alone."""
+        raise NotImplementedError
+
+    # --- Rollups (backends without precomputed rollups keep the defaults) ---
+    def rebuild_rollups(self, user_id=None):
+        return 0
+
+    def verify_rollups(self, user_id=None, tolerance=0.005):
+        return []
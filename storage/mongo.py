@@ -0,0 +1,800 @@
+"""MongoDB storage backend (the default)."""
+from datetime import datetime
+
+import pymongo as mg
+from bson.int64 import Int64
+from bson.objectid import ObjectId
+from pymongo import ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+from connection import get_db
+from instrumentation import get_logger, record
+from storage.base import (
+    DATE_KEY_FORMATS,
+    LOAD_BATCH_SIZE,
+    StorageBackend,
+    current_period_bounds,
+    MINOR_UNITS,
+    empty_dashboard,
+    fold_rows,
+    from_minor,
+    summary_source,
+    to_minor,
+)
+
+log = get_logger("databases")
+
+USERS_COLLECTION_NAME = "users"
+EXPENSES_COLLECTION_NAME = "My_bill"
+ROLLUPS_COLLECTION_NAME = "rollups"
+# Expenses whose amount could not be migrated (see databases.migrate_amounts)
+QUARANTINE_COLLECTION_NAME = "My_bill_quarantine"
+
+
+def users_collection():
+    return get_db()[USERS_COLLECTION_NAME]
+
+
+def expenses_collection():
+    return get_db()[EXPENSES_COLLECTION_NAME]
+
+
+def rollups_collection():
+    return get_db()[ROLLUPS_COLLECTION_NAME]
+
+
+def quarantine_collection():
+    return get_db()[QUARANTINE_COLLECTION_NAME]
+
+
+# --- Indexes & Schema ---
+# Each entry lists the queries the index is meant to serve, used by index_report()
+INDEXES = {
+    "users": [
+        {
+            "name": "username_unique",
+            "keys": [("username", mg.ASCENDING)],
+            "unique": True,
+            "covers": [
+                "get_user_by_username: find_one({username})",
+                "create_user: duplicate usernames rejected by the index (DuplicateKeyError)",
+            ],
+        },
+    ],
+    "expenses": [
+        {
+            "name": "user_date",
+            # _id is the tie-breaker for keyset pagination on (date, _id)
+            "keys": [("user_id", mg.ASCENDING), ("date", mg.ASCENDING), ("_id", mg.ASCENDING)],
+            "unique": False,
+            "covers": [
+                "get_user_expenses_df: find({user_id, category?, date range}).sort(date, -1)",
+                "view_expenses_by_user: find({user_id, category?, date range}).sort(date, -1)",
+                "view_expenses_page: find({user_id, category?, date range, (date, _id) < cursor}).sort(date, -1, _id, -1)",
+                "iter_expenses: find({user_id, category?, date range}).sort(date, 1)",
+                "get_expenses_total: $match {user_id, category?, date range}",
+                "get_summary_data: $match {user_id, category?, date range}",
+                "get_dashboard_stats: $match {user_id, category?, date range}",
+                "rebuild_rollups / verify_rollups: $match {user_id}",
+            ],
+        },
+        {
+            "name": "user_notes_text",
+            # The user_id prefix keeps each search inside one user's entries of the text index
+            "keys": [("user_id", mg.ASCENDING), ("notes", mg.TEXT)],
+            "unique": False,
+            "covers": [
+                "search_expenses: find({user_id, $text, category?, amount_minor range}).sort(textScore, date -1, _id -1)",
+            ],
+        },
+    ],
+    "rollups": [
+        {
+            "name": "user_kind_key",
+            "keys": [("user_id", mg.ASCENDING), ("kind", mg.ASCENDING), ("key", mg.ASCENDING)],
+            "unique": True,
+            "covers": [
+                "_write_rollups: $inc upsert on {user_id, kind, key}",
+                "get_summary_data: find({user_id, kind}).sort(key)",
+                "get_dashboard_stats: find({user_id, kind in [...]})",
+            ],
+        },
+    ],
+}
+
+# Server error codes raised when an index name already exists with other keys/options
+INDEX_CONFLICT_CODES = (85, 86)
+
+# Validators are applied with validationLevel "moderate" so that historical
+# documents that do not match are still readable and updatable
+SCHEMAS = {
+    "users": {
+        "bsonType": "object",
+        "required": ["username", "password_hash"],
+        "properties": {
+            "username": {"bsonType": "string", "minLength": 1},
+            "password_hash": {"bsonType": "string"},
+            "created_at": {"bsonType": "date"},
+        },
+    },
+    "expenses": {
+        "bsonType": "object",
+        "required": ["user_id", "Amount", "amount_minor", "category", "date"],
+        "properties": {
+            "user_id": {"bsonType": "objectId"},
+            "Amount": {"bsonType": "double"},
+            "amount_minor": {"bsonType": "long"},
+            "category": {"bsonType": "string"},
+            "date": {"bsonType": "date"},
+            "notes": {"bsonType": "string"},
+        },
+    },
+}
+
+# --- Rollups ---
+# The rollups collection holds one document per (user_id, kind, key) bucket with a
+# running total_minor (minor units) and count, maintained with $inc by every expense write:
+#   day      -> "2025-03-14"
+#   week     -> "2025-W11" (ISO week)
+#   month    -> "2025-03"
+#   category -> "Food"
+# A {kind: "meta", key: ROLLUPS_BUILT_KEY} document marks a user whose rollups
+# are complete; until then the read paths fall back to aggregating raw expenses.
+# The key is versioned: rollups built before totals were kept in minor units
+# ("built") are ignored until rebuild_rollups runs.
+ROLLUP_KINDS = ["day", "week", "month", "category"]
+ROLLUP_DATE_FORMATS = DATE_KEY_FORMATS
+ROLLUPS_BUILT_KEY = "built_minor"
+
+# Exact minor units. Documents written before amount_minor existed (and not yet
+# migrated) fall back to converting Amount on the server.
+AMOUNT_MINOR = {"$ifNull": ["$amount_minor", {"$toLong": {"$round": [
+    {"$multiply": [{"$convert": {"input": "$Amount", "to": "double", "onError": None, "onNull": None}}, MINOR_UNITS]},
+    0,
+]}}]}
+
+
+def _oid(value):
+    """ObjectId from a string id; raises ValueError for malformed ids"""
+    try:
+        return value if isinstance(value, ObjectId) else ObjectId(value)
+    except Exception:
+        raise ValueError(f"Invalid id: {value!r}")
+
+
+def _expense_filter(user_id, category=None, start=None, end=None):
+    """Query for a user's expenses, optionally limited to a category and [start, end)"""
+    match = {"user_id": _oid(user_id)}
+    date_filter = {}
+    if start is not None:
+        date_filter["$gte"] = start
+    if end is not None:
+        date_filter["$lt"] = end
+    if date_filter:
+        match["date"] = date_filter
+    if category:
+        match["category"] = category
+    return match
+
+
+def _apply_schema(collection, schema):
+    validator = {"$jsonSchema": schema}
+    db = collection.database
+    if collection.name not in db.list_collection_names():
+        db.create_collection(collection.name, validator=validator, validationLevel="moderate")
+    else:
+        db.command("collMod", collection.name, validator=validator, validationLevel="moderate")
+
+
+def _rollup_keys(date, category):
+    keys = [(kind, date.strftime(fmt)) for kind, fmt in ROLLUP_DATE_FORMATS.items()]
+    if category is not None:
+        keys.append(("category", category))
+    return keys
+
+
+def _doc_minor(doc):
+    """Minor units of an expense document, converting Amount for unmigrated documents"""
+    minor = doc.get("amount_minor")
+    return int(minor) if minor is not None else to_minor(doc.get("Amount"))
+
+
+def _with_int64(doc):
+    # Python ints below 2**31 would be stored as int32; keep amount_minor a consistent long
+    if doc.get("amount_minor") is not None:
+        doc["amount_minor"] = Int64(doc["amount_minor"])
+    return doc
+
+
+def _rollup_updates(user_id, minor, category, date, sign):
+    return [
+        UpdateOne(
+            {"user_id": user_id, "kind": kind, "key": key},
+            {"$inc": {"total_minor": Int64(sign * minor), "count": sign}},
+            upsert=True,
+        )
+        for kind, key in _rollup_keys(date, category)
+    ]
+
+
+def _expense_rollup_updates(user_id, doc, sign):
+    """$inc updates adding (sign=1) or removing (sign=-1) one expense document from the user's rollups"""
+    minor, date = _doc_minor(doc), doc.get("date")
+    if minor is None or not isinstance(date, datetime):
+        return []
+    return _rollup_updates(user_id, minor, doc.get("category"), date, sign)
+
+
+def _write_rollups(user_id, updates, session=None):
+    """Apply rollup $inc updates for a write to the user's expenses.
+
+    Inside a transaction (session given) a failure propagates and aborts the
+    expense write with it. Without one the expense is already stored, so the
+    user's rollups are marked not built instead: reads fall back to the raw
+    expenses until rebuild_rollups repairs the buckets.
+    """
+    if not updates:
+        return
+    if session is not None:
+        rollups_collection().bulk_write(updates, ordered=False, session=session)
+        return
+    try:
+        rollups_collection().bulk_write(updates, ordered=False)
+    except Exception as e:
+        log.error("Error updating rollups, reading raw expenses until rebuild_rollups: %s", e)
+        _mark_rollups_stale(user_id)
+
+
+# Whether this deployment supports transactions, asked once per process
+_server_transactions = None
+
+
+def _transactions_supported():
+    """Whether the server accepts multi-document transactions (replica set member or mongos)"""
+    global _server_transactions
+    if _server_transactions is None:
+        hello = get_db().command("hello")
+        _server_transactions = "setName" in hello or hello.get("msg") == "isdbgrid"
+    return _server_transactions
+
+
+def _with_rollups(write):
+    """Run write(session), an expense change plus its rollup updates, atomically when possible.
+
+    On a replica set or sharded cluster write runs in a transaction (retried
+    on transient errors), so the expense and its buckets commit together. A
+    standalone server has no transactions: write gets session=None and
+    _write_rollups marks the rollups not built if the second half fails.
+    """
+    if not _transactions_supported():
+        return write(None)
+    with get_db().client.start_session() as session:
+        return session.with_transaction(write)
+
+
+def _batch_rollup_updates(user_id, records):
+    """$inc updates adding many expenses to the rollups, one per touched bucket"""
+    import numpy as np
+
+    from bucketing import bucket_totals
+
+    dates = np.array([rec["date"] for rec in records], dtype="datetime64[ns]")
+    # Minor units as float64 (exact below 2**53) so unconvertible amounts can be NaN
+    amounts = np.array([_doc_minor(rec) for rec in records], dtype=np.float64)
+    categories = [rec["category"] for rec in records]
+
+    buckets = []
+    for kind in ROLLUP_DATE_FORMATS:
+        # Integer period codes instead of a strftime per row; one label per touched bucket
+        labels, totals, counts = bucket_totals(dates, amounts, kind)
+        buckets += [(kind, label, total, count) for label, total, count in zip(labels, totals.tolist(), counts.tolist())]
+    by_category = {}
+    for category, amount in zip(categories, amounts.tolist()):
+        if category is not None and amount == amount:
+            total, count = by_category.get(category, (0.0, 0))
+            by_category[category] = (total + amount, count + 1)
+    buckets += [("category", key, total, count) for key, (total, count) in by_category.items()]
+
+    return [
+        UpdateOne(
+            {"user_id": user_id, "kind": kind, "key": key},
+            {"$inc": {"total_minor": Int64(int(total)), "count": int(count)}},
+            upsert=True,
+        )
+        for kind, key, total, count in buckets
+    ]
+
+
+def _mark_rollups_built(user_id, session=None):
+    rollups_collection().update_one(
+        {"user_id": user_id, "kind": "meta", "key": ROLLUPS_BUILT_KEY},
+        {"$set": {"built_at": datetime.now()}},
+        upsert=True,
+        session=session,
+    )
+
+
+def _mark_rollups_stale(user_id):
+    try:
+        rollups_collection().delete_one(_rollups_ready_query(user_id))
+    except Exception as e:
+        # verify_rollups still reports the drift
+        log.error("Error marking rollups stale: %s", e)
+
+
+def _rollups_ready(user_id):
+    return rollups_collection().find_one(_rollups_ready_query(user_id), {"_id": 1}) is not None
+
+
+ROLLUP_PROJECTION = {"_id": 0, "kind": 1, "key": 1, "total_minor": 1, "count": 1}
+
+
+def _rollups_ready_query(user_id):
+    return {"user_id": _oid(user_id), "kind": "meta", "key": ROLLUPS_BUILT_KEY}
+
+
+def _rollups_query(user_id, query):
+    return dict(query, user_id=_oid(user_id), count={"$gt": 0})
+
+
+def _buckets_from_docs(docs):
+    """{kind: {key: (total in minor units, count)}} from rollup documents"""
+    buckets = {}
+    for doc in docs:
+        buckets.setdefault(doc["kind"], {})[doc["key"]] = (doc["total_minor"], doc["count"])
+    record(rollup_reads=1)
+    return buckets
+
+
+def _read_rollups(user_id, query):
+    """{kind: {key: (total in minor units, count)}} for the matching non-empty buckets"""
+    return _buckets_from_docs(rollups_collection().find(_rollups_query(user_id, query), ROLLUP_PROJECTION).sort("key", 1))
+
+
+def _rollup_pipeline(user_id):
+    """Recompute every rollup bucket of a user from the raw expenses"""
+    def bucket(key):
+        return [{"$group": {"_id": key, "total": {"$sum": "$amount"}, "count": {"$sum": 1}}}]
+
+    facets = {
+        kind: bucket({"$dateToString": {"format": fmt, "date": "$date"}})
+        for kind, fmt in ROLLUP_DATE_FORMATS.items()
+    }
+    facets["category"] = [{"$match": {"category": {"$ne": None}}}] + bucket("$category")
+    return [
+        {"$match": {"user_id": _oid(user_id)}},
+        {"$project": {"date": 1, "category": 1, "amount": AMOUNT_MINOR}},
+        {"$match": {"amount": {"$ne": None}, "date": {"$type": "date"}}},
+        {"$facet": facets},
+    ]
+
+
+def _expected_rollups(user_id, session=None):
+    facets = next(expenses_collection().aggregate(_rollup_pipeline(user_id), session=session), {})
+    return {
+        (kind, row["_id"]): (row["total"], row["count"])
+        for kind in ROLLUP_KINDS
+        for row in facets.get(kind, [])
+    }
+
+
+def _rebuild_user_rollups(user_id, session=None):
+    expected = _expected_rollups(user_id, session)
+    rollups_collection().delete_many({"user_id": user_id}, session=session)
+    if expected:
+        rollups_collection().insert_many([
+            {"user_id": user_id, "kind": kind, "key": key, "total_minor": Int64(total), "count": count}
+            for (kind, key), (total, count) in expected.items()
+        ], session=session)
+    _mark_rollups_built(user_id, session)
+
+
+def _summary_pipeline(user_id, group_by="category", start=None, end=None, category=None):
+    """Aggregation pipeline returning one {_id: group, total} document per group"""
+    if group_by in ROLLUP_DATE_FORMATS:
+        group_key = {"$dateToString": {"format": ROLLUP_DATE_FORMATS[group_by], "date": "$date"}}
+    else:
+        group_key = "$category"
+    return [
+        {"$match": _expense_filter(user_id, category, start, end)},
+        {"$project": {"key": group_key, "amount": AMOUNT_MINOR}},
+        {"$match": {"amount": {"$ne": None}, "key": {"$ne": None}}},
+        {"$group": {"_id": "$key", "total": {"$sum": "$amount"}}},
+        {"$sort": {"_id": 1}},
+    ]
+
+
+def _dashboard_pipeline(user_id, today, category=None, start=None, end=None):
+    month_start, month_end, week_start, week_end = current_period_bounds(today)
+    return [
+        {"$match": _expense_filter(user_id, category, start, end)},
+        {"$project": {"date": 1, "category": 1, "amount": AMOUNT_MINOR}},
+        {"$match": {"amount": {"$ne": None}}},
+        {"$facet": {
+            "overall": [
+                {"$group": {"_id": None, "total": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+            ],
+            "month": [
+                {"$match": {"date": {"$gte": month_start, "$lt": month_end}}},
+                {"$group": {"_id": None, "total": {"$sum": "$amount"}}},
+            ],
+            "week": [
+                {"$match": {"date": {"$gte": week_start, "$lt": week_end}}},
+                {"$group": {"_id": None, "total": {"$sum": "$amount"}}},
+            ],
+            "categories": [
+                {"$match": {"category": {"$ne": None}}},
+                {"$group": {"_id": "$category", "total": {"$sum": "$amount"}}},
+                {"$sort": {"total": -1}},
+            ],
+        }},
+    ]
+
+
+def _dashboard_rollups_query(today):
+    return {"$or": [
+        {"kind": {"$in": ["month", "category"]}},
+        {"kind": "week", "key": today.strftime(ROLLUP_DATE_FORMATS["week"])},
+    ]}
+
+
+def _dashboard_from_buckets(buckets, today):
+    month_key = today.strftime(ROLLUP_DATE_FORMATS["month"])
+    week_key = today.strftime(ROLLUP_DATE_FORMATS["week"])
+    months = buckets.get("month", {})
+    categories = sorted(buckets.get("category", {}).items(), key=lambda item: item[1][0], reverse=True)
+    return {
+        "total_expenses": from_minor(sum(total for total, count in months.values())),
+        "month_expenses": from_minor(months.get(month_key, (0, 0))[0]),
+        "week_expenses": from_minor(buckets.get("week", {}).get(week_key, (0, 0))[0]),
+        "total_records": sum(count for total, count in months.values()),
+        "category_breakdown": {key: from_minor(total) for key, (total, count) in categories}
+    }
+
+
+def _dashboard_from_facets(facets):
+    if not facets or not facets["overall"]:
+        return empty_dashboard()
+
+    def facet_total(name):
+        return from_minor(facets[name][0]["total"]) if facets[name] else 0
+
+    return {
+        "total_expenses": facet_total("overall"),
+        "month_expenses": facet_total("month"),
+        "week_expenses": facet_total("week"),
+        "total_records": facets["overall"][0]["count"],
+        "category_breakdown": {row["_id"]: from_minor(row["total"]) for row in facets["categories"]}
+    }
+
+
+def _total_pipeline(user_id, category=None, start=None, end=None):
+    return [
+        {"$match": _expense_filter(user_id, category, start, end)},
+        {"$project": {"amount": AMOUNT_MINOR}},
+        # Expenses without a usable amount are not counted, as in the dashboard and rollups
+        {"$match": {"amount": {"$ne": None}}},
+        {"$group": {
+            "_id": None,
+            "total": {"$sum": "$amount"},
+            "count": {"$sum": 1},
+        }},
+    ]
+
+
+def _total_from_months(buckets):
+    months = buckets.get("month", {})
+    return {
+        "total": from_minor(sum(total for total, count in months.values())),
+        "count": sum(count for total, count in months.values()),
+    }
+
+
+def _total_from_row(row):
+    if not row:
+        return {"total": 0, "count": 0}
+    return {"total": from_minor(row["total"]), "count": row["count"]}
+
+
+def _projection(fields):
+    if fields is None:
+        return None
+    projection = dict.fromkeys(fields, 1)
+    projection.setdefault("_id", 0)
+    return projection
+
+
+def _page_query(user_id, boundary, direction, category=None, start=None, end=None):
+    """(query, sort) for one keyset page past boundary=(date, id)"""
+    query = _expense_filter(user_id, category, start, end)
+    order = mg.DESCENDING if direction == "after" else mg.ASCENDING
+    if boundary is not None:
+        date, expense_id = boundary
+        op = "$lt" if direction == "after" else "$gt"
+        oid = _oid(expense_id)
+        query = {"$and": [query, {"$or": [{"date": {op: date}}, {"date": date, "_id": {op: oid}}]}]}
+    return query, [("date", order), ("_id", order)]
+
+
+SEARCH_PROJECTION = {"user_id": 0, "score": {"$meta": "textScore"}}
+SEARCH_SORT = [("score", {"$meta": "textScore"}), ("date", mg.DESCENDING), ("_id", mg.DESCENDING)]
+
+
+def _search_query(user_id, query, category=None, min_minor=None, max_minor=None):
+    """$text query over one user's notes, optionally limited to a category and an amount range.
+    Expenses not yet migrated to amount_minor never match an amount range."""
+    match = {"user_id": _oid(user_id), "$text": {"$search": query}}
+    if category:
+        match["category"] = category
+    amount_filter = {}
+    if min_minor is not None:
+        amount_filter["$gte"] = min_minor
+    if max_minor is not None:
+        amount_filter["$lte"] = max_minor
+    if amount_filter:
+        match["amount_minor"] = amount_filter
+    return match
+
+
+class MongoBackend(StorageBackend):
+    name = "mongo"
+    text_search = True
+
+    # --- Schema ---
+    def _collections(self):
+        return {"users": users_collection(), "expenses": expenses_collection(), "rollups": rollups_collection()}
+
+    def ensure_schema(self):
+        created = []
+        for key, collection in self._collections().items():
+            try:
+                if key in SCHEMAS:
+                    _apply_schema(collection, SCHEMAS[key])
+            except OperationFailure as e:
+                log.error("Error applying schema to %s: %s", collection.name, e)
+            for spec in INDEXES[key]:
+                try:
+                    try:
+                        collection.create_index(spec["keys"], name=spec["name"], unique=spec["unique"])
+                    except OperationFailure as e:
+                        if e.code not in INDEX_CONFLICT_CODES:
+                            raise
+                        # The index definition changed since it was built: replace it
+                        collection.drop_index(spec["name"])
+                        collection.create_index(spec["keys"], name=spec["name"], unique=spec["unique"])
+                    created.append(f"{collection.name}.{spec['name']}")
+                except OperationFailure as e:
+                    # e.g. existing duplicate usernames prevent building the unique index
+                    log.error("Error creating index %s on %s: %s", spec["name"], collection.name, e)
+        return created
+
+    def index_report(self):
+        report = []
+        for key, collection in self._collections().items():
+            existing = collection.index_information()
+            for spec in INDEXES[key]:
+                report.append({
+                    "collection": collection.name,
+                    "index": spec["name"],
+                    "keys": spec["keys"],
+                    "unique": spec["unique"],
+                    "present": spec["name"] in existing,
+                    "covers": spec["covers"],
+                })
+        return report
+
+    def reset(self):
+        for collection in self._collections().values():
+            collection.delete_many({})
+        quarantine_collection().delete_many({})
+
+    # --- Users ---
+    def create_user(self, user_data):
+        try:
+            result = users_collection().insert_one(dict(user_data))
+        except DuplicateKeyError:
+            # username_unique index (see ensure_schema) rejects taken usernames
+            return None
+        # A new user has no expenses, so their (empty) rollups are already complete
+        _mark_rollups_built(result.inserted_id)
+        return str(result.inserted_id)
+
+    def get_user_by_username(self, username):
+        return users_collection().find_one({"username": username})
+
+    def get_user_by_id(self, user_id):
+        try:
+            return users_collection().find_one({"_id": _oid(user_id)})
+        except ValueError:
+            return None
+
+    def update_user(self, user_id, changes):
+        try:
+            result = users_collection().update_one({"_id": _oid(user_id)}, {"$set": changes})
+        except ValueError:
+            return False
+        return result.matched_count > 0
+
+    def list_user_ids(self):
+        return [str(uid) for uid in users_collection().distinct("_id")]
+
+    # --- Expenses ---
+    def insert_expense(self, user_id, record):
+        doc = _with_int64(dict(record, user_id=_oid(user_id)))
+
+        def write(session):
+            result = expenses_collection().insert_one(doc, session=session)
+            _write_rollups(doc["user_id"], _expense_rollup_updates(doc["user_id"], doc, 1), session)
+            return str(result.inserted_id)
+        return _with_rollups(write)
+
+    def insert_expenses(self, user_id, records):
+        # Not a transaction: one bad row would abort the whole batch. A failed
+        # rollup update marks the rollups not built instead (see _write_rollups)
+        user_oid = _oid(user_id)
+        docs = [_with_int64(dict(rec, user_id=user_oid)) for rec in records]
+        if not docs:
+            return []
+        errors = []
+        try:
+            expenses_collection().insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            errors = [(err["index"], err.get("errmsg", "write error")) for err in e.details.get("writeErrors", [])]
+        failed = {position for position, _ in errors}
+        inserted = [doc for position, doc in enumerate(docs) if position not in failed]
+        if inserted:
+            _write_rollups(user_oid, _batch_rollup_updates(user_oid, inserted))
+        return errors
+
+    def get_expense(self, expense_id, user_id):
+        try:
+            return expenses_collection().find_one({"_id": _oid(expense_id), "user_id": _oid(user_id)})
+        except ValueError:
+            return None
+
+    def update_expense(self, expense_id, user_id, changes):
+        changes = _with_int64(dict(changes))
+        query = {"_id": _oid(expense_id), "user_id": _oid(user_id)}
+
+        def write(session):
+            previous = expenses_collection().find_one_and_update(
+                query, {"$set": changes}, return_document=ReturnDocument.BEFORE, session=session,
+            )
+            if previous is None:
+                return False
+            # Move the amount from the old buckets to the new ones
+            owner = previous["user_id"]
+            updates = _expense_rollup_updates(owner, previous, -1) + _expense_rollup_updates(owner, dict(previous, **changes), 1)
+            _write_rollups(owner, updates, session)
+            return True
+        return _with_rollups(write)
+
+    def delete_expense(self, expense_id, user_id):
+        try:
+            query = {"_id": _oid(expense_id), "user_id": _oid(user_id)}
+        except ValueError:
+            return False
+
+        def write(session):
+            deleted = expenses_collection().find_one_and_delete(query, session=session)
+            if deleted is None:
+                return False
+            _write_rollups(deleted["user_id"], _expense_rollup_updates(deleted["user_id"], deleted, -1), session)
+            return True
+        return _with_rollups(write)
+
+    def count_expenses(self, user_id, category=None, start=None, end=None):
+        return expenses_collection().count_documents(_expense_filter(user_id, category, start, end))
+
+    def iter_expenses(self, user_id, fields=None, category=None, start=None, end=None,
+                      newest_first=False, batch_size=LOAD_BATCH_SIZE):
+        cursor = expenses_collection().find(_expense_filter(user_id, category, start, end), _projection(fields))
+        # (user_id, date, _id) index returns the rows already in order
+        cursor = cursor.sort("date", mg.DESCENDING if newest_first else mg.ASCENDING).batch_size(batch_size)
+        yield from cursor
+
+    def page_expenses(self, user_id, limit, boundary=None, direction="after", category=None, start=None, end=None):
+        query, sort = _page_query(user_id, boundary, direction, category, start, end)
+        return list(expenses_collection().find(query, {"user_id": 0}).sort(sort).limit(limit))
+
+    def search_expenses(self, user_id, query, limit, offset=0, category=None, min_minor=None, max_minor=None):
+        match = _search_query(user_id, query, category, min_minor, max_minor)
+        cursor = expenses_collection().find(match, SEARCH_PROJECTION).sort(SEARCH_SORT)
+        return list(cursor.skip(offset).limit(limit))
+
+    # --- Amount migration ---
+    def legacy_amounts(self, after=None, limit=LOAD_BATCH_SIZE):
+        query = {"amount_minor": {"$exists": False}}
+        if after is not None:
+            query["_id"] = {"$gt": after}
+        # Walks the _id index; migrated documents drop out of the filter, so a rerun resumes
+        cursor = expenses_collection().find(query, {"Amount": 1}).sort("_id", mg.ASCENDING).limit(limit)
+        return [(doc["_id"], doc.get("Amount")) for doc in cursor]
+
+    def migrate_amounts(self, converted, quarantined):
+        unmigrated = {"amount_minor": {"$exists": False}}
+        if converted:
+            expenses_collection().bulk_write([
+                UpdateOne(
+                    dict(unmigrated, _id=expense_id),
+                    {"$set": {"Amount": from_minor(minor), "amount_minor": Int64(minor)}},
+                )
+                for expense_id, minor in converted
+            ], ordered=False)
+        if not quarantined:
+            return
+        reasons = dict(quarantined)
+        docs = list(expenses_collection().find(dict(unmigrated, _id={"$in": list(reasons)})))
+        if not docs:
+            return
+        # Copy first, then delete: a run interrupted in between only repeats the (idempotent) copy
+        now = datetime.now()
+        quarantine_collection().bulk_write([
+            ReplaceOne({"_id": doc["_id"]}, dict(doc, reason=reasons[doc["_id"]], quarantined_at=now), upsert=True)
+            for doc in docs
+        ], ordered=False)
+        expenses_collection().delete_many(dict(unmigrated, _id={"$in": [doc["_id"] for doc in docs]}))
+
+    # --- Aggregations ---
+    def expenses_total(self, user_id, category=None, start=None, end=None):
+        if not (category or start or end) and _rollups_ready(user_id):
+            return _total_from_months(_read_rollups(user_id, {"kind": "month"}))
+        return _total_from_row(next(expenses_collection().aggregate(_total_pipeline(user_id, category, start, end)), None))
+
+    def summary_minor(self, user_id, group_by="category", start=None, end=None, category=None):
+        kind, source = summary_source(group_by)
+        if not (category or start or end) and _rollups_ready(user_id):
+            buckets = _read_rollups(user_id, {"kind": source}).get(source, {})
+            rows = [(key, total) for key, (total, count) in buckets.items()]
+        else:
+            pipeline = _summary_pipeline(user_id, source, start, end, category)
+            rows = [(row["_id"], row["total"]) for row in expenses_collection().aggregate(pipeline)]
+        return fold_rows(rows, kind, source)
+
+    def dashboard_stats(self, user_id, today, category=None, start=None, end=None):
+        # Rollups hold whole-history buckets; filtered views read the (user_id, date) index
+        if not (category or start or end) and _rollups_ready(user_id):
+            return _dashboard_from_buckets(_read_rollups(user_id, _dashboard_rollups_query(today)), today)
+        pipeline = _dashboard_pipeline(user_id, today, category, start, end)
+        return _dashboard_from_facets(next(expenses_collection().aggregate(pipeline), None))
+
+    # --- Rollups ---
+    def _rollup_user_ids(self, user_id=None):
+        if user_id is not None:
+            return [_oid(user_id)]
+        return users_collection().distinct("_id")
+
+    def rebuild_rollups(self, user_id=None):
+        """Each user's rebuild is one transaction where the server supports them, so
+        concurrent expense writes either land before it (and are counted) or
+        conflict and retry after it. On a standalone server such writes can be
+        lost; run verify_rollups afterwards if the app was serving traffic."""
+        rebuilt = 0
+        for uid in self._rollup_user_ids(user_id):
+            _with_rollups(lambda session, uid=uid: _rebuild_user_rollups(uid, session))
+            rebuilt += 1
+        return rebuilt
+
+    def verify_rollups(self, user_id=None, tolerance=0.005):
+        drift = []
+        for uid in self._rollup_user_ids(user_id):
+            expected = _expected_rollups(uid)
+            stored = {
+                (doc["kind"], doc["key"]): (doc.get("total_minor", 0), doc["count"])
+                for doc in rollups_collection().find({"user_id": uid, "kind": {"$in": ROLLUP_KINDS}, "count": {"$ne": 0}})
+            }
+            if not _rollups_ready(uid):
+                drift.append({"user_id": str(uid), "kind": "meta", "key": ROLLUPS_BUILT_KEY, "expected": None, "stored": None})
+            for bucket in sorted(set(expected) | set(stored), key=str):
+                exp_total, exp_count = expected.get(bucket, (0, 0))
+                got_total, got_count = stored.get(bucket, (0, 0))
+                # Totals are exact minor units, so any tolerance below one minor unit means equality
+                if exp_count != got_count or abs(exp_total - got_total) > tolerance * MINOR_UNITS:
+                    drift.append({
+                        "user_id": str(uid),
+                        "kind": bucket[0],
+                        "key": bucket[1],
+                        "expected": {"total": from_minor(exp_total), "count": exp_count},
+                        "stored": {"total": from_minor(got_total), "count": got_count},
+                    })
+        return drift
@@ -0,0 +1,125 @@
+"""Asyncio read path for the MongoDB backend, on pymongo's AsyncMongoClient.
+
+Covers the queries the request handlers wait on (users, listing, search,
+totals, summary, dashboard). Queries and result shaping are shared with
+storage/mongo.py so both clients return identical data; writes stay on the
+synchronous backend, which also maintains the rollups.
+"""
+import pymongo as mg
+
+from connection import get_async_db
+from storage.base import LOAD_BATCH_SIZE, summary_rows, summary_source
+from storage.mongo import (
+    EXPENSES_COLLECTION_NAME,
+    ROLLUP_PROJECTION,
+    ROLLUPS_COLLECTION_NAME,
+    SEARCH_PROJECTION,
+    SEARCH_SORT,
+    USERS_COLLECTION_NAME,
+    _buckets_from_docs,
+    _dashboard_from_buckets,
+    _dashboard_from_facets,
+    _dashboard_pipeline,
+    _dashboard_rollups_query,
+    _expense_filter,
+    _oid,
+    _page_query,
+    _projection,
+    _rollups_query,
+    _rollups_ready_query,
+    _search_query,
+    _summary_pipeline,
+    _total_from_months,
+    _total_from_row,
+    _total_pipeline,
+)
+
+
+def users_collection():
+    return get_async_db()[USERS_COLLECTION_NAME]
+
+
+def expenses_collection():
+    return get_async_db()[EXPENSES_COLLECTION_NAME]
+
+
+def rollups_collection():
+    return get_async_db()[ROLLUPS_COLLECTION_NAME]
+
+
+async def _first(cursor):
+    async for doc in cursor:
+        return doc
+    return None
+
+
+async def _rollups_ready(user_id):
+    return await rollups_collection().find_one(_rollups_ready_query(user_id), {"_id": 1}) is not None
+
+
+async def _read_rollups(user_id, query):
+    cursor = rollups_collection().find(_rollups_query(user_id, query), ROLLUP_PROJECTION).sort("key", 1)
+    return _buckets_from_docs(await cursor.to_list(None))
+
+
+class AsyncMongoBackend:
+    name = "mongo"
+
+    # --- Users ---
+    async def get_user_by_username(self, username):
+        return await users_collection().find_one({"username": username})
+
+    async def get_user_by_id(self, user_id):
+        try:
+            return await users_collection().find_one({"_id": _oid(user_id)})
+        except ValueError:
+            return None
+
+    # --- Expenses ---
+    async def get_expense(self, expense_id, user_id):
+        try:
+            return await expenses_collection().find_one({"_id": _oid(expense_id), "user_id": _oid(user_id)})
+        except ValueError:
+            return None
+
+    async def count_expenses(self, user_id, category=None, start=None, end=None):
+        return await expenses_collection().count_documents(_expense_filter(user_id, category, start, end))
+
+    async def iter_expenses(self, user_id, fields=None, category=None, start=None, end=None,
+                            newest_first=False, batch_size=LOAD_BATCH_SIZE):
+        cursor = expenses_collection().find(_expense_filter(user_id, category, start, end), _projection(fields))
+        cursor = cursor.sort("date", mg.DESCENDING if newest_first else mg.ASCENDING).batch_size(batch_size)
+        async for doc in cursor:
+            yield doc
+
+    async def page_expenses(self, user_id, limit, boundary=None, direction="after", category=None, start=None, end=None):
+        query, sort = _page_query(user_id, boundary, direction, category, start, end)
+        return await expenses_collection().find(query, {"user_id": 0}).sort(sort).limit(limit).to_list(None)
+
+    async def search_expenses(self, user_id, query, limit, offset=0, category=None, min_minor=None, max_minor=None):
+        match = _search_query(user_id, query, category, min_minor, max_minor)
+        cursor = expenses_collection().find(match, SEARCH_PROJECTION).sort(SEARCH_SORT)
+        return await cursor.skip(offset).limit(limit).to_list(None)
+
+    # --- Aggregations ---
+    async def expenses_total(self, user_id, category=None, start=None, end=None):
+        if not (category or start or end) and await _rollups_ready(user_id):
+            return _total_from_months(await _read_rollups(user_id, {"kind": "month"}))
+        cursor = await expenses_collection().aggregate(_total_pipeline(user_id, category, start, end))
+        return _total_from_row(await _first(cursor))
+
+    async def summary(self, user_id, group_by="category", start=None, end=None, category=None):
+        kind, source = summary_source(group_by)
+        if not (category or start or end) and await _rollups_ready(user_id):
+            buckets = (await _read_rollups(user_id, {"kind": source})).get(source, {})
+            rows = [(key, total) for key, (total, count) in buckets.items()]
+        else:
+            cursor = await expenses_collection().aggregate(_summary_pipeline(user_id, source, start, end, category))
+            rows = [(row["_id"], row["total"]) async for row in cursor]
+        return summary_rows(rows, kind, source)
+
+    async def dashboard_stats(self, user_id, today, category=None, start=None, end=None):
+        if not (category or start or end) and await _rollups_ready(user_id):
+            return _dashboard_from_buckets(await _read_rollups(user_id, _dashboard_rollups_query(today)), today)
+        cursor = await expenses_collection().aggregate(_dashboard_pipeline(user_id, today, category, start, end))
+        return _dashboard_from_facets(await _first(cursor))
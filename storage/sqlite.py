@@ -0,0 +1,454 @@
+"""Embedded SQLite storage backend (EXPENSE_BACKEND=sqlite).
+
+Keeps everything in one file (SQLITE_PATH) so the app runs without a MongoDB
+server. Each thread of each process opens its own connection; WAL mode lets
+readers proceed while a writer commits.
+"""
+import os
+import sqlite3
+import threading
+from datetime import date as date_type, datetime
+
+from instrumentation import get_logger
+from storage.base import (
+    LOAD_BATCH_SIZE,
+    MINOR_UNITS,
+    StorageBackend,
+    current_period_bounds,
+    empty_dashboard,
+    fold_rows,
+    from_minor,
+    summary_source,
+)
+
+log = get_logger("databases")
+
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "expense_tracker.db")
+SQLITE_BUSY_TIMEOUT = float(os.environ.get("SQLITE_BUSY_TIMEOUT", 5))
+
+# Dates are stored as "YYYY-MM-DD HH:MM:SS" text, which sorts chronologically
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Summary group keys over that text; quarters and weeks are folded from these
+SUMMARY_KEYS = {
+    "category": "category",
+    "day": "substr(date, 1, 10)",
+    "month": "substr(date, 1, 7)",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL CHECK (length(username) > 0),
+    password_hash TEXT NOT NULL,
+    created_at TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS users_username ON users (username);
+CREATE TABLE IF NOT EXISTS expenses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    amount REAL,
+    amount_minor INTEGER,
+    category TEXT,
+    date TEXT NOT NULL,
+    notes TEXT
+);
+CREATE INDEX IF NOT EXISTS expenses_user_date ON expenses (user_id, date, id);
+CREATE TABLE IF NOT EXISTS expenses_quarantine (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER,
+    amount,
+    category TEXT,
+    date TEXT,
+    notes TEXT,
+    reason TEXT NOT NULL,
+    quarantined_at TEXT
+);
+"""
+# Added after the first release; ALTERed into older database files on connect
+ADDED_COLUMNS = {"expenses": [("amount_minor", "INTEGER")]}
+
+# Exact minor units. Rows written before amount_minor existed (and not yet
+# migrated) fall back to their REAL amount; text amounts count as missing.
+AMOUNT_MINOR = (
+    "COALESCE(amount_minor, CASE WHEN typeof(amount) IN ('integer', 'real') "
+    f"THEN CAST(ROUND(amount * {MINOR_UNITS}) AS INTEGER) END)"
+)
+
+# Same shape as the Mongo INDEXES so index_report() reads alike for both backends
+INDEXES = {
+    "users": [
+        {
+            "name": "users_username",
+            "keys": [("username", 1)],
+            "unique": True,
+            "covers": [
+                "get_user_by_username: WHERE username = ?",
+                "create_user: duplicate usernames rejected by the index (IntegrityError)",
+            ],
+        },
+    ],
+    "expenses": [
+        {
+            "name": "expenses_user_date",
+            "keys": [("user_id", 1), ("date", 1), ("id", 1)],
+            "unique": False,
+            "covers": [
+                "get_user_expenses_df / view_expenses_by_user: WHERE user_id = ? AND date BETWEEN ? AND ? ORDER BY date DESC",
+                "view_expenses_page: WHERE user_id = ? AND (date, id) < cursor ORDER BY date DESC, id DESC",
+                "iter_expenses: WHERE user_id = ? AND date BETWEEN ? AND ? ORDER BY date",
+                "get_expenses_total / get_summary_data / get_dashboard_stats: WHERE user_id = ? AND date BETWEEN ? AND ?",
+            ],
+        },
+    ],
+}
+
+# Document field -> column, so callers keep using the Mongo field names
+FIELD_COLUMNS = {
+    "_id": "id",
+    "user_id": "user_id",
+    "Amount": "amount",
+    "amount_minor": "amount_minor",
+    "category": "category",
+    "date": "date",
+    "notes": "notes",
+}
+
+
+INSERT_EXPENSE = (
+    "INSERT INTO expenses (user_id, amount, amount_minor, category, date, notes) VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+# Columns update_user may change
+USER_COLUMNS = ("username", "password_hash", "created_at")
+
+
+def _int_id(value):
+    """Integer row id from a string id; raises ValueError for malformed ids"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid id: {value!r}")
+
+
+def _to_text(value):
+    if isinstance(value, datetime):
+        return value.strftime(DATE_FORMAT)
+    if isinstance(value, date_type):
+        return value.strftime("%Y-%m-%d 00:00:00")
+    return value
+
+
+def _to_datetime(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def _document(row):
+    doc = dict(row)
+    for name in ("date", "created_at"):
+        if name in doc:
+            doc[name] = _to_datetime(doc[name])
+    return doc
+
+
+def _select_list(fields):
+    return ", ".join(f'{FIELD_COLUMNS[name]} AS "{name}"' for name in fields)
+
+
+def _expense_filter(user_id, category=None, start=None, end=None):
+    """(WHERE clause, params) for a user's expenses, optionally limited to a category and [start, end)"""
+    clauses = ["user_id = ?"]
+    params = [_int_id(user_id)]
+    if start is not None:
+        clauses.append("date >= ?")
+        params.append(_to_text(start))
+    if end is not None:
+        clauses.append("date < ?")
+        params.append(_to_text(end))
+    if category:
+        clauses.append("category = ?")
+        params.append(category)
+    return " AND ".join(clauses), params
+
+
+def _add_missing_columns(conn):
+    for table, columns in ADDED_COLUMNS.items():
+        existing = {row["name"] for row in conn.execute("PRAGMA table_info(%s)" % table)}
+        for name, decl in columns:
+            if name not in existing:
+                try:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+                except sqlite3.OperationalError:
+                    # Another connection added it first
+                    pass
+
+
+class SQLiteBackend(StorageBackend):
+    name = "sqlite"
+
+    def __init__(self, path=None):
+        self.path = path or SQLITE_PATH
+        self._local = threading.local()
+
+    def _connection(self):
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            # Connections must not be shared across fork(), so reopen in each process
+            conn = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.executescript(SCHEMA)
+            _add_missing_columns(conn)
+            local.conn, local.pid = conn, os.getpid()
+        return local.conn
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local = threading.local()
+
+    # --- Schema ---
+    def ensure_schema(self):
+        # The schema is applied whenever a connection is opened
+        self._connection()
+        return [f"{table}.{spec['name']}" for table, specs in INDEXES.items() for spec in specs]
+
+    def index_report(self):
+        conn = self._connection()
+        report = []
+        for table, specs in INDEXES.items():
+            existing = {row["name"] for row in conn.execute("PRAGMA index_list(%s)" % table)}
+            for spec in specs:
+                report.append({
+                    "collection": table,
+                    "index": spec["name"],
+                    "keys": spec["keys"],
+                    "unique": spec["unique"],
+                    "present": spec["name"] in existing,
+                    "covers": spec["covers"],
+                })
+        return report
+
+    def reset(self):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM expenses")
+            conn.execute("DELETE FROM expenses_quarantine")
+            conn.execute("DELETE FROM users")
+
+    # --- Users ---
+    def create_user(self, user_data):
+        try:
+            with self._connection() as conn:
+                cursor = conn.execute(
+                    "INSERT INTO users (username, password_hash, created_at) VALUES (?, ?, ?)",
+                    (user_data["username"], user_data["password_hash"], _to_text(user_data.get("created_at"))),
+                )
+        except sqlite3.IntegrityError:
+            return None
+        return str(cursor.lastrowid)
+
+    def _find_user(self, where, params):
+        row = self._connection().execute(
+            f'SELECT id AS "_id", username, password_hash, created_at FROM users WHERE {where}', params
+        ).fetchone()
+        return _document(row) if row else None
+
+    def get_user_by_username(self, username):
+        return self._find_user("username = ?", (username,))
+
+    def get_user_by_id(self, user_id):
+        try:
+            return self._find_user("id = ?", (_int_id(user_id),))
+        except ValueError:
+            return None
+
+    def update_user(self, user_id, changes):
+        assignments = ", ".join(f"{name} = ?" for name in changes if name in USER_COLUMNS)
+        if not assignments:
+            return False
+        params = [_to_text(value) for name, value in changes.items() if name in USER_COLUMNS]
+        try:
+            params.append(_int_id(user_id))
+        except ValueError:
+            return False
+        with self._connection() as conn:
+            cursor = conn.execute(f"UPDATE users SET {assignments} WHERE id = ?", params)
+        return cursor.rowcount > 0
+
+    def list_user_ids(self):
+        return [str(row[0]) for row in self._connection().execute("SELECT id FROM users ORDER BY id")]
+
+    # --- Expenses ---
+    def _insert_params(self, user_id, record):
+        return (
+            user_id, record["Amount"], record.get("amount_minor"), record["category"],
+            _to_text(record["date"]), record.get("notes"),
+        )
+
+    def insert_expense(self, user_id, record):
+        with self._connection() as conn:
+            cursor = conn.execute(INSERT_EXPENSE, self._insert_params(_int_id(user_id), record))
+        return str(cursor.lastrowid)
+
+    def insert_expenses(self, user_id, records):
+        uid = _int_id(user_id)
+        sql = INSERT_EXPENSE
+        params = [self._insert_params(uid, rec) for rec in records]
+        conn = self._connection()
+        try:
+            with conn:
+                conn.executemany(sql, params)
+            return []
+        except sqlite3.Error:
+            pass
+        # Some row failed and the batch was rolled back: retry row by row to keep the good ones
+        errors = []
+        with conn:
+            for position, row in enumerate(params):
+                try:
+                    conn.execute(sql, row)
+                except sqlite3.Error as e:
+                    errors.append((position, str(e)))
+        return errors
+
+    def get_expense(self, expense_id, user_id):
+        try:
+            row = self._connection().execute(
+                f"SELECT {_select_list(FIELD_COLUMNS)} FROM expenses WHERE id = ? AND user_id = ?",
+                (_int_id(expense_id), _int_id(user_id)),
+            ).fetchone()
+        except ValueError:
+            return None
+        return _document(row) if row else None
+
+    def update_expense(self, expense_id, user_id, changes):
+        assignments = ", ".join(f"{FIELD_COLUMNS[name]} = ?" for name in changes)
+        params = [_to_text(value) for value in changes.values()]
+        with self._connection() as conn:
+            cursor = conn.execute(
+                f"UPDATE expenses SET {assignments} WHERE id = ? AND user_id = ?",
+                params + [_int_id(expense_id), _int_id(user_id)],
+            )
+        return cursor.rowcount > 0
+
+    def delete_expense(self, expense_id, user_id):
+        try:
+            params = (_int_id(expense_id), _int_id(user_id))
+        except ValueError:
+            return False
+        with self._connection() as conn:
+            cursor = conn.execute("DELETE FROM expenses WHERE id = ? AND user_id = ?", params)
+        return cursor.rowcount > 0
+
+    def count_expenses(self, user_id, category=None, start=None, end=None):
+        where, params = _expense_filter(user_id, category, start, end)
+        return self._connection().execute(f"SELECT COUNT(*) FROM expenses WHERE {where}", params).fetchone()[0]
+
+    def iter_expenses(self, user_id, fields=None, category=None, start=None, end=None,
+                      newest_first=False, batch_size=LOAD_BATCH_SIZE):
+        where, params = _expense_filter(user_id, category, start, end)
+        order = "DESC" if newest_first else "ASC"
+        cursor = self._connection().execute(
+            f"SELECT {_select_list(fields or FIELD_COLUMNS)} FROM expenses WHERE {where} ORDER BY date {order}, id {order}",
+            params,
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield _document(row)
+
+    def page_expenses(self, user_id, limit, boundary=None, direction="after", category=None, start=None, end=None):
+        where, params = _expense_filter(user_id, category, start, end)
+        order = "DESC" if direction == "after" else "ASC"
+        if boundary is not None:
+            date, expense_id = boundary
+            op = "<" if direction == "after" else ">"
+            where += f" AND (date {op} ? OR (date = ? AND id {op} ?))"
+            params += [_to_text(date), _to_text(date), _int_id(expense_id)]
+        fields = [name for name in FIELD_COLUMNS if name != "user_id"]
+        rows = self._connection().execute(
+            f"SELECT {_select_list(fields)} FROM expenses WHERE {where} ORDER BY date {order}, id {order} LIMIT ?",
+            params + [limit],
+        )
+        return [_document(row) for row in rows]
+
+    # --- Amount migration ---
+    def legacy_amounts(self, after=None, limit=LOAD_BATCH_SIZE):
+        rows = self._connection().execute(
+            "SELECT id, amount FROM expenses WHERE amount_minor IS NULL AND id > ? ORDER BY id LIMIT ?",
+            (after if after is not None else 0, limit),
+        )
+        return [(row[0], row[1]) for row in rows]
+
+    def migrate_amounts(self, converted, quarantined):
+        with self._connection() as conn:
+            conn.executemany(
+                "UPDATE expenses SET amount = ?, amount_minor = ? WHERE id = ? AND amount_minor IS NULL",
+                [(from_minor(minor), minor, expense_id) for expense_id, minor in converted],
+            )
+            now = _to_text(datetime.now())
+            for expense_id, reason in quarantined:
+                conn.execute(
+                    "INSERT OR REPLACE INTO expenses_quarantine "
+                    "SELECT id, user_id, amount, category, date, notes, ?, ? FROM expenses "
+                    "WHERE id = ? AND amount_minor IS NULL",
+                    (reason, now, expense_id),
+                )
+                conn.execute("DELETE FROM expenses WHERE id = ? AND amount_minor IS NULL", (expense_id,))
+
+    # --- Aggregations ---
+    def expenses_total(self, user_id, category=None, start=None, end=None):
+        where, params = _expense_filter(user_id, category, start, end)
+        total, count = self._connection().execute(
+            # Rows without a usable amount are left out of the count, as in dashboard_stats
+            f"SELECT COALESCE(SUM({AMOUNT_MINOR}), 0), COUNT({AMOUNT_MINOR}) FROM expenses WHERE {where}", params
+        ).fetchone()
+        return {"total": from_minor(total), "count": count}
+
+    def summary_minor(self, user_id, group_by="category", start=None, end=None, category=None):
+        where, params = _expense_filter(user_id, category, start, end)
+        kind, source = summary_source(group_by)
+        if kind == "week":
+            # SQLite has no ISO week format: total per day here, fold days into weeks below
+            source = "day"
+        key = SUMMARY_KEYS[source]
+        rows = self._connection().execute(
+            f"SELECT {key} AS grp, SUM({AMOUNT_MINOR}) AS total FROM expenses "
+            f"WHERE {where} AND {key} IS NOT NULL GROUP BY grp HAVING total IS NOT NULL ORDER BY grp",
+            params,
+        ).fetchall()
+        return fold_rows([(grp, total) for grp, total in rows], kind, source)
+
+    def dashboard_stats(self, user_id, today, category=None, start=None, end=None):
+        month_start, month_end, week_start, week_end = (_to_text(d) for d in current_period_bounds(today))
+        conn = self._connection()
+        where, params = _expense_filter(user_id, category, start, end)
+        count, total, month_total, week_total = conn.execute(
+            f"""
+            SELECT COUNT(*), SUM(minor),
+                   SUM(CASE WHEN date >= ? AND date < ? THEN minor ELSE 0 END),
+                   SUM(CASE WHEN date >= ? AND date < ? THEN minor ELSE 0 END)
+            FROM (SELECT date, {AMOUNT_MINOR} AS minor FROM expenses WHERE {where})
+            WHERE minor IS NOT NULL
+            """,
+            [month_start, month_end, week_start, week_end, *params],
+        ).fetchone()
+        if not count:
+            return empty_dashboard()
+        categories = conn.execute(
+            f"SELECT category, SUM({AMOUNT_MINOR}) AS total FROM expenses "
+            f"WHERE {where} AND category IS NOT NULL "
+            "GROUP BY category HAVING total IS NOT NULL ORDER BY total DESC",
+            params,
+        )
+        return {
+            "total_expenses": from_minor(total),
+            "month_expenses": from_minor(month_total),
+            "week_expenses": from_minor(week_total),
+            "total_records": count,
+            "category_breakdown": {category: from_minor(cat_total) for category, cat_total in categories}
+        }
@@ -0,0 +1,60 @@
+import os
+import sys
+
+# The modules live at the repository root, like the app and scripts expect
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path):
+    """A fresh SQLite backend installed as the process-wide backend for one test"""
+    import storage
+    from storage.sqlite import SQLiteBackend
+
+    backend = SQLiteBackend(str(tmp_path / "expenses.db"))
+    backend.ensure_schema()
+    previous = storage.set_backend(backend)
+    yield backend
+    storage.set_backend(previous)
+    backend.close()
+    _clear_caches()
+
+
+def _clear_caches():
+    # User ids restart at 1 in every fresh database; nothing cached may outlive its test
+    import charts
+    import databases
+
+    with databases._DATA_VERSIONS_LOCK:
+        databases._DATA_VERSIONS.clear()
+    databases.EXPENSE_FRAME_CACHE.clear()
+    databases.SEARCH_INDEX_CACHE.clear()
+    charts.CHART_CACHE.clear()
+
+
+@pytest.fixture
+def mongo_backend(monkeypatch):
+    """The MongoDB backend on a scratch database of the MONGO_TEST_URI server; skipped without one"""
+    uri = os.environ.get("MONGO_TEST_URI")
+    if not uri:
+        pytest.skip("set MONGO_TEST_URI to run the MongoDB backend tests")
+    import connection
+    import databases
+    import storage
+    from storage import mongo
+    from storage.mongo import MongoBackend
+
+    monkeypatch.setenv("MONGO_URI", uri)
+    monkeypatch.setenv("MONGO_DB", "expense_tracker_test")
+    monkeypatch.setattr(connection, "_client", None)
+    monkeypatch.setattr(mongo, "_server_transactions", None)
+    backend = MongoBackend()
+    previous = storage.set_backend(backend)
+    databases.reset_all()
+    backend.ensure_schema()
+    yield backend
+    databases.reset_all()
+    storage.set_backend(previous)
+    connection.get_client().close()
@@ -0,0 +1,141 @@
+import io
+from datetime import datetime
+
+import pytest
+
+import databases
+import importer
+from storage.base import MAX_MINOR, from_minor, parse_minor, to_minor
+
+
+@pytest.mark.parametrize("value, minor", [
+    (12, 1200),
+    (12.5, 1250),
+    (0.1 + 0.2, 30),
+    ("19.99", 1999),
+    (" 1,234.50 ", 123450),
+    ("-3.2", -320),
+    # Fractions of a paisa round half up, away from zero
+    ("0.005", 1),
+    ("0.004", 0),
+    ("-0.005", -1),
+    ("2.675", 268),
+])
+def test_parse_minor_rounds_to_whole_minor_units(value, minor):
+    assert parse_minor(value) == (minor, None)
+
+
+@pytest.mark.parametrize("value, reason", [
+    (None, "missing amount"),
+    (True, "not a number"),
+    ("abc", "not a number"),
+    ("", "not a number"),
+    ("nan", "not a finite number"),
+    (float("inf"), "not a finite number"),
+    ("1e30", "out of range"),
+    (MAX_MINOR // 100 + 1, "out of range"),
+])
+def test_parse_minor_rejects_unusable_amounts(value, reason):
+    assert parse_minor(value) == (None, reason)
+
+
+def test_largest_amount_round_trips():
+    minor = to_minor(MAX_MINOR // 100)
+    assert minor <= MAX_MINOR
+    assert to_minor(from_minor(minor)) == minor
+
+
+def _legacy_expenses(backend, amounts):
+    """A user with expenses stored before amount_minor existed"""
+    user_id = backend.create_user({"username": "legacy", "password_hash": "x", "created_at": datetime.now()})
+    for day, amount in enumerate(amounts, start=1):
+        backend.insert_expense(user_id, {
+            "Amount": amount, "category": "Food", "date": datetime(2024, 6, day), "notes": f"row {day}",
+        })
+    return user_id
+
+
+def _stored(backend):
+    rows = backend._connection().execute("SELECT notes, amount, amount_minor FROM expenses ORDER BY id")
+    return [tuple(row) for row in rows]
+
+
+def _quarantined(backend):
+    rows = backend._connection().execute("SELECT notes, amount, reason FROM expenses_quarantine ORDER BY id")
+    return [tuple(row) for row in rows]
+
+
+def test_migration_converts_and_quarantines(sqlite_backend):
+    _legacy_expenses(sqlite_backend, [10, 12.345, "7.5", "abc", None])
+
+    report = databases.migrate_amounts(batch_size=2)
+
+    assert (report["scanned"], report["converted"], report["quarantined"]) == (5, 3, 2)
+    assert [reject["reason"] for reject in report["rejects"]] == ["not a number", "missing amount"]
+    assert _stored(sqlite_backend) == [
+        ("row 1", 10.0, 1000),
+        ("row 2", 12.35, 1235),
+        ("row 3", 7.5, 750),
+    ]
+    assert _quarantined(sqlite_backend) == [("row 4", "abc", "not a number"), ("row 5", None, "missing amount")]
+    assert sqlite_backend.legacy_amounts() == []
+
+
+def test_migration_dry_run_writes_nothing(sqlite_backend):
+    _legacy_expenses(sqlite_backend, [10, "abc"])
+    before = _stored(sqlite_backend)
+
+    report = databases.migrate_amounts(dry_run=True)
+
+    assert (report["converted"], report["quarantined"]) == (1, 1)
+    assert _stored(sqlite_backend) == before
+    assert _quarantined(sqlite_backend) == []
+
+
+def test_interrupted_migration_resumes(sqlite_backend):
+    _legacy_expenses(sqlite_backend, [1, 2, "bad", 4, 5])
+
+    def interrupt(report):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        databases.migrate_amounts(batch_size=2, progress=interrupt)
+    # The first batch was written before the interruption
+    assert len(sqlite_backend.legacy_amounts()) == 3
+
+    report = databases.migrate_amounts(batch_size=2)
+
+    # Only the rows left over are read again
+    assert (report["scanned"], report["converted"], report["quarantined"]) == (3, 2, 1)
+    assert [minor for _, _, minor in _stored(sqlite_backend)] == [100, 200, 400, 500]
+    assert _quarantined(sqlite_backend) == [("row 3", "bad", "not a number")]
+    assert databases.migrate_amounts(batch_size=2)["scanned"] == 0
+
+
+def _stored_minor_by_notes(backend):
+    return {notes: minor for notes, _, minor in _stored(backend)}
+
+
+@pytest.mark.parametrize("fmt, data", [
+    ("csv", 'date,amount,category,notes\n'
+            '2024-06-01,1.005,Food,a\n'
+            '2024-06-02,0.125,Food,b\n'
+            '2024-06-03,"1,234.50",Food,c\n'
+            '2024-06-04,19.99,Food,d\n'),
+    ("jsonl", '{"date": "2024-06-01", "amount": 1.005, "category": "Food", "notes": "a"}\n'
+              '{"date": "2024-06-02", "amount": "0.125", "category": "Food", "notes": "b"}\n'
+              '{"date": "2024-06-03", "amount": "1,234.50", "category": "Food", "notes": "c"}\n'
+              '{"date": "2024-06-04", "amount": 19.99, "category": "Food", "notes": "d"}\n'),
+], ids=["csv", "jsonl"])
+def test_import_stores_the_same_minor_units_as_the_form(sqlite_backend, fmt, data):
+    form_user = sqlite_backend.create_user({"username": "form", "password_hash": "x", "created_at": datetime.now()})
+    for day, (amount, notes) in enumerate([("1.005", "a"), ("0.125", "b"), ("1,234.50", "c"), ("19.99", "d")], start=1):
+        assert databases.add_expenses(form_user, amount, "Food", f"2024-06-{day:02d}", notes)
+    form = _stored_minor_by_notes(sqlite_backend)
+    sqlite_backend._connection().execute("DELETE FROM expenses")
+
+    import_user = sqlite_backend.create_user({"username": "import", "password_hash": "x", "created_at": datetime.now()})
+    report = importer.import_expenses(import_user, io.StringIO(data), fmt)
+
+    assert (report["inserted"], report["rejected"]) == (4, 0)
+    assert _stored_minor_by_notes(sqlite_backend) == form == {"a": 101, "b": 13, "c": 123450, "d": 1999}
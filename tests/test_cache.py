@@ -0,0 +1,89 @@
+from datetime import datetime
+
+import pytest
+
+import charts
+import databases
+
+
+@pytest.fixture
+def users(sqlite_backend):
+    """Two users with one expense each"""
+    ids = []
+    for name in ("alice", "bob"):
+        user_id = sqlite_backend.create_user({"username": name, "password_hash": "x", "created_at": datetime.now()})
+        assert databases.add_expenses(user_id, "10", "Food", "2024-06-01", f"{name} lunch")
+        ids.append(user_id)
+    return ids
+
+
+def _hits():
+    return databases.expense_cache_stats()["hits"]
+
+
+def _amounts(user_id):
+    return sorted(databases.get_user_expenses_df(user_id)["Amount"].tolist())
+
+
+def test_repeat_reads_are_served_from_the_cache(users):
+    alice, _ = users
+    first = databases.get_user_expenses_df(alice)
+    hits = _hits()
+
+    first["Amount"] = 0.0
+    again = databases.get_user_expenses_df(alice)
+
+    assert _hits() == hits + 1
+    # Callers get copies: changing one does not change the cached frame
+    assert again["Amount"].tolist() == [10.0]
+
+
+def test_every_write_invalidates_the_users_frames(users):
+    alice, _ = users
+    assert _amounts(alice) == [10.0]
+
+    assert databases.add_expenses(alice, "5.5", "Transport", "2024-06-02", "cab")
+    assert _amounts(alice) == [5.5, 10.0]
+
+    cab = next(row for row in databases.view_expenses_by_user(alice) if row["notes"] == "cab")
+    assert databases.update_expense(cab["id"], alice, "7", "Transport", "2024-06-02", "cab")
+    assert _amounts(alice) == [7.0, 10.0]
+
+    assert databases.delete_expense(cab["id"], alice)
+    assert _amounts(alice) == [10.0]
+
+
+def test_bulk_import_invalidates_the_users_frames(users):
+    import pandas as pd
+
+    alice, _ = users
+    assert _amounts(alice) == [10.0]
+
+    databases.add_expenses_bulk(
+        alice, pd.Series(pd.to_datetime(["2024-06-03"])), pd.Series(["2.25"]), pd.Series(["Food"]), pd.Series(["snack"]),
+    )
+
+    assert _amounts(alice) == [2.25, 10.0]
+
+
+def test_a_write_keeps_other_users_entries(users):
+    alice, bob = users
+    databases.get_user_expenses_df(bob)
+
+    assert databases.add_expenses(alice, "1", "Food", "2024-06-02", "tea")
+    hits = _hits()
+    assert _amounts(bob) == [10.0]
+
+    assert _hits() == hits + 1
+
+
+def test_summary_entries_follow_the_data_version(users):
+    alice, _ = users
+    before = charts.summary_entry(alice, "category", "₹", databases.get_summary_data)
+    assert charts.summary_entry(alice, "category", "₹", databases.get_summary_data) is before
+
+    assert databases.add_expenses(alice, "5", "Transport", "2024-06-02", "bus")
+    after = charts.summary_entry(alice, "category", "₹", databases.get_summary_data)
+
+    assert after["etag"] != before["etag"]
+    assert after["total"] == 15.0
@@ -0,0 +1,103 @@
+import io
+from datetime import datetime
+
+import pytest
+
+import databases
+import importer
+
+CSV = (
+    "Date,Amount,Category,Notes\n"
+    "2024-06-01,12.50,Food,lunch\n"       # line 2
+    "2024-06-02,abc,Food,bad amount\n"    # line 3
+    "2024-06-03,-4,Food,negative\n"       # line 4
+    "2024-13-01,4,Food,bad date\n"        # line 5
+    "2024-06-05,4,Rent,unknown\n"         # line 6
+    "05/06/2024,4,Transport,\n"           # line 7
+)
+
+
+@pytest.fixture
+def user_id(sqlite_backend):
+    return sqlite_backend.create_user({"username": "u", "password_hash": "x", "created_at": datetime.now()})
+
+
+def _import(user_id, data, fmt="csv", **kwargs):
+    return importer.import_expenses(user_id, io.StringIO(data), fmt, **kwargs)
+
+
+@pytest.mark.parametrize("batch_size", [1000, 2])
+def test_rejects_are_reported_with_their_file_lines(user_id, batch_size):
+    report = _import(user_id, CSV, batch_size=batch_size)
+
+    assert (report["read"], report["inserted"], report["rejected"]) == (6, 2, 4)
+    assert report["rejects"] == [
+        {"line": 3, "reason": "invalid amount"},
+        {"line": 4, "reason": "negative amount"},
+        {"line": 5, "reason": "invalid date"},
+        {"line": 6, "reason": "unknown category"},
+    ]
+    assert not report["truncated"]
+
+
+def test_valid_rows_are_stored(user_id):
+    _import(user_id, CSV)
+
+    rows = sorted(databases.view_expenses_by_user(user_id), key=lambda row: row["notes"])
+    assert [(row["date"], row["Amount"], row["category"], row["notes"]) for row in rows] == [
+        # DD/MM/YYYY dates are accepted; empty notes get the default
+        ("05/06/2024", 4.0, "Transport", "No notes"),
+        ("01/06/2024", 12.5, "Food", "lunch"),
+    ]
+
+
+def test_json_lines_are_numbered_from_one(user_id):
+    data = (
+        '{"date": "2024-06-01", "amount": 3, "category": "Food"}\n'
+        '{"date": "2024-06-02", "amount": null, "category": "Food"}\n'
+        '{"date": "2024-06-03", "amount": 3, "category": "Pets"}\n'
+    )
+
+    report = _import(user_id, data, "jsonl", batch_size=2)
+
+    assert report["inserted"] == 1
+    assert report["rejects"] == [{"line": 2, "reason": "invalid amount"}, {"line": 3, "reason": "unknown category"}]
+
+
+def test_reported_rejects_are_capped(user_id, monkeypatch):
+    monkeypatch.setattr(importer, "MAX_REPORTED_REJECTS", 2)
+
+    report = _import(user_id, CSV)
+
+    assert report["rejected"] == 4
+    assert [reject["line"] for reject in report["rejects"]] == [3, 4]
+    assert report["truncated"]
+
+
+def test_rows_the_backend_rejects_keep_their_lines(user_id, sqlite_backend, monkeypatch):
+    insert_expenses = sqlite_backend.insert_expenses
+
+    def fail_notes_marked_bad(user_id, records):
+        keep = [rec for rec in records if rec["notes"] != "rejected by backend"]
+        failed = [(position, "write error") for position, rec in enumerate(records) if rec["notes"] == "rejected by backend"]
+        insert_expenses(user_id, keep)
+        return failed
+
+    monkeypatch.setattr(sqlite_backend, "insert_expenses", fail_notes_marked_bad)
+    data = (
+        "date,amount,category,notes\n"
+        "2024-06-01,1,Food,ok\n"
+        "2024-06-02,x,Food,bad amount\n"
+        "2024-06-03,1,Food,rejected by backend\n"
+        "2024-06-04,1,Food,ok\n"
+    )
+
+    report = _import(user_id, data)
+
+    assert (report["inserted"], report["rejected"]) == (2, 2)
+    assert report["rejects"] == [{"line": 3, "reason": "invalid amount"}, {"line": 4, "reason": "write error"}]
+
+
+def test_missing_required_column_is_an_error(user_id):
+    with pytest.raises(ValueError, match="amount"):
+        _import(user_id, "date,category\n2024-06-01,Food\n")
@@ -0,0 +1,88 @@
+import base64
+from datetime import datetime
+
+import pytest
+
+import databases
+
+
+@pytest.fixture
+def user_id(sqlite_backend):
+    """A user with five expenses, two of them on the same day"""
+    user_id = sqlite_backend.create_user({"username": "u", "password_hash": "x", "created_at": datetime.now()})
+    for day, notes in ((1, "a"), (2, "b"), (2, "c"), (3, "d"), (4, "e")):
+        assert databases.add_expenses(user_id, "10", "Food", f"2024-06-{day:02d}", notes)
+    return user_id
+
+
+def _notes(page):
+    return [expense["notes"] for expense in page["expenses"]]
+
+
+def _token(raw):
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def test_first_page_has_only_a_next_cursor(user_id):
+    page = databases.view_expenses_page(user_id, page_size=2)
+
+    # Newest first; rows on the same day follow the (date, id) order
+    assert _notes(page) == ["e", "d"]
+    assert page["prev_cursor"] is None
+    assert page["next_cursor"] is not None
+
+
+def test_next_cursors_walk_every_row_once(user_id):
+    pages = [databases.view_expenses_page(user_id, page_size=2)]
+    while pages[-1]["next_cursor"]:
+        pages.append(databases.view_expenses_page(user_id, after=pages[-1]["next_cursor"], page_size=2))
+
+    assert [_notes(page) for page in pages] == [["e", "d"], ["c", "b"], ["a"]]
+    assert all(page["prev_cursor"] for page in pages[1:])
+
+
+def test_prev_cursors_walk_back_to_the_first_page(user_id):
+    first = databases.view_expenses_page(user_id, page_size=2)
+    second = databases.view_expenses_page(user_id, after=first["next_cursor"], page_size=2)
+    last = databases.view_expenses_page(user_id, after=second["next_cursor"], page_size=2)
+    assert last["next_cursor"] is None
+
+    back = databases.view_expenses_page(user_id, before=last["prev_cursor"], page_size=2)
+    assert _notes(back) == ["c", "b"]
+    assert back["next_cursor"] is not None and back["prev_cursor"] is not None
+
+    top = databases.view_expenses_page(user_id, before=back["prev_cursor"], page_size=2)
+    assert _notes(top) == ["e", "d"]
+    # Nothing newer: the first page again, reached backwards
+    assert top["prev_cursor"] is None
+    assert top["next_cursor"] is not None
+
+
+def test_page_past_the_last_row_is_empty(user_id):
+    last = databases.view_expenses_page(user_id, page_size=5)
+    assert last["next_cursor"] is None
+
+    beyond = databases.view_expenses_page(user_id, after=databases._encode_cursor({
+        "date": datetime(2024, 6, 1), "_id": 0,
+    }), page_size=5)
+
+    assert beyond["expenses"] == []
+    assert beyond["next_cursor"] is None and beyond["prev_cursor"] is None
+
+
+def test_page_size_is_clamped(user_id):
+    assert databases.view_expenses_page(user_id, page_size=0)["page_size"] == 1
+    assert databases.view_expenses_page(user_id, page_size=10 ** 6)["page_size"] == databases.MAX_PAGE_SIZE
+
+
+@pytest.mark.parametrize("token", [
+    "not a token",
+    _token("2024-06-01T00:00:00"),
+    _token("yesterday|1"),
+    _token("2024-06-01T00:00:00|not-an-id"),
+])
+def test_invalid_tokens_are_rejected(user_id, token):
+    with pytest.raises(ValueError):
+        databases.view_expenses_page(user_id, after=token)
+    with pytest.raises(ValueError):
+        databases.view_expenses_page(user_id, before=token)
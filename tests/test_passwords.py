@@ -0,0 +1,31 @@
+import pytest
+
+pytest.importorskip("werkzeug")
+
+import passwords
+
+
+@pytest.fixture
+def hash_method(monkeypatch):
+    def use(method):
+        monkeypatch.setattr(passwords, "HASH_METHOD", method)
+    return use
+
+
+@pytest.mark.parametrize("method", [
+    "scrypt",
+    "scrypt:32768:8:1",
+    "pbkdf2:sha256",
+    "pbkdf2:sha256:1000000",
+])
+def test_hash_made_with_current_method_is_not_stale(hash_method, method):
+    hash_method(method)
+    assert not passwords.needs_rehash(passwords.hash_password("secret"))
+
+
+def test_hash_made_with_other_parameters_is_stale(hash_method):
+    hash_method("pbkdf2:sha256:1000")
+    old_hash = passwords.hash_password("secret")
+    hash_method("scrypt")
+    assert passwords.needs_rehash(old_hash)
+    assert passwords.check_password(old_hash, "secret")
@@ -0,0 +1,31 @@
+from datetime import datetime
+
+import databases
+from query_args import filter_query_args, read_filters
+
+
+def test_end_date_is_the_next_midnight_exclusive():
+    filters = read_filters({"start": "2024-06-01", "end": "2024-06-30", "category": "Food"})
+
+    assert filters == {"category": "Food", "start": datetime(2024, 6, 1), "end": datetime(2024, 7, 1)}
+    # Links and forms show the day the user picked
+    assert filter_query_args(filters) == {"category": "Food", "start": "2024-06-01", "end": "2024-06-30"}
+
+
+def test_malformed_dates_are_ignored():
+    assert read_filters({"start": "bad", "end": "2024-13-01"}) == {"category": None, "start": None, "end": None}
+
+
+def test_end_date_covers_the_whole_last_day(sqlite_backend):
+    user_id = sqlite_backend.create_user({"username": "u", "password_hash": "x", "created_at": datetime.now()})
+    for date in (datetime(2024, 5, 31, 23, 59, 59), datetime(2024, 6, 1), datetime(2024, 6, 30, 23, 59, 59),
+                 datetime(2024, 7, 1)):
+        sqlite_backend.insert_expense(user_id, {
+            "Amount": 1.0, "amount_minor": 100, "category": "Food", "date": date, "notes": date.isoformat(),
+        })
+
+    filters = read_filters({"start": "2024-06-01", "end": "2024-06-30"})
+
+    assert databases.get_expenses_total(user_id, **filters)["count"] == 2
+    rows = databases.view_expenses_by_user(user_id, **filters)
+    assert sorted(row["notes"] for row in rows) == ["2024-06-01T00:00:00", "2024-06-30T23:59:59"]
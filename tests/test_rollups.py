@@ -0,0 +1,122 @@
+from datetime import datetime
+
+import pytest
+
+import databases
+
+
+class FailingRollupWrites:
+    """A rollups collection whose $inc updates fail, e.g. during a failover"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def bulk_write(self, *args, **kwargs):
+        from pymongo.errors import OperationFailure
+
+        raise OperationFailure("rollup write failed")
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+
+def _user(backend, username="alice"):
+    return backend.create_user({"username": username, "password_hash": "x", "created_at": datetime.now()})
+
+
+def _add(user_id, amount, category, day, notes="No notes"):
+    assert databases.add_expenses(user_id, amount, category, f"2024-06-{day:02d}", notes)
+
+
+def _fail_rollup_writes(monkeypatch):
+    from storage import mongo
+
+    collection = mongo.rollups_collection
+    monkeypatch.setattr(mongo, "rollups_collection", lambda: FailingRollupWrites(collection()))
+
+
+def test_sqlite_has_no_rollups_to_drift(sqlite_backend):
+    user_id = _user(sqlite_backend)
+    _add(user_id, "12.50", "Food", 1)
+
+    assert databases.rebuild_rollups(user_id) == 0
+    assert databases.verify_rollups(user_id) == []
+
+
+def test_rollups_follow_every_write(mongo_backend):
+    user_id = _user(mongo_backend)
+    _add(user_id, "12.50", "Food", 1, "lunch")
+    _add(user_id, "40", "Transport", 2, "cab")
+    _add(user_id, "7.25", "Food", 9, "coffee")
+    cab = next(row for row in databases.view_expenses_by_user(user_id) if row["notes"] == "cab")
+    coffee = next(row for row in databases.view_expenses_by_user(user_id) if row["notes"] == "coffee")
+
+    assert databases.update_expense(cab["id"], user_id, "45", "Shopping", "2024-07-01", "cab")
+    assert databases.delete_expense(coffee["id"], user_id)
+
+    assert databases.verify_rollups(user_id) == []
+    assert databases.get_expenses_total(user_id) == {"total": 57.5, "count": 2}
+    assert dict(databases.get_backend().summary(user_id, "category")) == {"Food": 12.5, "Shopping": 45.0}
+
+
+def test_verify_reports_drift_and_rebuild_repairs_it(mongo_backend):
+    from bson.objectid import ObjectId
+
+    from storage import mongo
+
+    user_id = _user(mongo_backend)
+    _add(user_id, "12.50", "Food", 1)
+    _add(user_id, "40", "Transport", 2)
+    mongo.rollups_collection().update_one(
+        {"user_id": ObjectId(user_id), "kind": "category", "key": "Food"},
+        {"$inc": {"total_minor": 500, "count": 1}},
+    )
+
+    drift = databases.verify_rollups(user_id)
+
+    assert [(bucket["kind"], bucket["key"]) for bucket in drift] == [("category", "Food")]
+    assert drift[0]["expected"] == {"total": 12.5, "count": 1}
+    assert drift[0]["stored"] == {"total": 17.5, "count": 2}
+
+    assert databases.rebuild_rollups(user_id) == 1
+    assert databases.verify_rollups(user_id) == []
+
+
+def test_failed_rollup_write_without_transactions_falls_back_to_raw_reads(mongo_backend, monkeypatch):
+    from storage import mongo
+
+    user_id = _user(mongo_backend)
+    _add(user_id, "12.50", "Food", 1)
+    monkeypatch.setattr(mongo, "_server_transactions", False)
+
+    with monkeypatch.context() as failing:
+        _fail_rollup_writes(failing)
+        _add(user_id, "40", "Transport", 2)
+
+    # The expense is stored; the stale buckets are no longer read
+    assert not mongo._rollups_ready(user_id)
+    assert databases.get_expenses_total(user_id) == {"total": 52.5, "count": 2}
+    assert databases.verify_rollups(user_id)
+
+    databases.rebuild_rollups(user_id)
+
+    assert mongo._rollups_ready(user_id)
+    assert databases.verify_rollups(user_id) == []
+    assert databases.get_expenses_total(user_id) == {"total": 52.5, "count": 2}
+
+
+def test_failed_rollup_write_in_a_transaction_rolls_back_the_expense(mongo_backend, monkeypatch):
+    from storage import mongo
+
+    if not mongo._transactions_supported():
+        pytest.skip("transactions need a replica set or mongos")
+    user_id = _user(mongo_backend)
+    _add(user_id, "12.50", "Food", 1)
+
+    with monkeypatch.context() as failing:
+        _fail_rollup_writes(failing)
+        assert not databases.add_expenses(user_id, "40", "Transport", "2024-06-02", "No notes")
+
+    assert mongo._rollups_ready(user_id)
+    assert databases.verify_rollups(user_id) == []
+    assert databases.get_expenses_total(user_id) == {"total": 12.5, "count": 1}
@@ -0,0 +1,85 @@
+from datetime import datetime
+
+import pytest
+
+import databases
+
+NOTES = [
+    ("2024-06-01", "10", "Transport", "taxi to airport"),
+    ("2024-06-02", "25", "Transport", "taxi taxi taxi home"),
+    ("2024-06-03", "4", "Food", "airport lounge coffee"),
+    ("2024-06-04", "12", "Transport", "taxi to office"),
+]
+
+
+@pytest.fixture
+def user_id(sqlite_backend):
+    user_id = sqlite_backend.create_user({"username": "u", "password_hash": "x", "created_at": datetime.now()})
+    for date, amount, category, notes in NOTES:
+        assert databases.add_expenses(user_id, amount, category, date, notes)
+    return user_id
+
+
+def _notes(results):
+    return [expense["notes"] for expense in results["expenses"]]
+
+
+@pytest.mark.parametrize("query, expected", [
+    # More occurrences rank higher; equal scores go newest first
+    ("taxi", ["taxi taxi taxi home", "taxi to office", "taxi to airport"]),
+    # Matching both words beats repeating the more common one
+    ("taxi airport", ["taxi to airport", "taxi taxi taxi home", "airport lounge coffee", "taxi to office"]),
+    ("taxis", ["taxi taxi taxi home", "taxi to office", "taxi to airport"]),
+    ("taxi -airport", ["taxi taxi taxi home", "taxi to office"]),
+    ('"taxi to"', ["taxi to office", "taxi to airport"]),
+    ("train", []),
+])
+def test_matches_are_ranked(user_id, query, expected):
+    assert _notes(databases.search_expenses(user_id, query)) == expected
+
+
+def test_filters_narrow_the_matches(user_id):
+    assert _notes(databases.search_expenses(user_id, "airport", category="Food")) == ["airport lounge coffee"]
+    assert _notes(databases.search_expenses(user_id, "taxi", min_amount=11, max_amount=25)) == [
+        "taxi taxi taxi home", "taxi to office",
+    ]
+
+
+def test_matches_are_highlighted(user_id):
+    expenses = databases.search_expenses(user_id, "airports")["expenses"]
+
+    assert [expense["snippet"] for expense in expenses] == [
+        [("airport", True), (" lounge coffee", False)],
+        [("taxi to ", False), ("airport", True)],
+    ]
+
+
+def test_pages_stop_at_max_search_results(sqlite_backend, monkeypatch):
+    user_id = sqlite_backend.create_user({"username": "many", "password_hash": "x", "created_at": datetime.now()})
+    for day in range(1, 11):
+        assert databases.add_expenses(user_id, "1", "Food", f"2024-06-{day:02d}", f"lunch {day}")
+    monkeypatch.setattr(databases, "MAX_SEARCH_RESULTS", 5)
+
+    pages = [databases.search_expenses(user_id, "lunch", page=page, page_size=2) for page in (1, 2, 3, 4)]
+
+    assert [len(page["expenses"]) for page in pages] == [2, 2, 2, 0]
+    assert [page["has_more"] for page in pages] == [True, True, False, False]
+    assert _notes(pages[0]) == ["lunch 10", "lunch 9"]
+
+
+def test_writes_invalidate_the_notes_index(user_id):
+    assert _notes(databases.search_expenses(user_id, "coffee")) == ["airport lounge coffee"]
+    hits = databases.SEARCH_INDEX_CACHE.stats()["hits"]
+    databases.search_expenses(user_id, "coffee")
+    assert databases.SEARCH_INDEX_CACHE.stats()["hits"] == hits + 1
+
+    assert databases.add_expenses(user_id, "3", "Food", "2024-06-05", "coffee beans")
+    assert _notes(databases.search_expenses(user_id, "coffee")) == ["coffee beans", "airport lounge coffee"]
+
+    beans = databases.search_expenses(user_id, "beans")["expenses"][0]
+    assert databases.update_expense(beans["id"], user_id, "3", "Food", "2024-06-05", "tea leaves")
+    assert _notes(databases.search_expenses(user_id, "coffee")) == ["airport lounge coffee"]
+
+    lounge = databases.search_expenses(user_id, "lounge")["expenses"][0]
+    assert databases.delete_expense(lounge["id"], user_id)
+    assert _notes(databases.search_expenses(user_id, "coffee")) == []
@@ -0,0 +1,142 @@
+"""Short-lived cache of the user behind current_user.
+
+Every authenticated request needs the logged-in user's profile (id and
+username). Instead of a users lookup per request, the profile is carried in
+the signed session cookie and trusted for USER_CACHE_TTL seconds; when the
+snapshot is missing or stale the in-process LRU cache is tried before the
+database. Only the public profile is kept here, never the password hash.
+
+invalidate() and clear() make older snapshots and cache entries stale in
+this process; other workers pick up the change once the TTL runs out, as
+with the expense frame cache.
+
+Configuration comes from the environment:
+
+    USER_CACHE_TTL      seconds a session snapshot or cache entry is trusted (default 60)
+    USER_CACHE_ENTRIES  profiles kept in the LRU cache (default 4096)
+"""
+import os
+import threading
+import time
+
+from cache import LRUCache
+from instrumentation import record
+
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 60))
+USER_CACHE = LRUCache(max_entries=int(os.environ.get("USER_CACHE_ENTRIES", 4096)), ttl=USER_CACHE_TTL)
+
+# Session key holding the profile snapshot
+SESSION_KEY = "user_profile"
+
+_lock = threading.Lock()
+_changed_at = {}
+_cleared_at = 0.0
+_session_hits = 0
+
+
+def profile(user_data):
+    """The fields of a user document that may be cached and put in the session"""
+    return {"_id": str(user_data["_id"]), "username": user_data["username"]}
+
+
+def _fresh(snapshot, user_id):
+    if snapshot.get("_id") != user_id:
+        return False
+    cached_at = snapshot.get("cached_at", 0)
+    if time.time() - cached_at > USER_CACHE_TTL:
+        return False
+    return cached_at > max(_cleared_at, _changed_at.get(user_id, 0.0))
+
+
+def _from_session(session, user_id):
+    global _session_hits
+    snapshot = session.get(SESSION_KEY)
+    if not snapshot or not _fresh(snapshot, user_id):
+        return None
+    with _lock:
+        _session_hits += 1
+    record(user_session_hits=1)
+    return {"_id": snapshot["_id"], "username": snapshot["username"]}
+
+
+def _store(session, user_profile):
+    USER_CACHE.put(user_profile["_id"], user_profile)
+    session[SESSION_KEY] = dict(user_profile, cached_at=time.time())
+
+
+def remember(session, user_data):
+    """Cache a freshly authenticated user and put the snapshot in their session"""
+    user_profile = profile(user_data)
+    _store(session, user_profile)
+    return user_profile
+
+
+def load(session, user_id, loader):
+    """Profile for user_id from the session, the cache or loader(user_id); None if the user is gone"""
+    user_id = str(user_id)
+    user_profile = _from_session(session, user_id)
+    if user_profile is not None:
+        return user_profile
+    user_profile = USER_CACHE.get(user_id)
+    if user_profile is None:
+        record(user_cache_misses=1)
+        user_data = loader(user_id)
+        if user_data is None:
+            return None
+        user_profile = profile(user_data)
+    else:
+        record(user_cache_hits=1)
+    _store(session, user_profile)
+    return user_profile
+
+
+async def load_async(session, user_id, loader):
+    """load() with a coroutine loader"""
+    user_id = str(user_id)
+    user_profile = _from_session(session, user_id)
+    if user_profile is not None:
+        return user_profile
+    user_profile = USER_CACHE.get(user_id)
+    if user_profile is None:
+        record(user_cache_misses=1)
+        user_data = await loader(user_id)
+        if user_data is None:
+            return None
+        user_profile = profile(user_data)
+    else:
+        record(user_cache_hits=1)
+    _store(session, user_profile)
+    return user_profile
+
+
+def forget(session, user_id):
+    """Logout: drop the session snapshot and the cached profile"""
+    session.pop(SESSION_KEY, None)
+    invalidate(user_id)
+
+
+def invalidate(user_id):
+    """The user changed: stop trusting cached copies of their profile"""
+    user_id = str(user_id)
+    USER_CACHE.invalidate(lambda key: key == user_id)
+    with _lock:
+        _changed_at[user_id] = time.time()
+
+
+def clear():
+    global _cleared_at
+    USER_CACHE.clear()
+    with _lock:
+        _changed_at.clear()
+        _cleared_at = time.time()
+
+
+def stats():
+    """Session snapshot hits, LRU hits/misses (misses are database lookups) and the overall hit rate"""
+    stats = USER_CACHE.stats()
+    with _lock:
+        stats["session_hits"] = _session_hits
+    lookups = stats["session_hits"] + stats["hits"] + stats["misses"]
+    served = stats["session_hits"] + stats["hits"]
+    stats["overall_hit_rate"] = round(served / lookups, 4) if lookups else 0.0
+    return stats